@@ -0,0 +1,89 @@
+import asyncio
+import threading
+from typing import Dict, List, Optional
+from .models import AlertState, Watch
+from logging import getLogger
+logger = getLogger("watcher")
+
+
+class AlertStore:
+    """
+    Last alert of each ticker (level, direction, time), kept in memory.
+    The watcher reads and updates it while evaluating a tick; changes are
+    written to the watches collection with one bulk write by flush() at the
+    end of the tick, instead of one update per alert.
+    """
+
+    def __init__(self, repo, async_repo=None):
+        self.repo = repo
+        # Awaited by flush_async when given
+        self.async_repo = async_repo
+        self._states: Dict[str, AlertState] = {}
+        # ticker -> new state, None to clear; not yet persisted
+        self._dirty: Dict[str, Optional[AlertState]] = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Reload the persisted alert states, e.g. on startup. Blocking."""
+        self.sync(self.repo.list_watches())
+
+    def sync(self, watches: List[Watch]):
+        """
+        Adopt the persisted state of watches not yet in memory (startup, shard
+        partitions taken over from another replica) and drop deleted ones.
+        """
+        with self._lock:
+            tickers = {w.ticker for w in watches}
+            self._states = {t: s for t, s in self._states.items() if t in tickers}
+            for w in watches:
+                if w.ticker not in self._states and w.ticker not in self._dirty and w.last_alert:
+                    self._states[w.ticker] = w.last_alert
+
+    def get(self, ticker: str) -> Optional[AlertState]:
+        return self._states.get(ticker)
+
+    def set(self, ticker: str, state: AlertState):
+        with self._lock:
+            self._states[ticker] = state
+            self._dirty[ticker] = state
+
+    def clear(self, ticker: str):
+        with self._lock:
+            if self._states.pop(ticker, None) is not None:
+                self._dirty[ticker] = None
+
+    def flush(self) -> int:
+        """Persist the changes since the last flush in one bulk write; returns how many. Blocking."""
+        changes = self._take_changes()
+        if not changes:
+            return 0
+        try:
+            self.repo.save_alert_states(changes)
+        except Exception:
+            self._keep_changes(changes)
+            raise
+        return len(changes)
+
+    async def flush_async(self) -> int:
+        """flush() awaiting the async repo, or in a worker thread without one"""
+        if self.async_repo is None:
+            return await asyncio.to_thread(self.flush)
+        changes = self._take_changes()
+        if not changes:
+            return 0
+        try:
+            await self.async_repo.save_alert_states(changes)
+        except Exception:
+            self._keep_changes(changes)
+            raise
+        return len(changes)
+
+    def _take_changes(self) -> Dict[str, Optional[AlertState]]:
+        with self._lock:
+            changes, self._dirty = self._dirty, {}
+        return changes
+
+    def _keep_changes(self, changes: Dict[str, Optional[AlertState]]):
+        # Keep them for the next flush, unless changed again meanwhile
+        with self._lock:
+            self._dirty = {**changes, **self._dirty}
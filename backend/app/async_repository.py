@@ -0,0 +1,260 @@
+import asyncio
+from .models import Watch, PriceCache, AlertState
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from datetime import datetime, timezone
+from pymongo import AsyncMongoClient, ASCENDING
+from pymongo.errors import DuplicateKeyError
+from .repository import (Repo, PRICE_PROJECTION, alert_state_updates, price_upserts, history_upserts, quote_rollup_pipeline,
+                         recorded_quotes_query, new_quote_documents, latest_quotes)
+
+
+class AsyncRepo:
+    """
+    Same surface as Repo on pymongo's asyncio client: every method is a
+    coroutine, so the FastAPI handlers and the watcher await MongoDB on the
+    event loop instead of holding a worker thread per call. Concurrency is
+    bounded by the client's connection pool (maxPoolSize in client_options).
+
+    The collections, indexes and the quotes time series are set up by Repo,
+    which is created first and stays in use for blocking callers and scripts.
+    """
+
+    def __init__(self, mongodb_url: str, mongodb_db_name: str = "stockswatcher", **client_options):
+        self.mongo_client = AsyncMongoClient(mongodb_url, **client_options)
+        self.mongo_db = self.mongo_client[mongodb_db_name]
+        self.watches_collection = self.mongo_db.watches
+        self.prices_collection = self.mongo_db.prices
+        self.history_collection = self.mongo_db.history
+        self.history_coverage_collection = self.mongo_db.history_coverage
+        self.replicas_collection = self.mongo_db.watcher_replicas
+        self.leases_collection = self.mongo_db.watcher_leases
+        self.quotes_collection = self.mongo_db.quotes
+        self.quote_bars_collection = self.mongo_db.quote_bars
+
+    async def close(self):
+        await self.mongo_client.close()
+
+
+    # Watch CRUD
+    async def upsert_watch(self, watch: Watch) -> Watch:
+        watch_dict = {
+            "ticker": watch.ticker,
+            "levels": watch.levels,
+            "enabled": watch.enabled,
+            "updated_at": datetime.utcnow()
+        }
+        await self.watches_collection.update_one({"ticker": watch.ticker}, {"$set": watch_dict}, upsert=True)
+        doc = await self.watches_collection.find_one({"ticker": watch.ticker})
+        return Repo._mongo_to_watch(doc)
+
+
+    async def get_watch(self, ticker: str) -> Optional[Watch]:
+        doc = await self.watches_collection.find_one({"ticker": ticker})
+        return Repo._mongo_to_watch(doc) if doc else None
+
+
+    async def list_watches(self) -> List[Watch]:
+        return [Repo._mongo_to_watch(doc) async for doc in self.watches_collection.find()]
+
+
+    async def delete_watch(self, ticker: str) -> bool:
+        """Delete a watch by ticker. Returns True if deleted, False if not found."""
+        result = await self.watches_collection.delete_one({"ticker": ticker})
+        return result.deleted_count > 0
+
+
+    async def save_alert_states(self, states: Dict[str, Optional[AlertState]]):
+        """Write the last alert of many watches in one bulk write; None clears it"""
+        ops = alert_state_updates(states)
+        if ops:
+            await self.watches_collection.bulk_write(ops, ordered=False)
+
+
+    # Price cache
+    async def set_price(self, ticker: str, price: float, asof: datetime, currency: str = 'USD', exchange: str = 'Unknown', timezone: str = 'America/New_York', market_state: str | None = None, open_price: float | None = None, day_high: float | None = None, day_low: float | None = None):
+        await self.set_prices([PriceCache(ticker, price, asof, currency, exchange, timezone, market_state, open_price, day_high, day_low)])
+
+
+    async def set_prices(self, prices: List[PriceCache]):
+        """Batch version of set_price: one unordered bulk write of upserts"""
+        ops = price_upserts(prices)
+        if ops:
+            await self.prices_collection.bulk_write(ops, ordered=False)
+
+
+    async def get_price(self, ticker: str) -> Optional[PriceCache]:
+        doc = await self.prices_collection.find_one({"ticker": ticker, "price": {"$ne": None}}, PRICE_PROJECTION)
+        return Repo._mongo_to_price(doc) if doc else None
+
+
+    async def get_prices(self, tickers: List[str]) -> Dict[str, PriceCache]:
+        """Batch version of get_price: one $in query; tickers without a cached price are left out"""
+        if not tickers:
+            return {}
+        cursor = self.prices_collection.find({"ticker": {"$in": list(tickers)}, "price": {"$ne": None}}, PRICE_PROJECTION)
+        return {doc["ticker"]: Repo._mongo_to_price(doc) async for doc in cursor}
+
+
+    async def list_prices(self) -> List[PriceCache]:
+        """Every cached price; documents holding only symbol metadata are skipped"""
+        cursor = self.prices_collection.find({"price": {"$ne": None}}, PRICE_PROJECTION)
+        return [Repo._mongo_to_price(doc) async for doc in cursor]
+
+
+    async def watch_changes(self) -> AsyncIterator[Tuple[str, str, object]]:
+        """Async version of Repo.watch_changes; needs a replica set"""
+        names = [self.watches_collection.name, self.prices_collection.name]
+        pipeline = [{"$match": {"ns.coll": {"$in": names}}}]
+        stream = await self.mongo_db.watch(pipeline, full_document="updateLookup")
+
+        async def changes():
+            async with stream:
+                async for change in stream:
+                    doc = change.get("fullDocument")
+                    if change["ns"]["coll"] == self.watches_collection.name:
+                        yield "watch", change["operationType"], Repo._mongo_to_watch(doc) if doc else None
+                    else:
+                        yield "price", change["operationType"], Repo._mongo_to_price(doc) if doc and doc.get("price") is not None else None
+        return changes()
+
+
+    # Symbol metadata - stored alongside the price cache document
+    async def set_metadata(self, ticker: str, meta: dict):
+        await self.prices_collection.update_one(
+            {"ticker": ticker},
+            {"$set": {**meta, "metadata_updated_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+
+
+    async def get_metadata(self, ticker: str) -> Optional[dict]:
+        return await self.prices_collection.find_one(
+            {"ticker": ticker},
+            {"_id": 0, "currency": 1, "exchange": 1, "timezone": 1, "metadata_updated_at": 1}
+        )
+
+
+    # OHLCV history
+    async def upsert_history(self, ticker: str, interval: str, records: List[dict]):
+        if not records:
+            return
+        await self.history_collection.bulk_write(history_upserts(ticker, interval, records), ordered=False)
+
+
+    async def get_history(self, ticker: str, interval: str, start: Optional[datetime] = None) -> List[dict]:
+        query = {"ticker": ticker, "interval": interval}
+        if start is not None:
+            query["date"] = {"$gte": start}
+        projection = {"_id": 0, "date": 1, "open": 1, "high": 1, "low": 1, "close": 1, "volume": 1}
+        return await self.history_collection.find(query, projection).sort("date", ASCENDING).to_list()
+
+
+    async def get_history_last_date(self, ticker: str, interval: str) -> Optional[datetime]:
+        doc = await self.history_collection.find_one(
+            {"ticker": ticker, "interval": interval}, {"date": 1}, sort=[("date", -1)]
+        )
+        return doc["date"] if doc else None
+
+
+    async def get_history_coverage(self, ticker: str, interval: str) -> Optional[dict]:
+        return await self.history_coverage_collection.find_one(
+            {"ticker": ticker, "interval": interval},
+            {"_id": 0, "start": 1, "head_complete": 1, "refreshed_at": 1}
+        )
+
+
+    async def set_history_coverage(self, ticker: str, interval: str, start: datetime, head_complete: bool, refreshed_at: datetime):
+        await self.history_coverage_collection.update_one(
+            {"ticker": ticker, "interval": interval},
+            {"$set": {"start": start, "head_complete": head_complete, "refreshed_at": refreshed_at}},
+            upsert=True
+        )
+
+
+    # Intraday quote history
+    async def append_quotes(self, prices: List[PriceCache]):
+        """See Repo.append_quotes"""
+        if not prices:
+            return
+        recorded = await self.quotes_collection.find(recorded_quotes_query(prices), {"_id": 0, "ticker": 1, "ts": 1, "price": 1}
+                                                     ).sort("polled_at", ASCENDING).to_list()
+        docs = new_quote_documents(prices, recorded)
+        if docs:
+            await self.quotes_collection.insert_many(docs, ordered=False)
+
+
+    async def get_quotes(self, ticker: str, start: datetime, end: datetime) -> List[dict]:
+        query = {"ticker": ticker, "ts": {"$gte": start, "$lt": end}}
+        cursor = self.quotes_collection.find(query, {"_id": 0, "ts": 1, "price": 1}).sort([("ts", ASCENDING), ("polled_at", ASCENDING)])
+        return latest_quotes(await cursor.to_list())
+
+
+    async def rollup_quotes(self, interval: str, unit: str, bin_size: int, since: datetime, source: Optional[str] = None,
+                            retention_seconds: Optional[int] = None):
+        """See Repo.rollup_quotes"""
+        collection = self.quotes_collection if source is None else self.quote_bars_collection
+        await collection.aggregate(quote_rollup_pipeline(interval, unit, bin_size, since, source, retention_seconds,
+                                                         self.quote_bars_collection.name))
+
+
+    async def get_quote_bars(self, ticker: str, interval: str, start: datetime, end: datetime) -> List[dict]:
+        query = {"ticker": ticker, "interval": interval, "start": {"$gte": start, "$lt": end}}
+        projection = {"_id": 0, "start": 1, "open": 1, "high": 1, "low": 1, "close": 1, "count": 1}
+        return await self.quote_bars_collection.find(query, projection).sort("start", ASCENDING).to_list()
+
+
+    # Watcher sharding - replica heartbeats and partition leases
+    async def heartbeat_replica(self, replica_id: str, now: datetime):
+        await self.replicas_collection.update_one({"_id": replica_id}, {"$set": {"heartbeat_at": now}}, upsert=True)
+
+
+    async def list_live_replicas(self, since: datetime) -> List[str]:
+        return [doc["_id"] async for doc in self.replicas_collection.find({"heartbeat_at": {"$gte": since}}, {"_id": 1})]
+
+
+    async def remove_replica(self, replica_id: str):
+        await self.replicas_collection.delete_one({"_id": replica_id})
+
+
+    async def claim_lease(self, partition: int, owner: str, now: datetime, expires_at: datetime) -> bool:
+        """Take or renew a partition lease; fails while another owner's lease hasn't expired"""
+        try:
+            await self.leases_collection.update_one(
+                {"_id": partition, "$or": [{"owner": owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": owner, "expires_at": expires_at}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+
+    async def release_lease(self, partition: int, owner: str):
+        await self.leases_collection.delete_one({"_id": partition, "owner": owner})
+
+
+    async def list_leases(self) -> List[dict]:
+        return await self.leases_collection.find({}, {"owner": 1, "expires_at": 1}).sort("_id", ASCENDING).to_list()
+
+
+class ThreadedAsyncRepo:
+    """
+    The async repo surface over a blocking repo (Repo, RepoSnapshot, an
+    in-memory test repo): each call runs in a worker thread. Used when the
+    async client is disabled.
+    """
+
+    def __init__(self, repo):
+        self._repo = repo
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._repo, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(attr, *args, **kwargs)
+        return call
+
+    async def close(self):
+        pass
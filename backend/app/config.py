@@ -1,16 +1,67 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Dict
+from typing import Dict, List
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file='.env', env_file_encoding='utf-8', extra='ignore')
 
+    STORAGE_BACKEND: str = "mongodb" # mongodb, or sqlite: one local file, no mongod, single node only
+    SQLITE_PATH: str = "stockswatcher.db" # database file of the sqlite backend
     MONGODB_URL: str = "mongodb://localhost:27017"
     MONGODB_DB_NAME: str = "stockswatcher"
+    MONGODB_ASYNC_ENABLED: bool = True # async routes and the watcher await pymongo's async client; False = blocking client in worker threads
+    MONGODB_MAX_POOL_SIZE: int = 100 # connections per client; the async and the blocking client have one pool each
+    MONGODB_MIN_POOL_SIZE: int = 0 # connections kept open while idle
+    MONGODB_MAX_CONNECTING: int = 2 # connections being opened at once per pool
+    MONGODB_MAX_IDLE_SECONDS: float = 0 # close pooled connections idle for longer; 0 = never
+    MONGODB_WAIT_QUEUE_TIMEOUT_SECONDS: float = 0 # fail operations waiting longer for a free connection; 0 = wait
+    MONGODB_SERVER_SELECTION_TIMEOUT_SECONDS: float = 30 # fail operations after this while no server is reachable
     TELEGRAM_BOT_TOKEN: str = ""
     TELEGRAM_CHAT_ID: str = ""
     TELEGRAM_NOTIFICATION_ENABLED: bool = False
+    TELEGRAM_API_URL: str = "https://api.telegram.org" # point at a local stand-in for testing
+    TELEGRAM_TIMEOUT_SECONDS: float = 10 # per sendMessage request
+    TELEGRAM_QUEUE_SIZE: int = 100 # digest messages waiting to be sent; more are dropped
+    TELEGRAM_MESSAGES_PER_MINUTE: float = 20 # Telegram allows ~20 messages per minute in a group
+    TELEGRAM_MAX_RETRIES: int = 5 # per message, with exponential backoff
     CHECK_INTERVAL_MINUTES: int = 5
+    SNAPSHOT_ENABLED: bool = True # serve watches and prices from memory, kept in sync by change streams
+    SNAPSHOT_POLL_SECONDS: float = 30 # full reload interval when change streams are unavailable
     NEAR_LEVEL_PCT: float = 0.005 # 0,5%
+    TICK_DEADLINE_SECONDS: float = 0 # unfinished watches move to the next tick after this; 0 = the tick interval
+    TICK_HISTORY_SIZE: int = 200 # tick outcomes kept for GET /ticks
+    QUOTE_RETENTION_DAYS: int = 7 # raw polled quotes in the ticks time series; rollups are kept longer
+    QUOTE_ROLLUP_SECONDS: int = 60 # how often the 5m/1h/1d bars of recent quotes are recomputed
+    SHARDING_ENABLED: bool = False # split watches between replicas with Mongo partition leases
+    SHARD_REPLICA_ID: str = "" # unique per replica; defaults to host-pid-random
+    SHARD_PARTITIONS: int = 64 # ticker hash partitions; more partitions balance better
+    SHARD_LEASE_SECONDS: int = 30 # partitions of a replica that stops heartbeating move after this
+    SHARD_HEARTBEAT_SECONDS: int = 10 # must be well below SHARD_LEASE_SECONDS
+    POLL_SESSIONS: List[str] = ["regular"] # market sessions polled by the watcher: pre, regular, post
+    ADAPTIVE_POLLING: bool = True # poll each watch by distance to its nearest level instead of every CHECK_INTERVAL_MINUTES
+    POLL_TICK_SECONDS: int = 5 # how often the adaptive watcher looks for due watches
+    POLL_MIN_SECONDS: int = 10 # shortest interval between polls of a watch near a level
+    POLL_MAX_SECONDS: int = 1800 # longest interval between polls of a watch far from its levels
+    POLL_REQUESTS_PER_MINUTE: int = 120 # ticker quotes (one Yahoo request each) per rolling minute, across all watches
+    PROVIDER_BATCH_SIZE: int = 100 # symbols per yf.download call (still one Yahoo request per symbol)
+    PROVIDER_MAX_CONCURRENCY: int = 4 # batches fetched in parallel
+    PROVIDER_RATE_PER_SECOND: float = 5.0 # token bucket shared by all Yahoo requests, one token per symbol downloaded
+    PROVIDER_RATE_BURST: int = 20
+    PROVIDER_RATE_MAX_WAIT_SECONDS: float = 30 # give up (serve cached data) instead of waiting longer
+    CIRCUIT_FAILURE_THRESHOLD: int = 5 # consecutive failed upstream calls before the circuit opens
+    CIRCUIT_FAILURE_RATIO: float = 0.5 # share of failed symbols that makes a batch download a failed call
+    CIRCUIT_RESET_SECONDS: int = 120 # open circuit duration before a probe call is allowed
+    VALIDATION_VALID_TTL_SECONDS: int = 604800 # existing symbols are re-checked weekly
+    VALIDATION_INVALID_TTL_SECONDS: int = 600 # unknown symbols are re-checked after 10 minutes
+    VALIDATION_CACHE_MAX_SIZE: int = 4096
+    METADATA_CACHE_TTL_SECONDS: int = 86400 # currency/exchange/timezone refresh interval
+    METADATA_CACHE_MAX_SIZE: int = 2048
+    METADATA_CACHE_PERSIST: bool = True # store metadata in the Mongo prices collection
+    HISTORY_REFRESH_MINUTES: int = 60 # re-download the tail of stored daily history after this
+    HISTORY_CHART_CACHE_SIZE: int = 256 # downsampled chart series kept in memory
+    DETAILS_PRICE_TTL_SECONDS: int = 300 # price-derived fields of /stocks/{ticker}/details
+    DETAILS_FUNDAMENTALS_TTL_SECONDS: int = 86400 # valuation and fundamentals fields
+    DETAILS_CACHE_MAX_SIZE: int = 512
+    DETAILS_WARMUP_HOUR_UTC: int = 22 # daily details warm-up of watched tickers, after US close
     TICKER_MAP: Dict[str, str] = {
         "TXN": "TXN",
         "INTC": "INTC",
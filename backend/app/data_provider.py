@@ -1,99 +1,271 @@
+import re
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict
+from typing import Dict, Iterable, List, Optional
+import pandas as pd
 import yfinance as yf
 from .config import settings
-from logging import getLogger
+from .metadata_cache import MetadataCache
+from .intraday_store import IntradayBarStore
+from .utils import get_market_state
+from logging import getLogger, Handler, ERROR
 logger = getLogger("watcher")
 
+
+class DownloadErrorLog(Handler):
+    """
+    yf.download doesn't raise for failed symbols (HTTP 429 included): it returns
+    empty columns for them and logs "['AAPL', 'MSFT']: <error>" lines on the
+    yfinance logger, from the calling thread. capture() collects those messages
+    per symbol for the current thread.
+    """
+
+    def __init__(self):
+        super().__init__(ERROR)
+        self._local = threading.local()
+
+    @contextmanager
+    def capture(self):
+        self._local.errors = errors = {}
+        try:
+            yield errors
+        finally:
+            self._local.errors = None
+
+    def emit(self, record):
+        errors = getattr(self._local, "errors", None)
+        if errors is None:
+            return
+        symbols, sep, message = record.getMessage().partition("]: ")
+        if sep and symbols.startswith("["):
+            for symbol in re.findall(r"'([^']+)'", symbols):
+                errors[symbol] = message
+
+
+download_errors = DownloadErrorLog()
+getLogger("yfinance").addHandler(download_errors)
+
+# yfinance errors meaning the symbol doesn't exist, as opposed to a failed request
+_NOT_FOUND_PATTERN = re.compile(r"delisted|not found|no data found|no price data|no timezone", re.IGNORECASE)
+
+
 class PriceProvider:
-    def __init__(self, ticker_map: Dict[str, str]):
+    def __init__(self, ticker_map: Dict[str, str], metadata_cache: Optional[MetadataCache] = None):
         self.map = ticker_map
+        self.metadata = metadata_cache or MetadataCache(settings.METADATA_CACHE_TTL_SECONDS, settings.METADATA_CACHE_MAX_SIZE)
+        self.bars = IntradayBarStore()
 
     def validate_ticker(self, ticker: str) -> bool:
-        """Check if a ticker exists on Yahoo Finance"""
-        try:
-            y_ticker = self.map.get(ticker, ticker)
-            stock = yf.Ticker(y_ticker)
-            # Use fast_info which is much faster than info
-            # Just check if we can get the timezone (which means the ticker exists)
-            _ = stock.fast_info.get('timezone')
-            return True
-        except Exception as e:
-            logger.warning(f"Ticker validation failed for {ticker}: {e}")
-            return False
+        """Check if a ticker exists on Yahoo Finance; upstream errors are raised"""
+        return self.validate_many([ticker])[ticker]
+
+    def validate_many(self, tickers: List[str]) -> Dict[str, bool]:
+        """
+        Check which tickers exist on Yahoo Finance: a symbol is valid if Yahoo returns
+        daily bars for it. yf.download still sends one request per symbol, concurrently,
+        for each call of PROVIDER_BATCH_SIZE symbols.
+        A symbol without bars is only invalid if yfinance reports it as not found:
+        throttling and network errors raise instead.
+        """
+        by_symbol: Dict[str, List[str]] = {}
+        for ticker in dict.fromkeys(tickers):
+            by_symbol.setdefault(self.map.get(ticker, ticker), []).append(ticker)
+
+        valid: Dict[str, bool] = {}
+        symbols = list(by_symbol)
+        batch_size = max(1, settings.PROVIDER_BATCH_SIZE)
+        for i in range(0, len(symbols), batch_size):
+            for y_ticker, ok in self._symbols_with_bars(symbols[i:i + batch_size]).items():
+                for ticker in by_symbol[y_ticker]:
+                    valid[ticker] = ok
+        return valid
+
+    def _symbols_with_bars(self, symbols: List[str]) -> Dict[str, bool]:
+        with download_errors.capture() as failures:
+            data = yf.download(symbols, period="5d", interval="1d", group_by="ticker",
+                               progress=False, auto_adjust=True, threads=True)
+        found: Dict[str, bool] = {}
+        for y_ticker in symbols:
+            found[y_ticker] = not self._select_symbol(data, y_ticker).empty
+            failure = failures.get(y_ticker.upper())
+            if not found[y_ticker] and failure and not _NOT_FOUND_PATTERN.search(failure):
+                raise RuntimeError(f"Could not check {y_ticker}: {failure}")
+        return found
 
     def get_last(self, ticker: str) -> tuple[float, datetime, str, str, str, str | None, float | None]:
         """Returns (price, asof, currency, exchange, timezone, market_state, open_price)"""
-        y_ticker = self.map.get(ticker, ticker)
-        stock = yf.Ticker(y_ticker)
-        
-        # Explicitly set auto_adjust to avoid FutureWarning
-        data = yf.download(y_ticker, period="1d", interval="1m", progress=False, auto_adjust=True)
-        if data.empty:
-            raise RuntimeError(f"No data for {ticker}")
-        
-        last = data.tail(1)
-        logger.info(f"Yahoo data for {ticker}: {last}")
-        
-        # Handle both multi-index and single-index columns for current price
-        if 'Close' in data.columns:
-            price = float(last['Close'].iloc[0])
-        elif ('Close', y_ticker) in data.columns:
-            price = float(last['Close'][y_ticker].iloc[0])
-        else:
-            # Fallback: try to get the first numeric column
-            price = float(last.iloc[0, 0])
-        
-        asof = last.index[-1].to_pydatetime()
-        
-        # Get currency, exchange, timezone, and open price from fast_info (faster than full info)
-        try:
-            currency = stock.fast_info.get('currency', 'USD')
-            print(f"[DEBUG] {ticker} - currency from fast_info: {currency}")
-        except Exception as e:
-            print(f"[DEBUG] {ticker} - failed to get currency: {e}")
-            currency = 'USD'
+        results, errors = self.get_last_many([ticker])
+        if ticker not in results:
+            raise RuntimeError(errors.get(ticker, f"No data for {ticker}"))
+        return results[ticker]
+
+    def get_day_range(self, ticker: str) -> tuple[float | None, float | None]:
+        """Returns (day_high, day_low) computed from the intraday bar store"""
+        return self.bars.day_range(self.map.get(ticker, ticker))
+
+    def get_volatility(self, ticker: str) -> float | None:
+        """Recent per-minute volatility (std of 1m log returns) from the intraday bar store"""
+        return self.bars.volatility(self.map.get(ticker, ticker))
+
+    def retain_bars(self, tickers: Iterable[str]) -> int:
+        """Drop the stored intraday bars of symbols none of tickers map to"""
+        return self.bars.retain(self.map.get(ticker, ticker) for ticker in tickers)
+
+    def _get_metadata(self, ticker: str, y_ticker: str) -> tuple[str, str, str]:
+        """
+        Returns (currency, exchange, timezone), served from the metadata cache.
+        Yahoo is only queried on a cache miss or after the TTL has expired.
+        """
+        meta = self.metadata.get(ticker)
+        if meta is not None:
+            return meta['currency'], meta['exchange'], meta['timezone']
         
+        stock = yf.Ticker(y_ticker)
+        currency, exchange, timezone_name = 'USD', 'Unknown', 'America/New_York'
+        fetched = False
         try:
-            exchange = stock.fast_info.get('exchange', 'Unknown')
-            print(f"[DEBUG] {ticker} - exchange from fast_info: {exchange}")
+            # One fast_info object: currency, exchange and timezone come from the same metadata request
+            fast = stock.fast_info
+            currency = fast.get('currency', 'USD') or 'USD'
+            exchange = fast.get('exchange', 'Unknown') or 'Unknown'
+            timezone_name = fast.get('timezone', 'America/New_York') or 'America/New_York'
+            fetched = True
         except Exception as e:
-            print(f"[DEBUG] {ticker} - failed to get exchange: {e}")
-            exchange = 'Unknown'
+            logger.warning(f"Failed to get fast_info for {ticker}: {e}")
         
-        try:
-            timezone_name = stock.fast_info.get('timezone', 'America/New_York')
-            print(f"[DEBUG] {ticker} - timezone from fast_info: {timezone_name}")
-        except Exception as e:
-            print(f"[DEBUG] {ticker} - failed to get timezone: {e}")
-            timezone_name = 'America/New_York'
+        # If exchange wasn't in fast_info, try to get it from full info (only on a cache miss)
+        if exchange == 'Unknown':
+            try:
+                exchange = stock.info.get('exchange', 'Unknown')
+            except Exception as e:
+                logger.warning(f"Could not fetch full info for {ticker}: {e}")
         
-        # Get opening price from fast_info (today's opening price)
-        open_price = None
-        try:
-            open_price = stock.fast_info.get('open')
-            print(f"[DEBUG] {ticker} - open price from fast_info: {open_price}")
-        except Exception as e:
-            print(f"[DEBUG] {ticker} - failed to get open price: {e}")
+        logger.debug(f"Metadata for {ticker}: currency={currency}, exchange={exchange}, timezone={timezone_name}")
+        # Don't pin fallback defaults in the cache for a whole TTL
+        if fetched:
+            self.metadata.set(ticker, {'currency': currency, 'exchange': exchange, 'timezone': timezone_name})
+        return currency, exchange, timezone_name
+
+    def _quote_from_bars(self, ticker: str, y_ticker: str, bars: pd.DataFrame) -> tuple[float, datetime, str, str, str, str | None, float | None]:
+        """Build the get_last tuple from today's stored 1m bars plus cached metadata"""
+        last = bars.tail(1)
+        price = float(last['Close'].iloc[0])
+        asof = last.index[-1].to_pydatetime()
+        # Today's opening price is the open of the first 1m bar of the session
+        open_price = float(bars['Open'].iloc[0]) if 'Open' in bars.columns else None
+        currency, exchange, timezone_name = self._get_metadata(ticker, y_ticker)
+        # marketState is volatile but cheap to derive from the exchange calendar
+        market_state = get_market_state(exchange, timezone_name)
+        return price, asof, currency, exchange, timezone_name, market_state, open_price
+
+    def get_last_many(self, tickers: List[str]) -> tuple[Dict[str, tuple], Dict[str, str]]:
+        """
+        Batch version of get_last.
+        Downloads intraday bars with one yf.download call per PROVIDER_BATCH_SIZE
+        symbols. yfinance still sends one chart request per symbol, on its own
+        thread pool: batching runs those requests concurrently, it does not
+        reduce their number.
+
+        Returns:
+            Tuple of (results, errors): results maps ticker to the same tuple
+            returned by get_last, errors maps ticker to an error message
+        """
+        results: Dict[str, tuple] = {}
+        errors: Dict[str, str] = {}
+
+        # Several tickers may map to the same Yahoo symbol
+        by_symbol: Dict[str, List[str]] = {}
+        for ticker in dict.fromkeys(tickers):
+            by_symbol.setdefault(self.map.get(ticker, ticker), []).append(ticker)
+
+        symbols = list(by_symbol)
+        batch_size = max(1, settings.PROVIDER_BATCH_SIZE)
+        for i in range(0, len(symbols), batch_size):
+            batch = symbols[i:i + batch_size]
+            try:
+                downloaded, failures = self._download_new_bars(batch)
+            except Exception as e:
+                logger.error(f"Batch download failed for {len(batch)} symbols: {e}")
+                for y_ticker in batch:
+                    for ticker in by_symbol[y_ticker]:
+                        errors[ticker] = f"Batch download failed: {e}"
+                continue
+
+            for y_ticker in batch:
+                new_bars = downloaded.get(y_ticker)
+                if new_bars is None or new_bars.empty:
+                    # A good download returns at least the last stored bar again, so an
+                    # empty one failed: don't serve the stored bars as a fresh quote
+                    failure = failures.get(y_ticker.upper())
+                    for ticker in by_symbol[y_ticker]:
+                        errors[ticker] = f"No data for {ticker}" + (f": {failure}" if failure else "")
+                        logger.warning(f"Failed to get last price for {ticker}: {errors[ticker]}")
+                    continue
+                # Merge only the new bars; quotes are computed from the local store
+                bars = self.bars.append(y_ticker, new_bars)
+                for ticker in by_symbol[y_ticker]:
+                    try:
+                        results[ticker] = self._quote_from_bars(ticker, y_ticker, bars)
+                    except Exception as e:
+                        logger.warning(f"Failed to get last price for {ticker}: {e}")
+                        errors[ticker] = str(e)
+
+        logger.info(f"Batch fetch: {len(results)} ok, {len(errors)} failed, {len(symbols)} symbols")
+        return results, errors
+
+    def _download_new_bars(self, symbols: List[str]) -> tuple[Dict[str, pd.DataFrame], Dict[str, str]]:
+        """
+        Download only the 1m bars not yet in the intraday store.
+        Symbols without stored bars get the whole day; the others are fetched
+        from the oldest last stored timestamp onwards (that bar included, since
+        it may still have been forming when it was stored).
+
+        Returns (bars, failures): failures maps the (upper case) symbols yfinance
+        logged as failed to its error message.
+        """
+        cold = [s for s in symbols if self.bars.last_timestamp(s) is None]
+        warm = [s for s in symbols if s not in cold]
+        downloaded: Dict[str, pd.DataFrame] = {}
         
-        # Try to get marketState from full info (not available in fast_info)
-        market_state = None
-        market = None
-        try:
-            info = stock.info
-            market_state = info.get('marketState', None)
-            market = info.get('market', None)  # e.g., 'us_market', 'it_market', etc.
-            
-            # If exchange wasn't in fast_info, try to get it from info
-            if exchange == 'Unknown':
-                exchange = info.get('exchange', 'Unknown')
-                print(f"[DEBUG] {ticker} - exchange from info: {exchange}")
-            
-            print(f"[DEBUG] {ticker} - Market info: exchange={exchange}, market={market}, state={market_state}, timezone={timezone_name}")
-        except Exception as e:
-            print(f"[DEBUG] {ticker} - Could not fetch full info: {e}")
+        with download_errors.capture() as failures:
+            if cold:
+                data = yf.download(cold, period="1d", interval="1m", group_by="ticker",
+                                   progress=False, auto_adjust=True, threads=True)
+                for y_ticker in cold:
+                    downloaded[y_ticker] = self._select_symbol(data, y_ticker)
+
+            if warm:
+                start = min(self.bars.last_timestamp(s) for s in warm)
+                data = yf.download(warm, start=start.to_pydatetime(), interval="1m", group_by="ticker",
+                                   progress=False, auto_adjust=True, threads=True)
+                for y_ticker in warm:
+                    bars = self._select_symbol(data, y_ticker)
+                    if not bars.empty:
+                        bars = bars[bars.index >= self.bars.last_timestamp(y_ticker)]
+                    downloaded[y_ticker] = bars
         
-        return price, asof, currency, exchange, timezone_name, market_state, open_price
+        return downloaded, failures
+
+    @staticmethod
+    def _select_symbol(data, y_ticker: str) -> pd.DataFrame:
+        """Extract the single-symbol OHLCV frame from a multi-symbol yf.download result"""
+        if data is None or data.empty:
+            return pd.DataFrame()
+        columns = data.columns
+        if isinstance(columns, pd.MultiIndex):
+            if y_ticker in columns.get_level_values(0):
+                bars = data[y_ticker]
+            elif y_ticker in columns.get_level_values(1):
+                bars = data.xs(y_ticker, axis=1, level=1)
+            else:
+                return data.iloc[0:0]
+        else:
+            bars = data
+        if 'Close' not in bars.columns:
+            return bars.iloc[0:0]
+        # Symbols missing from the batch come back as all-NaN rows
+        return bars.dropna(subset=['Close'])
 
     def get_stock_details(self, ticker: str) -> dict:
         """Get comprehensive stock details for investment analysis"""
@@ -193,6 +365,48 @@ class PriceProvider:
             logger.error(f"Error fetching stock details for {ticker}: {e}")
             raise RuntimeError(f"Failed to fetch details for {ticker}")
 
+    def get_stock_price_fields(self, ticker: str) -> dict:
+        """
+        Price-derived subset of get_stock_details, read from fast_info only.
+        Much cheaper than the full stock.info payload.
+        """
+        y_ticker = self.map.get(ticker, ticker)
+        fast = yf.Ticker(y_ticker).fast_info
+        
+        # Helper to safely get values from FastInfo object
+        def safe_get_fast(obj, key, default=None):
+            try:
+                val = getattr(obj, key, default)
+                return val if val not in [None, 'N/A', float('inf'), float('-inf')] else default
+            except:
+                return default
+        
+        last_price = safe_get_fast(fast, 'last_price')
+        if last_price is None:
+            raise RuntimeError(f"Failed to fetch price fields for {ticker}")
+        volume = safe_get_fast(fast, 'last_volume')
+        return {
+            'current_price': last_price,
+            'market_cap': safe_get_fast(fast, 'market_cap'),
+            'volume': int(volume) if volume is not None else None,
+            'fifty_two_week_high': safe_get_fast(fast, 'year_high'),
+            'fifty_two_week_low': safe_get_fast(fast, 'year_low'),
+            'fifty_two_week_change': safe_get_fast(fast, 'year_change'),
+        }
+
+    def get_historical_range(self, ticker: str, interval: str = "1d", period: Optional[str] = None,
+                             start: Optional[datetime] = None, end: Optional[datetime] = None) -> pd.DataFrame:
+        """
+        Raw OHLCV history for either a period or a start/end range.
+        Unlike get_historical_prices, provider errors are raised to the caller.
+        """
+        stock = yf.Ticker(self.map.get(ticker, ticker))
+        if period is not None:
+            hist = stock.history(period=period, interval=interval)
+        else:
+            hist = stock.history(start=start, end=end, interval=interval)
+        return hist.dropna(subset=['Close']) if not hist.empty else hist
+
     def get_historical_prices(self, ticker: str, period: str = "1y", interval: str = "1d") -> list:
         """
         Get historical price data for charting
@@ -200,6 +414,13 @@ class PriceProvider:
         interval: 1m, 2m, 5m, 15m, 30m, 60m, 90m, 1h, 1d, 5d, 1wk, 1mo, 3mo
         """
         y_ticker = self.map.get(ticker, ticker)
+        
+        # Today's 1m chart is already in the intraday bar store
+        if period == "1d" and interval == "1m":
+            bars = self.bars.get(y_ticker)
+            if bars is not None and not bars.empty:
+                return self.to_records(bars)
+        
         stock = yf.Ticker(y_ticker)
         
         try:
@@ -207,17 +428,16 @@ class PriceProvider:
             if hist.empty:
                 return []
             
-            result = []
-            for idx, row in hist.iterrows():
-                result.append({
-                    'date': idx.to_pydatetime(),
-                    'open': float(row['Open']),
-                    'high': float(row['High']),
-                    'low': float(row['Low']),
-                    'close': float(row['Close']),
-                    'volume': int(row['Volume'])
-                })
-            return result
+            return self.to_records(hist)
         except Exception as e:
             logger.error(f"Error fetching historical prices for {ticker}: {e}")
-            return []
\ No newline at end of file
+            return []
+
+    @staticmethod
+    def to_records(hist: pd.DataFrame) -> list:
+        """Convert an OHLCV DataFrame into a list of price dicts in one vectorized step"""
+        keys = ('date', 'open', 'high', 'low', 'close', 'volume')
+        columns = [hist.index.to_pydatetime()]
+        columns += [hist[c].to_numpy(dtype=float).tolist() for c in ('Open', 'High', 'Low', 'Close')]
+        columns.append(hist['Volume'].fillna(0).to_numpy(dtype='int64').tolist())
+        return [dict(zip(keys, row)) for row in zip(*columns)]
\ No newline at end of file
@@ -0,0 +1,113 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from .cache import TTLCache
+from logging import getLogger
+logger = getLogger("watcher")
+
+# Fields that move with the price; everything else is valuation/fundamentals
+PRICE_FIELDS = (
+    'current_price',
+    'market_cap',
+    'volume',
+    'fifty_two_week_high',
+    'fifty_two_week_low',
+    'fifty_two_week_change',
+)
+
+
+class DetailsCache:
+    """
+    Stale-while-revalidate cache for PriceProvider.get_stock_details.
+    
+    Fields are split in two groups with their own TTL: price-derived fields
+    (minutes, refreshed from fast_info) and fundamentals (about a day, full
+    stock.info). Expired entries are still returned immediately while a
+    background thread refreshes the expired group.
+    """
+    
+    def __init__(self, provider, price_ttl_seconds: int = 300, fundamentals_ttl_seconds: int = 86400, max_size: int = 512):
+        self.provider = provider
+        self.price_ttl_seconds = price_ttl_seconds
+        self.fundamentals_ttl_seconds = fundamentals_ttl_seconds
+        # Entries older than a week of fundamentals TTL are dropped and fetched synchronously again
+        self._entries = TTLCache(max_size, fundamentals_ttl_seconds * 7)
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="details-refresh")
+        self._inflight: set = set()
+        self._lock = threading.Lock()
+    
+    def get(self, ticker: str) -> dict:
+        """Return cached details with price_age_seconds and fundamentals_age_seconds"""
+        entry = self._entries.get(ticker)
+        if entry is None:
+            entry = self._fetch_full(ticker)
+        else:
+            now = time.time()
+            if now - entry['fundamentals_at'] > self.fundamentals_ttl_seconds:
+                self._refresh_in_background(ticker, 'fundamentals')
+            elif now - entry['price_at'] > self.price_ttl_seconds:
+                self._refresh_in_background(ticker, 'price')
+        
+        now = time.time()
+        return {
+            **entry['details'],
+            'price_age_seconds': round(now - entry['price_at'], 1),
+            'fundamentals_age_seconds': round(now - entry['fundamentals_at'], 1),
+        }
+    
+    def stats(self) -> dict:
+        return self._entries.stats()
+    
+    def warm_up(self, tickers: List[str]) -> int:
+        """Fetch full details for all tickers (e.g. after market close). Returns how many succeeded."""
+        warmed = 0
+        for ticker in tickers:
+            try:
+                self._fetch_full(ticker)
+                warmed += 1
+            except Exception as e:
+                logger.warning(f"Details warm-up failed for {ticker}: {e}")
+        logger.info(f"Details warm-up: {warmed}/{len(tickers)} tickers")
+        return warmed
+    
+    def _fetch_full(self, ticker: str) -> dict:
+        details = self.provider.get_stock_details(ticker)
+        now = time.time()
+        entry = {'details': details, 'price_at': now, 'fundamentals_at': now}
+        self._entries.set(ticker, entry)
+        return entry
+    
+    def _refresh_price(self, ticker: str):
+        entry = self._entries.get(ticker)
+        if entry is None:
+            self._fetch_full(ticker)
+            return
+        fields = self.provider.get_stock_price_fields(ticker)
+        # Replace the entry instead of mutating it: readers may hold the old one
+        self._entries.set(ticker, {
+            'details': {**entry['details'], **fields},
+            'price_at': time.time(),
+            'fundamentals_at': entry['fundamentals_at'],
+        })
+    
+    def _refresh_in_background(self, ticker: str, group: str):
+        key = (ticker, group)
+        with self._lock:
+            if key in self._inflight:
+                return
+            self._inflight.add(key)
+        self._executor.submit(self._refresh, ticker, group)
+    
+    def _refresh(self, ticker: str, group: str):
+        try:
+            if group == 'fundamentals':
+                self._fetch_full(ticker)
+            else:
+                self._refresh_price(ticker)
+        except Exception as e:
+            # Keep serving the stale entry; the next request retries
+            logger.warning(f"Background {group} refresh failed for {ticker}: {e}")
+        finally:
+            with self._lock:
+                self._inflight.discard((ticker, group))
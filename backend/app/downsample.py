@@ -0,0 +1,78 @@
+import numpy as np
+
+REDUCERS = ("lttb", "ohlc")
+
+
+def lttb_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of the n_out points of y that best keep
+    the visual shape of the series. Points are treated as equally spaced, like the
+    category axis of the chart. Bucket averages are computed in one vectorized pass;
+    only the selection walks the buckets, with a NumPy argmax per bucket.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    
+    x = np.arange(n, dtype=float)
+    # n_out - 2 buckets between the first and the last point
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    sum_y = np.concatenate(([0.0], np.cumsum(y)))
+    counts = edges[1:] - edges[:-1]
+    avg_x = (edges[:-1] + edges[1:] - 1) / 2.0
+    avg_y = (sum_y[edges[1:]] - sum_y[edges[:-1]]) / counts
+    # Each bucket is scored against the average of the next one (the last point for the last bucket)
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+    
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((x[a] - next_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def _to_list(values: np.ndarray) -> list:
+    nan = np.isnan(values)
+    return np.where(nan, None, values).tolist() if nan.any() else values.tolist()
+
+
+def downsample(columns: dict, max_points: int, reducer: str = "lttb") -> dict:
+    """
+    Reduce a columnar OHLCV series ({date: [], open: [], ...}) to at most max_points.
+    lttb keeps the selected rows as they are (shape of the close line);
+    ohlc merges each bucket into one bar: first open, max high, min low, last close, summed volume.
+    """
+    n = len(columns["date"])
+    if max_points <= 0 or n <= max_points:
+        return columns
+    
+    if reducer == "lttb":
+        close = np.array(columns["close"], dtype=float)
+        # LTTB needs finite values: carry the previous close over gaps
+        if np.isnan(close).any():
+            mask = np.isnan(close)
+            idx = np.where(~mask, np.arange(n), 0)
+            close = close[np.maximum.accumulate(idx)]
+        keep = lttb_indices(close, max_points)
+        return {col: [values[i] for i in keep] for col, values in columns.items()}
+    
+    if reducer == "ohlc":
+        starts = np.unique(np.linspace(0, n, max_points + 1).astype(np.int64)[:-1])
+        ends = np.append(starts[1:], n)
+        open_ = np.array(columns["open"], dtype=float)
+        close = np.array(columns["close"], dtype=float)
+        return {
+            "date": [columns["date"][i] for i in starts],
+            "open": _to_list(open_[starts]),
+            "high": _to_list(np.fmax.reduceat(np.array(columns["high"], dtype=float), starts)),
+            "low": _to_list(np.fmin.reduceat(np.array(columns["low"], dtype=float), starts)),
+            "close": _to_list(close[ends - 1]),
+            "volume": np.add.reduceat(np.array(columns["volume"], dtype=np.int64), starts).tolist(),
+        }
+    
+    raise ValueError(f"Unsupported reducer '{reducer}'")
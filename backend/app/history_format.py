@@ -0,0 +1,46 @@
+import json
+from typing import Iterator, List
+import numpy as np
+import pandas as pd
+
+HISTORY_COLUMNS = ["date", "open", "high", "low", "close", "volume"]
+
+
+def history_columns(records: List[dict]) -> dict:
+    """
+    Convert history records (provider or Mongo) into one list per field.
+    Conversion happens per column with NumPy instead of per row.
+    """
+    frame = pd.DataFrame.from_records(records, columns=HISTORY_COLUMNS)
+    dates = pd.to_datetime(frame["date"], utc=True).to_numpy(dtype="datetime64[s]")
+    columns = {"date": [d + "Z" for d in np.datetime_as_string(dates, unit="s")]}
+    for col in ("open", "high", "low", "close"):
+        values = frame[col].to_numpy(dtype=float)
+        nan = np.isnan(values)
+        # NaN is not valid JSON
+        columns[col] = np.where(nan, None, values).tolist() if nan.any() else values.tolist()
+    columns["volume"] = frame["volume"].fillna(0).to_numpy(dtype="int64").tolist()
+    return columns
+
+
+def to_rows_json(columns: dict) -> str:
+    """[{date, open, high, low, close, volume}, ...] - same shape as list[HistoricalPriceRead]"""
+    return json.dumps([dict(zip(HISTORY_COLUMNS, row)) for row in zip(*(columns[c] for c in HISTORY_COLUMNS))])
+
+
+def to_columns_json(columns: dict) -> str:
+    """{date: [...], open: [...], ...} - one array per field, much smaller and faster to parse"""
+    return json.dumps(columns)
+
+
+def iter_ndjson(columns: dict, chunk_size: int = 1000) -> Iterator[str]:
+    """One JSON object per line, serialized chunk by chunk for streaming responses"""
+    rows = zip(*(columns[c] for c in HISTORY_COLUMNS))
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps(dict(zip(HISTORY_COLUMNS, row))))
+        if len(chunk) == chunk_size:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
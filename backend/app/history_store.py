@@ -0,0 +1,158 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import pandas as pd
+from .config import settings
+from .cache import TTLCache
+from .downsample import downsample
+from .history_format import history_columns
+from logging import getLogger
+logger = getLogger("watcher")
+
+# Intervals served from the local store; intraday intervals go straight to the
+# provider since Yahoo only keeps a few days/weeks of them
+STORED_INTERVALS = ("1d", "5d", "1wk", "1mo", "3mo")
+
+# Gap before the first stored bar that is still considered covered: bars are
+# only published on trading days, so a period start rarely hits a bar exactly
+HEAD_TOLERANCE = {
+    "1d": timedelta(days=5),
+    "5d": timedelta(days=7),
+    "1wk": timedelta(days=7),
+    "1mo": timedelta(days=31),
+    "3mo": timedelta(days=92),
+}
+
+# Start date used to download everything before the stored range ('max')
+EARLIEST = datetime(1900, 1, 1)
+
+PERIOD_OFFSETS = {
+    "1d": pd.DateOffset(days=1),
+    "5d": pd.DateOffset(days=5),
+    "1mo": pd.DateOffset(months=1),
+    "3mo": pd.DateOffset(months=3),
+    "6mo": pd.DateOffset(months=6),
+    "1y": pd.DateOffset(years=1),
+    "2y": pd.DateOffset(years=2),
+    "5y": pd.DateOffset(years=5),
+    "10y": pd.DateOffset(years=10),
+}
+
+
+def _utc_naive(dt: datetime) -> datetime:
+    """Normalize to naive UTC, the form pymongo returns datetimes in"""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def period_start(period: str, now: Optional[datetime] = None) -> Optional[datetime]:
+    """First date covered by a Yahoo period string (naive UTC); None means 'max'"""
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    if period == "max":
+        return None
+    if period == "ytd":
+        return datetime(now.year, 1, 1)
+    offset = PERIOD_OFFSETS.get(period)
+    if offset is None:
+        raise ValueError(f"Unsupported period '{period}'")
+    return (pd.Timestamp(now) - offset).to_pydatetime()
+
+
+class HistoryStore:
+    """
+    Persistent OHLCV history per (ticker, interval) with delta refresh.
+    
+    The first request downloads the requested period; later requests for any
+    period are answered from the Mongo history collection and only the missing
+    head (older bars) or a stale tail (bars since the last refresh) are
+    downloaded from the provider.
+    """
+    
+    def __init__(self, repo, provider):
+        self.repo = repo
+        self.provider = provider
+        # (ticker, period, interval, max_points, reducer) -> downsampled columns
+        self.chart_cache = TTLCache(settings.HISTORY_CHART_CACHE_SIZE)
+    
+    def get_history_columns(self, ticker: str, period: str = "1y", interval: str = "1d",
+                            max_points: Optional[int] = None, reducer: str = "lttb") -> dict:
+        """
+        History as columns ({date: [], open: [], ...}), optionally downsampled to
+        max_points. Downsampled series are cached until the stored data can change.
+        """
+        if not max_points:
+            return history_columns(self.get_history(ticker, period, interval))
+        
+        key = (ticker, period, interval, max_points, reducer)
+        columns = self.chart_cache.get(key)
+        if columns is None:
+            columns = downsample(history_columns(self.get_history(ticker, period, interval)), max_points, reducer)
+            # Stored daily bars change on tail refresh, intraday bars on every tick
+            ttl_minutes = settings.HISTORY_REFRESH_MINUTES if interval in STORED_INTERVALS else settings.CHECK_INTERVAL_MINUTES
+            self.chart_cache.set(key, columns, ttl_minutes * 60)
+        return columns
+    
+    def get_history(self, ticker: str, period: str = "1y", interval: str = "1d") -> list:
+        if interval not in STORED_INTERVALS:
+            return self.provider.get_historical_prices(ticker, period, interval)
+        
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        start = period_start(period, now)
+        coverage = self.repo.get_history_coverage(ticker, interval)
+        
+        try:
+            if coverage is None:
+                coverage = self._fetch_initial(ticker, period, interval, start, now)
+            else:
+                coverage = self._fill_head(ticker, interval, start, coverage, now)
+                coverage = self._refresh_tail(ticker, interval, coverage, now)
+        except Exception as e:
+            logger.error(f"Error refreshing history for {ticker}: {e}")
+            if coverage is None:
+                return []
+        
+        return self.repo.get_history(ticker, interval, start)
+    
+    def _fetch_initial(self, ticker: str, period: str, interval: str, start: Optional[datetime], now: datetime) -> Optional[dict]:
+        hist = self.provider.get_historical_range(ticker, interval, period=period)
+        if hist.empty:
+            return None
+        self._store(ticker, interval, hist)
+        first = _utc_naive(hist.index[0].to_pydatetime())
+        # Bars starting well after the requested start mean the listing is younger than the period
+        head_complete = start is None or first > start + HEAD_TOLERANCE[interval]
+        return self._save_coverage(ticker, interval, first, head_complete, now)
+    
+    def _fill_head(self, ticker: str, interval: str, start: Optional[datetime], coverage: dict, now: datetime) -> dict:
+        if coverage["head_complete"]:
+            return coverage
+        if start is not None and start >= coverage["start"] - HEAD_TOLERANCE[interval]:
+            return coverage
+        
+        # Download only the range before the first stored bar
+        hist = self.provider.get_historical_range(ticker, interval, start=start or EARLIEST, end=coverage["start"])
+        logger.info(f"History head fill for {ticker} {interval}: {len(hist)} bars")
+        self._store(ticker, interval, hist)
+        first = _utc_naive(hist.index[0].to_pydatetime()) if not hist.empty else coverage["start"]
+        # Nothing (or nothing near the requested start) before the stored range: the listing starts there
+        head_complete = start is None or first > start + HEAD_TOLERANCE[interval]
+        return self._save_coverage(ticker, interval, min(first, coverage["start"]), head_complete, coverage["refreshed_at"])
+    
+    def _refresh_tail(self, ticker: str, interval: str, coverage: dict, now: datetime) -> dict:
+        if now - coverage["refreshed_at"] < timedelta(minutes=settings.HISTORY_REFRESH_MINUTES):
+            return coverage
+        # Re-download from the last stored bar: it may have been incomplete
+        last = self.repo.get_history_last_date(ticker, interval) or coverage["start"]
+        hist = self.provider.get_historical_range(ticker, interval, start=last)
+        logger.info(f"History tail refresh for {ticker} {interval}: {len(hist)} bars")
+        self._store(ticker, interval, hist)
+        return self._save_coverage(ticker, interval, coverage["start"], coverage["head_complete"], now)
+    
+    def _store(self, ticker: str, interval: str, hist: pd.DataFrame):
+        if not hist.empty:
+            self.repo.upsert_history(ticker, interval, self.provider.to_records(hist))
+    
+    def _save_coverage(self, ticker: str, interval: str, start: datetime, head_complete: bool, refreshed_at: datetime) -> dict:
+        coverage = {"start": start, "head_complete": head_complete, "refreshed_at": refreshed_at}
+        self.repo.set_history_coverage(ticker, interval, **coverage)
+        return coverage
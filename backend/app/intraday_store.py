@@ -0,0 +1,78 @@
+import threading
+from typing import Dict, Iterable, Optional
+import numpy as np
+import pandas as pd
+
+
+class IntradayBarStore:
+    """
+    In-memory store of today's 1m bars, keyed by Yahoo symbol.
+    
+    The provider only downloads bars newer than the last stored timestamp and
+    merges them here; price, open and the day's high/low are computed locally.
+    Bars from a previous session are dropped as soon as a newer session starts.
+    """
+    
+    def __init__(self):
+        self._bars: Dict[str, pd.DataFrame] = {}
+        # Provider batches run in worker threads
+        self._lock = threading.Lock()
+    
+    def get(self, symbol: str) -> Optional[pd.DataFrame]:
+        with self._lock:
+            return self._bars.get(symbol)
+    
+    def last_timestamp(self, symbol: str) -> Optional[pd.Timestamp]:
+        bars = self.get(symbol)
+        if bars is None or bars.empty:
+            return None
+        return bars.index[-1]
+    
+    def append(self, symbol: str, new_bars: pd.DataFrame) -> pd.DataFrame:
+        """Merge freshly downloaded bars and return today's bars for the symbol"""
+        with self._lock:
+            bars = self._bars.get(symbol)
+            if new_bars is not None and not new_bars.empty:
+                if bars is None or bars.empty:
+                    bars = new_bars
+                else:
+                    # Stored bars from the first new timestamp on may have been incomplete:
+                    # the downloaded copies replace them
+                    bars = pd.concat([bars[bars.index < new_bars.index[0]], new_bars])
+                # Keep only the most recent session
+                session_start = bars.index[-1].normalize()
+                if bars.index[0] < session_start:
+                    bars = bars[bars.index >= session_start]
+                self._bars[symbol] = bars
+            return bars
+    
+    def day_range(self, symbol: str) -> tuple[Optional[float], Optional[float]]:
+        """Returns (day_high, day_low) from the stored bars"""
+        bars = self.get(symbol)
+        if bars is None or bars.empty:
+            return None, None
+        return float(bars['High'].max()), float(bars['Low'].min())
+    
+    def volatility(self, symbol: str, window: int = 30) -> Optional[float]:
+        """Standard deviation of the last window 1m log returns, None with too few bars"""
+        bars = self.get(symbol)
+        if bars is None or len(bars) < 6:
+            return None
+        close = bars['Close'].to_numpy(dtype=float)[-(window + 1):]
+        return float(np.std(np.diff(np.log(close)), ddof=1))
+    
+    def retain(self, symbols: Iterable[str]) -> int:
+        """Drop the bars of every symbol not in symbols; returns how many were dropped"""
+        keep = set(symbols)
+        with self._lock:
+            dropped = [s for s in self._bars if s not in keep]
+            for symbol in dropped:
+                del self._bars[symbol]
+        return len(dropped)
+    
+    def clear(self, symbol: Optional[str] = None):
+        with self._lock:
+            if symbol is None:
+                self._bars.clear()
+            else:
+                self._bars.pop(symbol, None)
@@ -0,0 +1,84 @@
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from .models import PriceCache
+
+
+class LevelIndex:
+    """
+    Sorted price levels of a watch.
+    Nearest-level lookups and range queries are bisections, so evaluating a
+    watch with hundreds of levels costs O(log n) instead of a scan.
+    """
+
+    def __init__(self, levels: Sequence[float]):
+        self.levels: List[float] = sorted(set(levels))
+
+    def __len__(self) -> int:
+        return len(self.levels)
+
+    def nearest(self, price: float) -> Optional[float]:
+        """Level closest to price; ties go to the lower level"""
+        if not self.levels:
+            return None
+        i = bisect_left(self.levels, price)
+        if i == 0:
+            return self.levels[0]
+        if i == len(self.levels):
+            return self.levels[-1]
+        below, above = self.levels[i - 1], self.levels[i]
+        return below if price - below <= above - price else above
+
+    def between(self, low: float, high: float) -> List[float]:
+        """Levels in [low, high]"""
+        return self.levels[bisect_left(self.levels, low):bisect_right(self.levels, high)]
+
+    def crossed(self, previous: Optional[PriceCache], current: PriceCache) -> List[float]:
+        """
+        Levels the price reached or crossed since the previous observation.
+        The traded range is the segment between the two prices, extended to the
+        session high/low when they moved in between: a new day high means the
+        price went up there and came back. When the previous observation is
+        from another session, the whole current session range counts.
+        A level equal to the previous price was already reached and is left out.
+        """
+        if previous is None or not self.levels:
+            return []
+        low, high = traded_range(previous, current)
+        return [level for level in self.between(low, high) if level != previous.price]
+
+
+def traded_range(previous: PriceCache, current: PriceCache) -> Tuple[float, float]:
+    """(low, high) of the prices traded between two observations of a ticker"""
+    low, high = min(previous.price, current.price), max(previous.price, current.price)
+    same_session = session_date(previous.asof, current.timezone) == session_date(current.asof, current.timezone)
+    # Within a session the extremes only count once they move: without a previous
+    # high/low to compare with, levels touched earlier in the day would alert again
+    if current.day_high is not None and (not same_session or (previous.day_high is not None and current.day_high > previous.day_high)):
+        high = max(high, current.day_high)
+    if current.day_low is not None and (not same_session or (previous.day_low is not None and current.day_low < previous.day_low)):
+        low = min(low, current.day_low)
+    return low, high
+
+
+def session_date(asof: datetime, timezone_name: str) -> date:
+    """Exchange-local date of asof; naive datetimes (as read back from MongoDB) are UTC"""
+    if asof.tzinfo is None:
+        asof = asof.replace(tzinfo=timezone.utc)
+    try:
+        tz = ZoneInfo(timezone_name)
+    except (ZoneInfoNotFoundError, ValueError):
+        tz = timezone.utc
+    return asof.astimezone(tz).date()
+
+
+@lru_cache(maxsize=4096)
+def _cached_index(levels: Tuple[float, ...]) -> LevelIndex:
+    return LevelIndex(levels)
+
+
+def level_index(levels: Sequence[float]) -> LevelIndex:
+    """Shared LevelIndex for a list of levels, sorted once and reused across ticks"""
+    return _cached_index(tuple(levels))
@@ -1,20 +1,42 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+import asyncio
+import time
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
+from apscheduler.triggers.cron import CronTrigger
 from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, timezone
 from logging import getLogger
 from .config import settings
 from .repository import Repo
+from .async_repository import AsyncRepo, ThreadedAsyncRepo
+from .sqlite_repository import SqliteRepo
 from .models import Watch
-from .schemas import StatusRead, WatchCreate, InfoRead, StockDetailsRead, HistoricalPriceRead
+from .schemas import StatusRead, WatchCreate, InfoRead, StockDetailsRead, HistoricalPriceRead, TickerValidationRequest, TickerValidationRead, TickOutcomeRead, ShardStatusRead, QuoteHistoryRead
 from .data_provider import PriceProvider
+from .metadata_cache import MetadataCache
+from .single_flight import SingleFlightProvider
+from .upstream_guard import GuardedProvider, TokenBucket, CircuitBreaker
+from .ticker_validator import TickerValidator
+from .poll_scheduler import PollScheduler
 from .telegram_notifier import Telegram
 from .watcher import Watcher
+from .tick_executor import TickExecutor
+from .sharding import ShardCoordinator, default_replica_id
+from .alert_state import AlertStore
+from .repo_snapshot import RepoSnapshot, AsyncRepoSnapshot
+from .quote_history import QuoteHistory
+from .notification_dispatcher import NotificationDispatcher
 from .ws import WSManager
 from .stock_service import StockService
-from .utils import get_aggregated_market_status
+from .history_store import HistoryStore
+from .details_cache import DetailsCache
+from .history_format import to_rows_json, to_columns_json, iter_ndjson
+from .downsample import REDUCERS
+from .utils import get_aggregated_market_status, get_market_state
+from .metrics import REGISTRY, HTTP_LATENCY, PROVIDER_LATENCY, PROVIDER_METHODS, REPO_LATENCY, TimedProxy, cache_gauges
 
 logger = getLogger("main")
 
@@ -22,10 +44,23 @@ logger = getLogger("main")
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    if snapshot:
+        await asyncio.to_thread(snapshot.start)
+    await asyncio.to_thread(alerts.load)
+    dispatcher.start()
+    if shard:
+        # Take this replica's partitions before the first tick
+        await shard_heartbeat()
     scheduler.start()
     yield
     # Shutdown
     scheduler.shutdown()
+    await dispatcher.stop()
+    if snapshot:
+        snapshot.stop()
+    if shard:
+        await asyncio.to_thread(shard.leave)
+    await async_repo.close()
 
 
 app = FastAPI(title="Stocks Watcher", lifespan=lifespan)
@@ -37,15 +72,150 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-repo = Repo(settings.MONGODB_URL, settings.MONGODB_DB_NAME)
-provider = PriceProvider(settings.TICKER_MAP)
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template (/stocks/{ticker}/details), not by the concrete path
+    route = request.scope.get("route")
+    HTTP_LATENCY.observe(time.perf_counter() - start, request.method, getattr(route, "path", "unmatched"), str(response.status_code))
+    return response
+
+
+mongo_options = {
+    "maxPoolSize": settings.MONGODB_MAX_POOL_SIZE,
+    "minPoolSize": settings.MONGODB_MIN_POOL_SIZE,
+    "maxConnecting": settings.MONGODB_MAX_CONNECTING,
+    "maxIdleTimeMS": int(settings.MONGODB_MAX_IDLE_SECONDS * 1000) or None,
+    "waitQueueTimeoutMS": int(settings.MONGODB_WAIT_QUEUE_TIMEOUT_SECONDS * 1000) or None,
+    "serverSelectionTimeoutMS": int(settings.MONGODB_SERVER_SELECTION_TIMEOUT_SECONDS * 1000),
+}
+if settings.STORAGE_BACKEND == "mongodb":
+    storage = Repo(settings.MONGODB_URL, settings.MONGODB_DB_NAME, settings.QUOTE_RETENTION_DAYS * 86400, **mongo_options)
+elif settings.STORAGE_BACKEND == "sqlite":
+    storage = SqliteRepo(settings.SQLITE_PATH, settings.QUOTE_RETENTION_DAYS * 86400)
+else:
+    raise ValueError(f"Unknown STORAGE_BACKEND '{settings.STORAGE_BACKEND}': use mongodb or sqlite")
+# Latency of every Repo method and of every upstream provider call is recorded for /metrics
+repo = TimedProxy(storage, REPO_LATENCY)
+# Watches and prices are read from memory; only the writes and the snapshot loads reach the database
+snapshot = RepoSnapshot(repo, settings.SNAPSHOT_POLL_SECONDS) if settings.SNAPSHOT_ENABLED else None
+repo = snapshot or repo
+# Async routes and the watcher await this one; the blocking repo serves the caches, stores and jobs run in threads.
+# SQLite calls are local and short: they run in worker threads
+if settings.STORAGE_BACKEND == "mongodb" and settings.MONGODB_ASYNC_ENABLED:
+    async_repo = TimedProxy(AsyncRepo(settings.MONGODB_URL, settings.MONGODB_DB_NAME, **mongo_options), REPO_LATENCY)
+    async_repo = AsyncRepoSnapshot(snapshot, async_repo) if snapshot else async_repo
+else:
+    async_repo = ThreadedAsyncRepo(repo)
+metadata_cache = MetadataCache(
+    settings.METADATA_CACHE_TTL_SECONDS,
+    settings.METADATA_CACHE_MAX_SIZE,
+    repo if settings.METADATA_CACHE_PERSIST else None,
+)
+# Rate limiter and circuit breaker shared by all provider methods
+guarded_provider = GuardedProvider(
+    TimedProxy(PriceProvider(settings.TICKER_MAP, metadata_cache), PROVIDER_LATENCY, PROVIDER_METHODS),
+    TokenBucket(settings.PROVIDER_RATE_PER_SECOND, settings.PROVIDER_RATE_BURST),
+    CircuitBreaker(settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_RESET_SECONDS, settings.CIRCUIT_FAILURE_RATIO),
+    settings.PROVIDER_RATE_MAX_WAIT_SECONDS,
+)
+# Concurrent identical provider calls (browser tabs, /status vs. scheduled tick) share one fetch
+provider = SingleFlightProvider(guarded_provider)
 notifier = Telegram(settings.TELEGRAM_BOT_TOKEN, settings.TELEGRAM_CHAT_ID)
 ws_manager = WSManager()
-stock_service = StockService(repo, provider)
-watcher = Watcher(repo, provider, notifier, ws_manager, stock_service)
+ticker_validator = TickerValidator(
+    provider,
+    settings.VALIDATION_VALID_TTL_SECONDS,
+    settings.VALIDATION_INVALID_TTL_SECONDS,
+    settings.VALIDATION_CACHE_MAX_SIZE,
+)
+stock_service = StockService(repo, provider, async_repo, ticker_validator)
+history_store = HistoryStore(repo, provider)
+quote_history = QuoteHistory(repo, settings.QUOTE_RETENTION_DAYS * 86400)
+details_cache = DetailsCache(
+    provider,
+    settings.DETAILS_PRICE_TTL_SECONDS,
+    settings.DETAILS_FUNDAMENTALS_TTL_SECONDS,
+    settings.DETAILS_CACHE_MAX_SIZE,
+)
+poller = None
+if settings.ADAPTIVE_POLLING:
+    poller = PollScheduler(settings.POLL_MIN_SECONDS, settings.POLL_MAX_SECONDS, settings.POLL_REQUESTS_PER_MINUTE)
+shard = None
+if settings.SHARDING_ENABLED:
+    shard = ShardCoordinator(repo, settings.SHARD_REPLICA_ID or default_replica_id(),
+                             settings.SHARD_PARTITIONS, settings.SHARD_LEASE_SECONDS)
+alerts = AlertStore(repo, async_repo)
+dispatcher = NotificationDispatcher(notifier, settings.TELEGRAM_QUEUE_SIZE, settings.TELEGRAM_MESSAGES_PER_MINUTE,
+                                    settings.TELEGRAM_MAX_RETRIES)
+watcher = Watcher(repo, provider, notifier, ws_manager, stock_service, poller=poller, shard=shard, alerts=alerts,
+                  dispatcher=dispatcher, async_repo=async_repo)
+
+# Frequent ticks that only fetch the watches due for a poll, or every watch each CHECK_INTERVAL_MINUTES
+tick_interval_seconds = settings.POLL_TICK_SECONDS if poller else settings.CHECK_INTERVAL_MINUTES * 60
+tick_executor = TickExecutor(watcher, settings.TICK_DEADLINE_SECONDS or tick_interval_seconds, settings.TICK_HISTORY_SIZE)
+
+cache_gauges({
+    "metadata": metadata_cache.stats,
+    "details": details_cache.stats,
+    "validation": ticker_validator.stats,
+    "history_chart": history_store.chart_cache.stats,
+})
+REGISTRY.gauge("provider_calls_total", "Provider calls per method, including coalesced ones", ("method",),
+               lambda: {(m,): s["calls"] for m, s in provider.flight.stats().items()}, "counter")
+REGISTRY.gauge("provider_coalesced_total", "Provider calls served by another caller's in-flight fetch", ("method",),
+               lambda: {(m,): s["coalesced"] for m, s in provider.flight.stats().items()}, "counter")
+REGISTRY.gauge("upstream_rejected_total", "Provider calls not attempted because of the rate limiter or open circuit", (),
+               lambda: {(): guarded_provider.rejected}, "counter")
+REGISTRY.gauge("ws_clients", "Connected WebSocket clients", (), lambda: {(): len(ws_manager.active)})
+REGISTRY.gauge("notifications_total", "Telegram digest messages by outcome: sent, retried, failed, dropped", ("outcome",),
+               lambda: {(k,): v for k, v in dispatcher.stats().items() if k != "pending"}, "counter")
+if snapshot:
+    REGISTRY.gauge("repo_snapshot_events_total", "Snapshot full reloads and change stream events applied", ("event",),
+                   lambda: {("reload",): snapshot.reloads, ("change",): snapshot.changes}, "counter")
+REGISTRY.gauge("notifications_pending", "Telegram digest messages waiting in the queue", (), lambda: {(): dispatcher.pending()})
 
 scheduler = AsyncIOScheduler()
-scheduler.add_job(watcher.tick_async, trigger=IntervalTrigger(minutes=settings.CHECK_INTERVAL_MINUTES))
+# A second instance may start while a tick runs: the executor coalesces it instead of APScheduler dropping it silently
+scheduler.add_job(tick_executor.run, trigger=IntervalTrigger(seconds=tick_interval_seconds), max_instances=2)
+
+
+def warm_up_details():
+    """
+    Refresh the details cache of every watched ticker once markets have closed.
+    Runs on every replica: each one has its own cache and serves any ticker.
+    """
+    details_cache.warm_up([w.ticker for w in repo.list_watches()])
+
+
+scheduler.add_job(warm_up_details, trigger=CronTrigger(day_of_week="mon-fri", hour=settings.DETAILS_WARMUP_HOUR_UTC, timezone="UTC"))
+
+
+async def shard_heartbeat():
+    try:
+        await asyncio.to_thread(shard.heartbeat)
+    except Exception as e:
+        # Leases keep running out locally: without heartbeats this replica stops polling
+        logger.error(f"Shard heartbeat failed: {e}")
+
+
+def rollup_quotes():
+    """Recompute the 5m/1h/1d bars of the recent quotes"""
+    if shard and not shard.is_leader():
+        return
+    try:
+        quote_history.rollup()
+    except Exception as e:
+        logger.error(f"Quote rollup failed: {e}")
+
+
+scheduler.add_job(rollup_quotes, trigger=IntervalTrigger(seconds=settings.QUOTE_ROLLUP_SECONDS))
+
+
+if shard:
+    scheduler.add_job(shard_heartbeat, trigger=IntervalTrigger(seconds=settings.SHARD_HEARTBEAT_SECONDS))
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
@@ -58,48 +228,67 @@ async def websocket_endpoint(websocket: WebSocket):
         ws_manager.disconnect(websocket)
 
 @app.get("/watches")
-def list_watches():
-    return repo.list_watches()
+async def list_watches():
+    return await async_repo.list_watches()
 
 
 @app.post("/watches")
-def upsert_watch(payload: WatchCreate):
-    # Validate ticker exists on Yahoo Finance
-    if not provider.validate_ticker(payload.ticker):
-        raise HTTPException(status_code=400, detail=f"Ticker '{payload.ticker}' not found on Yahoo Finance")
+async def upsert_watch(payload: WatchCreate):
+    # Validate ticker exists on Yahoo Finance; editing the levels of an existing watch needs no check
+    if await async_repo.get_watch(payload.ticker) is None:
+        try:
+            valid = await asyncio.to_thread(ticker_validator.validate, payload.ticker)
+        except Exception as e:
+            raise HTTPException(status_code=503, detail=f"Could not validate '{payload.ticker}': {e}")
+        if not valid:
+            raise HTTPException(status_code=400, detail=f"Ticker '{payload.ticker}' not found on Yahoo Finance")
     
-    return repo.upsert_watch(Watch(ticker=payload.ticker, levels=payload.levels, enabled=payload.enabled))
+    return await async_repo.upsert_watch(Watch(ticker=payload.ticker, levels=payload.levels, enabled=payload.enabled))
+
+
+@app.post("/watches/validate", response_model=TickerValidationRead)
+def validate_tickers(payload: TickerValidationRequest):
+    """Check many tickers at once, e.g. before importing a list of watches"""
+    try:
+        result = ticker_validator.validate_many(payload.tickers)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Could not validate tickers: {e}")
+    return TickerValidationRead(
+        valid=[t for t, ok in result.items() if ok],
+        invalid=[t for t, ok in result.items() if not ok],
+    )
 
 
 @app.delete("/watches/{ticker}")
-def delete_watch(ticker: str):
+async def delete_watch(ticker: str):
     """Delete a watch by ticker"""
-    result = repo.delete_watch(ticker)
+    result = await async_repo.delete_watch(ticker)
     if not result:
         raise HTTPException(status_code=404, detail=f"Watch '{ticker}' not found")
     return {"message": f"Watch '{ticker}' deleted successfully"}
 
 
 @app.get("/status", response_model=list[StatusRead])
-def status(forceRefresh: bool = False):
-    out = []
+async def status(forceRefresh: bool = False):
     fetched_any = False
     
-    for w in repo.list_watches():
-        try:
-            pc, was_fetched = stock_service.get_price(w.ticker, force_update=forceRefresh)
-            if not pc:
-                continue
-            
-            if was_fetched:
-                fetched_any = True
-            
-            # Use StockService to create status with all calculations
-            status_read = StockService.create_status_read(w.ticker, pc, w.levels)
-            out.append(status_read)
-        except Exception as e:
-            logger.error(str(e))
+    watches = await async_repo.list_watches()
+    prices, errors = await stock_service.get_prices_async([w.ticker for w in watches], force_update=forceRefresh)
+    for ticker, error in errors.items():
+        logger.error(f"Failed to fetch price for {ticker}: {error}")
+    
+    entries = []
+    for w in watches:
+        if w.ticker not in prices:
             continue
+        pc, was_fetched = prices[w.ticker]
+        
+        if was_fetched:
+            fetched_any = True
+        entries.append((w.ticker, pc, w.levels))
+    
+    # All statuses in one batch; response_model validates the dicts
+    out = StockService.evaluate_statuses(entries)
     
     # Update last_update if we fetched any new prices
     if fetched_any:
@@ -109,23 +298,27 @@ def status(forceRefresh: bool = False):
 
 
 @app.get("/info", response_model=InfoRead)
-def info():
+async def info():
     last_update = watcher.last_update
     next_update = datetime.now(timezone.utc) + timedelta(minutes=settings.CHECK_INTERVAL_MINUTES)
     if last_update:
         next_update = last_update + timedelta(minutes=settings.CHECK_INTERVAL_MINUTES)
+    if poller and poller.next_poll():
+        next_update = poller.next_poll()
     
-    # Get timezone, exchange, and market state data from watched tickers
+    # Get timezone and exchange of watched tickers; the market state is derived from the
+    # exchange calendar now, since the cached one stops changing once polling stops at the close
     ticker_data = []
-    for w in repo.list_watches():
-        pc = repo.get_price(w.ticker)
+    now = datetime.now(timezone.utc)
+    watches = await async_repo.list_watches()
+    prices = await async_repo.get_prices([w.ticker for w in watches])
+    for w in watches:
+        pc = prices.get(w.ticker)
         if pc and pc.timezone:
-            print(f"[INFO] Ticker {w.ticker}: exchange={pc.exchange}, timezone={pc.timezone}, market_state={pc.market_state}")
-            ticker_data.append((pc.timezone, pc.exchange, pc.market_state))
+            ticker_data.append((pc.timezone, pc.exchange, get_market_state(pc.exchange, pc.timezone, now)))
     
-    # Get aggregated market status using real-time data from Yahoo Finance
     market_info = get_aggregated_market_status(ticker_data)
-    print(f"[INFO] Market info: {market_info}")
+    logger.debug(f"Market info: {market_info}")
     
     return InfoRead(
         last_update=last_update,
@@ -136,25 +329,94 @@ def info():
     )
 
 
+@app.get("/metrics")
+def metrics():
+    """Prometheus text exposition of latency histograms and cache counters"""
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/shards", response_model=ShardStatusRead)
+def shard_status():
+    """Partitions leased by this replica and the live replicas it sees"""
+    if not shard:
+        return ShardStatusRead(enabled=False)
+    return ShardStatusRead(
+        enabled=True,
+        replica_id=shard.replica_id,
+        leader=shard.is_leader(),
+        partitions=shard.partitions,
+        owned_partitions=shard.owned_partitions(),
+        live_replicas=shard.replicas,
+    )
+
+
+@app.get("/ticks", response_model=list[TickOutcomeRead])
+def list_ticks(limit: int = 20):
+    """Outcomes of the most recent watcher ticks, newest first"""
+    return [
+        TickOutcomeRead(
+            started_at=o.started_at,
+            duration_seconds=o.duration_seconds,
+            done=len(o.done),
+            failed=o.failed,
+            deferred=o.deferred,
+            skipped=o.skipped,
+            coalesced=o.coalesced,
+        )
+        for o in tick_executor.recent(limit)
+    ]
+
+
 @app.get("/stocks/{ticker}/details", response_model=StockDetailsRead)
 def get_stock_details(ticker: str):
     """Get comprehensive financial details for a stock"""
     try:
-        details = provider.get_stock_details(ticker)
+        details = details_cache.get(ticker)
         return StockDetailsRead(**details)
     except Exception as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 
+@app.get("/stocks/{ticker}/quotes", response_model=QuoteHistoryRead)
+def get_quote_history(ticker: str, start: datetime | None = None, end: datetime | None = None, points: int = 200):
+    """
+    Intraday prices recorded by the watcher, served locally without calling Yahoo Finance.
+    start/end default to the last 24 hours; the bars come from the coarsest resolution
+    (raw quotes, 5m, 1h, 1d) that still gives about `points` bars over the range.
+    """
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(days=1)
+    # Timestamps without an offset are UTC
+    start, end = (t if t.tzinfo else t.replace(tzinfo=timezone.utc) for t in (start, end))
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    resolution, bars = quote_history.query(ticker, start, end, points)
+    return QuoteHistoryRead(ticker=ticker, resolution=resolution, bars=bars)
+
+
 @app.get("/stocks/{ticker}/history", response_model=list[HistoricalPriceRead])
-def get_stock_history(ticker: str, period: str = "1y", interval: str = "1d"):
+def get_stock_history(ticker: str, period: str = "1y", interval: str = "1d", format: str = "rows",
+                      max_points: int | None = Query(None, ge=3), reducer: str = "lttb"):
     """
     Get historical price data for charting
     period: 1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, 10y, ytd, max
     interval: 1m, 2m, 5m, 15m, 30m, 60m, 90m, 1h, 1d, 5d, 1wk, 1mo, 3mo
+    format: rows (list of HistoricalPriceRead), columns ({date: [], open: [], ...}) or ndjson (streamed, one row per line)
+    max_points: downsample the series to at most this many points (at least 3, the first and last point plus one)
+    reducer: lttb (keeps the shape of the close line) or ohlc (merges buckets into OHLC bars)
     """
+    if format not in ("rows", "columns", "ndjson"):
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{format}'")
+    if reducer not in REDUCERS:
+        raise HTTPException(status_code=400, detail=f"Unsupported reducer '{reducer}'")
     try:
-        history = provider.get_historical_prices(ticker, period, interval)
-        return [HistoricalPriceRead(**item) for item in history]
+        columns = history_store.get_history_columns(ticker, period, interval, max_points, reducer)
     except Exception as e:
-        raise HTTPException(status_code=404, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    # Serialize the whole series at once instead of validating one model per row
+    if format == "columns":
+        return Response(to_columns_json(columns), media_type="application/json")
+    if format == "ndjson":
+        return StreamingResponse(iter_ndjson(columns), media_type="application/x-ndjson")
+    return Response(to_rows_json(columns), media_type="application/json")
@@ -0,0 +1,82 @@
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from .models import PriceCache, Watch
+from .utils import EXCHANGE_INFO, get_market_status_for_timezone
+from logging import getLogger
+logger = getLogger("watcher")
+
+# Configurable session names -> market status returned by utils
+SESSIONS = {
+    'pre': 'pre-market',
+    'regular': 'open',
+    'post': 'after-hours',
+}
+
+# Timezones get_market_status_for_timezone has generic trading hours for
+GENERIC_CALENDAR_TIMEZONES = (
+    'America/New_York', 'Europe/London', 'Europe/Paris', 'Europe/Rome', 'Europe/Berlin',
+    'Asia/Tokyo', 'Asia/Hong_Kong', 'Asia/Shanghai',
+)
+
+
+# Group of the watches without known trading hours, polled on UTC weekdays
+UNKNOWN_CALENDAR = ('Unknown', 'UTC')
+
+
+def has_calendar(exchange: str, timezone_name: str) -> bool:
+    """Whether trading hours are known for this exchange/timezone"""
+    return exchange in EXCHANGE_INFO or timezone_name in GENERIC_CALENDAR_TIMEZONES
+
+
+class MarketSchedule:
+    """
+    Decides which watches a tick should poll.
+    Watches are grouped by the exchange and timezone of their cached price; a
+    group is polled while its market is in one of the configured sessions, plus
+    once more on the first tick after it leaves them, for the closing snapshot.
+    Watches without a cached price, or on exchanges without known trading hours,
+    form one more group polled on UTC weekdays.
+    """
+
+    def __init__(self, sessions: List[str]):
+        unknown = set(sessions) - set(SESSIONS)
+        if unknown:
+            raise ValueError(f"Unknown market sessions: {sorted(unknown)}, expected some of {list(SESSIONS)}")
+        self.statuses = {SESSIONS[s] for s in sessions}
+        # (exchange, timezone) -> whether the group was in session at its last evaluation
+        self._in_session: Dict[Tuple[str, str], bool] = {}
+        self._lock = threading.Lock()
+
+    def plan(self, watches: List[Watch], prices: Dict[str, Optional[PriceCache]], now: datetime) -> Tuple[List[Watch], List[Watch], List[Watch]]:
+        """Split watches into (in session, closing snapshot, skipped) at time now (timezone-aware)"""
+        groups: Dict[Tuple[str, str], List[Watch]] = {}
+        for w in watches:
+            pc = prices.get(w.ticker)
+            if pc is None or not has_calendar(pc.exchange, pc.timezone):
+                groups.setdefault(UNKNOWN_CALENDAR, []).append(w)
+            else:
+                groups.setdefault((pc.exchange, pc.timezone), []).append(w)
+
+        in_session_watches: List[Watch] = []
+        closing: List[Watch] = []
+        skipped: List[Watch] = []
+        with self._lock:
+            for (exchange, timezone_name), members in groups.items():
+                if (exchange, timezone_name) == UNKNOWN_CALENDAR:
+                    in_session = now.astimezone(timezone.utc).weekday() < 5
+                    status = 'open' if in_session else 'closed'
+                else:
+                    status, _ = get_market_status_for_timezone(timezone_name, exchange, now=now)
+                    in_session = status in self.statuses
+                # First evaluation after startup counts as a close, so closed markets get one snapshot
+                was_in_session = self._in_session.get((exchange, timezone_name), True)
+                self._in_session[(exchange, timezone_name)] = in_session
+                if in_session:
+                    in_session_watches.extend(members)
+                elif was_in_session:
+                    logger.info(f"{exchange} ({timezone_name}) is {status}: closing snapshot of {len(members)} watches")
+                    closing.extend(members)
+                else:
+                    skipped.extend(members)
+        return in_session_watches, closing, skipped
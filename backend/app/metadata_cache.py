@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from .cache import TTLCache
+from logging import getLogger
+logger = getLogger("watcher")
+
+
+class MetadataCache:
+    """
+    LRU cache with TTL for static per-symbol metadata (currency, exchange, timezone).
+    
+    These fields almost never change, so they are fetched from Yahoo once per TTL
+    instead of on every tick. When a repo is given, entries are also persisted in
+    the Mongo prices collection so they survive restarts.
+    """
+    
+    FIELDS = ("currency", "exchange", "timezone")
+    
+    def __init__(self, ttl_seconds: int = 86400, max_size: int = 2048, repo=None):
+        self.ttl_seconds = ttl_seconds
+        self.repo = repo
+        self._memory = TTLCache(max_size, ttl_seconds)
+    
+    def get(self, ticker: str) -> Optional[dict]:
+        """Return cached metadata for ticker, or None if missing or expired"""
+        meta = self._memory.get(ticker)
+        if meta is None:
+            meta = self._load(ticker)
+        return meta
+    
+    def set(self, ticker: str, meta: dict):
+        """Store metadata for ticker in memory and, if configured, in Mongo"""
+        meta = {k: meta.get(k) for k in self.FIELDS}
+        self._memory.set(ticker, meta)
+        if self.repo is not None:
+            try:
+                self.repo.set_metadata(ticker, meta)
+            except Exception as e:
+                logger.warning(f"Failed to persist metadata for {ticker}: {e}")
+    
+    def stats(self) -> dict:
+        return self._memory.stats()
+    
+    def invalidate(self, ticker: str):
+        self._memory.invalidate(ticker)
+    
+    def _load(self, ticker: str) -> Optional[dict]:
+        """Load a persisted entry from Mongo if it is still within the TTL"""
+        if self.repo is None:
+            return None
+        try:
+            doc = self.repo.get_metadata(ticker)
+        except Exception as e:
+            logger.warning(f"Failed to load metadata for {ticker}: {e}")
+            return None
+        if not doc or not doc.get("metadata_updated_at"):
+            return None
+        
+        updated_at = doc["metadata_updated_at"]
+        if updated_at.tzinfo is None:
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        remaining = (updated_at + timedelta(seconds=self.ttl_seconds) - datetime.now(timezone.utc)).total_seconds()
+        if remaining <= 0:
+            return None
+        
+        meta = {k: doc.get(k) for k in self.FIELDS}
+        self._memory.set(ticker, meta, remaining)
+        return meta
@@ -0,0 +1,181 @@
+"""
+Minimal Prometheus text-format metrics.
+
+Histograms keep one list of bucket counters per label set; an observation is
+a bisect plus a few integer increments under a lock, so instrumenting hot
+paths costs microseconds. Gauges are callbacks evaluated only when /metrics
+is scraped.
+"""
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Collection, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [count per bucket..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *label_values: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.description}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for values, counts in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_labels(self.labels, values, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, values)} {counts[-1]:.6f}"
+            yield f"{self.name}_count{_labels(self.labels, values)} {cumulative}"
+
+
+class Gauge:
+    """Value computed at scrape time; fn returns {label values: value}"""
+
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...], fn: Callable[[], Dict[Tuple[str, ...], float]],
+                 kind: str = "gauge"):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.fn = fn
+        self.kind = kind
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.description}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for values, value in sorted(self.fn().items()):
+            yield f"{self.name}{_labels(self.labels, values)} {value}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list = []
+
+    def histogram(self, name: str, description: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        h = Histogram(name, description, labels, buckets)
+        self._metrics.append(h)
+        return h
+
+    def gauge(self, name: str, description: str, labels: Tuple[str, ...], fn: Callable[[], Dict[Tuple[str, ...], float]],
+              kind: str = "gauge") -> Gauge:
+        g = Gauge(name, description, labels, fn, kind)
+        self._metrics.append(g)
+        return g
+
+    def render(self) -> str:
+        return "\n".join(line for m in self._metrics for line in m.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+# PriceProvider methods that call Yahoo Finance
+PROVIDER_METHODS = (
+    "validate_ticker", "validate_many", "get_last", "get_last_many", "get_stock_details",
+    "get_stock_price_fields", "get_historical_range", "get_historical_prices",
+)
+
+PROVIDER_LATENCY = REGISTRY.histogram("provider_request_seconds", "Yahoo Finance provider call latency", ("method",))
+REPO_LATENCY = REGISTRY.histogram("mongo_operation_seconds", "Storage (MongoDB or SQLite) latency per Repo method", ("method",))
+# fetch and persist are recorded by StockService, so they also include /status refreshes
+TICK_PHASE = REGISTRY.histogram("tick_phase_seconds", "Watcher tick duration per phase: select, fetch, persist, evaluate, notify, broadcast", ("phase",))
+WS_BROADCAST = REGISTRY.histogram("ws_broadcast_seconds", "Time to send one message to every WebSocket client")
+HTTP_LATENCY = REGISTRY.histogram("http_request_seconds", "HTTP request latency per route", ("method", "route", "status"))
+
+
+class TimedProxy:
+    """
+    Wraps an object (provider, repo) and records the latency of its public
+    methods, or only of the given methods, in a histogram labelled by method
+    name. Coroutine methods are timed until they complete. Other attributes
+    pass through.
+    """
+
+    def __init__(self, target, histogram: Histogram, methods: Optional[Collection[str]] = None):
+        self._target = target
+        self._histogram = histogram
+        self._methods = methods
+        self._wrapped: Dict[str, Callable] = {}
+
+    def __getattr__(self, name: str):
+        wrapped = self._wrapped.get(name)
+        if wrapped is not None:
+            return wrapped
+        attr = getattr(self._target, name)
+        if name.startswith("_") or not callable(attr) or (self._methods is not None and name not in self._methods):
+            return attr
+
+        if inspect.iscoroutinefunction(attr):
+            # Time the awaited call, not the creation of the coroutine
+            async def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await attr(*args, **kwargs)
+                finally:
+                    self._histogram.observe(time.perf_counter() - start, name)
+        else:
+            def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return attr(*args, **kwargs)
+                finally:
+                    self._histogram.observe(time.perf_counter() - start, name)
+
+        self._wrapped[name] = timed
+        return timed
+
+
+def cache_gauges(caches: Dict[str, Callable[[], dict]]):
+    """Register hit/miss counters and hit ratio gauges for named caches; each callable returns TTLCache.stats()"""
+    def collect(field: str):
+        def fn():
+            out = {}
+            for name, stats in caches.items():
+                s = stats()
+                if field == "ratio":
+                    total = s["hits"] + s["misses"]
+                    out[(name,)] = round(s["hits"] / total, 4) if total else 0.0
+                else:
+                    out[(name,)] = s[field]
+            return out
+        return fn
+
+    REGISTRY.gauge("cache_hits_total", "Cache lookups served from memory", ("cache",), collect("hits"), "counter")
+    REGISTRY.gauge("cache_misses_total", "Cache lookups that missed or found an expired entry", ("cache",), collect("misses"), "counter")
+    REGISTRY.gauge("cache_hit_ratio", "Cache hits / lookups since start", ("cache",), collect("ratio"))
+    REGISTRY.gauge("cache_entries", "Entries currently cached", ("cache",), collect("size"))
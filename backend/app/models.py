@@ -2,19 +2,30 @@ from typing import Optional, List
 from datetime import datetime
 
 
+class AlertState:
+    level: float  # Level of the last alert
+    direction: str  # 'up' when the price was at or above the level, 'down' below
+    alerted_at: datetime
+    
+    def __init__(self, level: float, direction: str, alerted_at: datetime):
+        self.level = level
+        self.direction = direction
+        self.alerted_at = alerted_at
+
+
 class Watch:
     ticker: str
     levels: List[float]
     enabled: bool = True
-    last_alert_hash: Optional[str] = None
+    last_alert: Optional[AlertState] = None
     updated_at: datetime
     
     def __init__(self, ticker: str, levels: List[float], enabled: bool = True, 
-                 last_alert_hash: Optional[str] = None, updated_at: Optional[datetime] = None):
+                 last_alert: Optional[AlertState] = None, updated_at: Optional[datetime] = None):
         self.ticker = ticker
         self.levels = levels
         self.enabled = enabled
-        self.last_alert_hash = last_alert_hash
+        self.last_alert = last_alert
         self.updated_at = updated_at or datetime.utcnow()
 
 
@@ -27,10 +38,14 @@ class PriceCache:
     timezone: str = 'America/New_York'
     market_state: Optional[str] = None  # Yahoo's real-time market state
     open_price: Optional[float] = None  # Market opening price for daily % change
+    day_high: Optional[float] = None  # Session high from the intraday bars
+    day_low: Optional[float] = None  # Session low from the intraday bars
+    stale: bool = False  # Served from cache because the provider is unavailable
     
     def __init__(self, ticker: str, price: float, asof: datetime, currency: str = 'USD', 
                  exchange: str = 'Unknown', timezone: str = 'America/New_York',
-                 market_state: Optional[str] = None, open_price: Optional[float] = None):
+                 market_state: Optional[str] = None, open_price: Optional[float] = None,
+                 day_high: Optional[float] = None, day_low: Optional[float] = None, stale: bool = False):
         self.ticker = ticker
         self.price = price
         self.asof = asof
@@ -38,4 +53,28 @@ class PriceCache:
         self.exchange = exchange
         self.timezone = timezone
         self.market_state = market_state
-        self.open_price = open_price
\ No newline at end of file
+        self.open_price = open_price
+        self.day_high = day_high
+        self.day_low = day_low
+        self.stale = stale
+
+
+class TickOutcome:
+    started_at: datetime
+    duration_seconds: float = 0.0
+    done: List[str]  # Tickers fetched and evaluated
+    failed: List[str]  # Tickers without a fresh price
+    deferred: List[str]  # Tickers left for the next tick by the deadline
+    skipped: int = 0  # Watches outside market hours
+    coalesced: int = 0  # Overlapping runs folded into this one
+    
+    def __init__(self, started_at: datetime, duration_seconds: float = 0.0, done: Optional[List[str]] = None,
+                 failed: Optional[List[str]] = None, deferred: Optional[List[str]] = None, skipped: int = 0,
+                 coalesced: int = 0):
+        self.started_at = started_at
+        self.duration_seconds = duration_seconds
+        self.done = done or []
+        self.failed = failed or []
+        self.deferred = deferred or []
+        self.skipped = skipped
+        self.coalesced = coalesced
@@ -0,0 +1,104 @@
+import asyncio
+from typing import List, Optional
+from .telegram_notifier import Telegram, TelegramError, digest
+from .upstream_guard import TokenBucket
+from logging import getLogger
+logger = getLogger("watcher")
+
+
+class NotificationDispatcher:
+    """
+    Sends Telegram notifications in the background.
+    The watcher submits the alerts of a tick at once; they are merged into
+    digest messages and put on a bounded queue, so a slow or failing Telegram
+    API never delays a tick. A single worker sends the queue through the
+    notifier's pooled session, paced by a token bucket at Telegram's per-chat
+    limit, and retries failures with exponential backoff (or the retry_after
+    Telegram asks for on HTTP 429). When the queue is full new digests are
+    dropped and counted.
+    """
+
+    def __init__(self, notifier: Telegram, queue_size: int = 100, messages_per_minute: float = 20,
+                 max_retries: int = 5, backoff_seconds: float = 1.0):
+        self.notifier = notifier
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.limiter = TokenBucket(messages_per_minute / 60, burst=1, backoff_seconds=backoff_seconds)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def submit(self, texts: List[str]) -> int:
+        """Queue the alerts of one tick as digest messages; returns how many messages were queued"""
+        if not self.notifier.enabled or not texts:
+            return 0
+        queued = 0
+        for message in digest(texts):
+            try:
+                self._queue.put_nowait(message)
+                queued += 1
+            except asyncio.QueueFull:
+                self.dropped += 1
+                logger.warning(f"Notification queue full ({self._queue.maxsize}): digest dropped")
+        return queued
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        return {"sent": self.sent, "retried": self.retried, "failed": self.failed, "dropped": self.dropped,
+                "pending": self.pending()}
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 5.0):
+        """Give the queue up to timeout seconds to drain, then stop the worker"""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Stopping with {self.pending()} notifications unsent")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.notifier.close()
+
+    async def _run(self):
+        while True:
+            message = await self._queue.get()
+            try:
+                await self._deliver(message)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Failed to send Telegram notification: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, message: str):
+        for attempt in range(self.max_retries + 1):
+            # The bucket's wait is a blocking sleep: keep it off the event loop
+            await asyncio.to_thread(self.limiter.acquire, 3600)
+            try:
+                await asyncio.to_thread(self.notifier.deliver, message)
+                self.limiter.succeeded()
+                self.sent += 1
+                return
+            except TelegramError as e:
+                if not e.retryable or attempt == self.max_retries:
+                    raise
+                if e.retry_after:
+                    # Pauses the bucket for every following message too
+                    self.limiter.throttled()
+                delay = e.retry_after or self.backoff_seconds * 2 ** attempt
+                self.retried += 1
+                logger.warning(f"Telegram notification failed ({e}), retry {attempt + 1}/{self.max_retries} in {delay}s")
+                await asyncio.sleep(delay)
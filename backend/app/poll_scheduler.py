@@ -0,0 +1,96 @@
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Collection, Dict, List, Optional
+from logging import getLogger
+logger = getLogger("watcher")
+
+# Poll again before the price can plausibly move this many standard deviations
+SIGMAS = 3
+# Per-minute volatility assumed while a ticker has too few intraday bars
+DEFAULT_VOLATILITY = 0.001
+
+
+class PollScheduler:
+    """
+    Per-ticker adaptive polling.
+    After each quote, a ticker's next poll is scheduled from its distance to the
+    nearest level and its recent per-minute volatility: treating the price as a
+    random walk, the level can't be reached within (distance / (SIGMAS * vol))^2
+    minutes with any real probability. Intervals are clamped to
+    [min_seconds, max_seconds].
+    
+    yfinance sends one request per symbol, however many are downloaded together,
+    so the budget counts polled tickers: at most requests_per_minute per rolling
+    minute, most urgent tickers first. A ticker whose poll failed is retried
+    after min_seconds, doubling while it keeps failing (up to max_seconds), so
+    a failing upstream isn't hit on every tick at the expense of healthy ones.
+    """
+
+    def __init__(self, min_seconds: float = 10, max_seconds: float = 1800, requests_per_minute: int = 120):
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.requests_per_minute = requests_per_minute
+        self._next: Dict[str, datetime] = {}
+        self._interval: Dict[str, float] = {}
+        self._failures: Dict[str, int] = {}  # consecutive failed polls
+        self._requests: deque = deque()  # times of recent requests
+        self.deferred = 0  # due polls postponed by the budget
+        self._lock = threading.Lock()
+
+    def interval_for(self, distance_pct: Optional[float], volatility: Optional[float]) -> float:
+        """Seconds until the next poll; distance_pct is None for watches without levels"""
+        if distance_pct is None:
+            return self.max_seconds
+        vol = volatility or DEFAULT_VOLATILITY
+        minutes = (distance_pct / (SIGMAS * vol)) ** 2
+        return min(self.max_seconds, max(self.min_seconds, minutes * 60))
+
+    def select(self, tickers: List[str], now: datetime, force: Collection[str] = ()) -> List[str]:
+        """
+        Tickers to poll now: forced ones, then due ones by urgency (shortest
+        interval first, new tickers before all) within the request budget.
+        """
+        with self._lock:
+            while self._requests and self._requests[0] <= now - timedelta(minutes=1):
+                self._requests.popleft()
+            forced = [t for t in tickers if t in force]
+            due = [t for t in tickers if t not in force and (t not in self._next or self._next[t] <= now)]
+            due.sort(key=lambda t: (self._interval.get(t, 0), self._next.get(t, now)))
+
+            room = max(0, self.requests_per_minute - len(self._requests) - len(forced))
+            selected = forced + due[:room]
+            if len(due) > room:
+                self.deferred += len(due) - room
+                logger.info(f"Poll budget reached: {len(due) - room} due tickers deferred")
+            self._requests.extend([now] * len(selected))
+            return selected
+
+    def update(self, ticker: str, distance_pct: Optional[float], volatility: Optional[float], now: datetime):
+        """Schedule the next poll of ticker after a fresh quote"""
+        interval = self.interval_for(distance_pct, volatility)
+        with self._lock:
+            self._interval[ticker] = interval
+            self._next[ticker] = now + timedelta(seconds=interval)
+            self._failures.pop(ticker, None)
+
+    def failed(self, tickers: Collection[str], now: datetime):
+        """Back off the next poll of tickers that got no fresh quote"""
+        with self._lock:
+            for t in tickers:
+                failures = self._failures.get(t, 0) + 1
+                self._failures[t] = failures
+                backoff = min(self.max_seconds, self.min_seconds * 2 ** (failures - 1))
+                self._next[t] = now + timedelta(seconds=backoff)
+
+    def forget(self, tickers: Collection[str]):
+        """Drop the schedule of tickers, so they are polled as soon as they are selected again"""
+        with self._lock:
+            for t in tickers:
+                self._next.pop(t, None)
+                self._interval.pop(t, None)
+                self._failures.pop(t, None)
+
+    def next_poll(self) -> Optional[datetime]:
+        with self._lock:
+            return min(self._next.values(), default=None)
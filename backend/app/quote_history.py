@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+from logging import getLogger
+logger = getLogger("watcher")
+
+
+class Resolution:
+    def __init__(self, name: str, seconds: int, retention_seconds: Optional[int], unit: str = "", bin_size: int = 1,
+                 source: Optional[str] = None):
+        self.name = name
+        self.seconds = seconds  # bar width; 0 for raw quotes
+        self.retention_seconds = retention_seconds  # None: kept forever
+        self.unit = unit  # $dateTrunc unit and bin size of the rollup
+        self.bin_size = bin_size
+        self.source = source  # finer rollup this one is computed from; None: raw quotes
+
+
+# Rollups in computation order: each is built from the previous one
+ROLLUPS = [
+    Resolution("5m", 300, 90 * 86400, "minute", 5),
+    Resolution("1h", 3600, 2 * 365 * 86400, "hour", 1, source="5m"),
+    Resolution("1d", 86400, None, "day", 1, source="1h"),
+]
+
+
+class QuoteHistory:
+    """
+    Every polled quote is appended to the quotes time-series collection (see
+    StockService); rollup() recomputes the 5m, 1h and 1d OHLC bars of recent
+    buckets, each from the finer one, and query() serves a time range from the
+    coarsest resolution that still gives the requested number of points.
+    Daily bars follow UTC days.
+    """
+
+    def __init__(self, repo, quote_retention_seconds: int):
+        self.repo = repo
+        self.resolutions = [Resolution("quote", 0, quote_retention_seconds)] + ROLLUPS
+
+    def rollup(self, now: Optional[datetime] = None):
+        """Recompute the current and previous bucket of every rollup. Blocking."""
+        now = now or datetime.now(timezone.utc)
+        for r in ROLLUPS:
+            # The previous bucket may still have been open at the last run
+            since = bucket_start(now, r.seconds) - timedelta(seconds=r.seconds)
+            self.repo.rollup_quotes(r.name, r.unit, r.bin_size, since, r.source, r.retention_seconds)
+
+    def resolution_for(self, start: datetime, end: datetime, points: int, now: Optional[datetime] = None) -> Resolution:
+        """
+        Coarsest resolution whose bars are no wider than (end - start) / points
+        and that is still retained at start; if none is fine enough, the finest
+        one retained at start.
+        """
+        now = now or datetime.now(timezone.utc)
+        step = (end - start).total_seconds() / max(1, points)
+        retained = [r for r in self.resolutions if r.retention_seconds is None or now - timedelta(seconds=r.retention_seconds) <= start]
+        fine_enough = [r for r in retained if r.seconds <= step]
+        return fine_enough[-1] if fine_enough else retained[0]
+
+    def query(self, ticker: str, start: datetime, end: datetime, points: int = 200) -> Tuple[str, List[dict]]:
+        """(resolution name, bars with start/open/high/low/close/count) for ticker in [start, end)"""
+        resolution = self.resolution_for(start, end, points)
+        if resolution.seconds:
+            return resolution.name, self.repo.get_quote_bars(ticker, resolution.name, start, end)
+        # Raw quotes in the same shape as the bars
+        return resolution.name, [
+            {"start": t["ts"], "open": t["price"], "high": t["price"], "low": t["price"], "close": t["price"], "count": 1}
+            for t in self.repo.get_quotes(ticker, start, end)
+        ]
+
+
+def bucket_start(ts: datetime, seconds: int) -> datetime:
+    epoch = int(ts.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % seconds, timezone.utc)
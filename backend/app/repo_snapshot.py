@@ -0,0 +1,222 @@
+import threading
+from typing import Dict, List, Optional
+from .models import AlertState, PriceCache, Watch
+from logging import getLogger
+logger = getLogger("watcher")
+
+
+class RepoSnapshot:
+    """
+    In-memory snapshot of the watches and latest prices in front of a Repo.
+    Reads of watches and prices are served from memory; writes go to the
+    repo and then update the snapshot (write-through). Other attributes
+    pass through to the repo.
+
+    Changes made by other replicas arrive through a MongoDB change stream
+    followed by a background thread. Where change streams are unavailable
+    (standalone mongod, repos without watch_changes), or while the stream is
+    down, the snapshot is reloaded every poll_seconds instead.
+    """
+
+    def __init__(self, repo, poll_seconds: float = 30):
+        self._repo = repo
+        self.poll_seconds = poll_seconds
+        self._watches: Dict[str, Watch] = {}
+        self._prices: Dict[str, PriceCache] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.reloads = 0
+        self.changes = 0
+
+    def __getattr__(self, name: str):
+        return getattr(self._repo, name)
+
+    def load(self):
+        """(Re)load both collections. Blocking."""
+        watches = {w.ticker: w for w in self._repo.list_watches()}
+        prices = {pc.ticker: pc for pc in self._repo.list_prices()}
+        with self._lock:
+            self._watches, self._prices = watches, prices
+            self._loaded = True
+        self.reloads += 1
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    # Reads
+    def list_watches(self) -> List[Watch]:
+        self._ensure_loaded()
+        return list(self._watches.values())
+
+    def get_watch(self, ticker: str) -> Optional[Watch]:
+        self._ensure_loaded()
+        return self._watches.get(ticker)
+
+    def get_price(self, ticker: str) -> Optional[PriceCache]:
+        self._ensure_loaded()
+        return self._prices.get(ticker)
+
+    def get_prices(self, tickers: List[str]) -> Dict[str, PriceCache]:
+        self._ensure_loaded()
+        prices = self._prices
+        return {t: prices[t] for t in tickers if t in prices}
+
+    def list_prices(self) -> List[PriceCache]:
+        self._ensure_loaded()
+        return list(self._prices.values())
+
+    # Write-through
+    def upsert_watch(self, watch: Watch) -> Watch:
+        stored = self._repo.upsert_watch(watch)
+        self.remember_watch(stored)
+        return stored
+
+    def delete_watch(self, ticker: str) -> bool:
+        deleted = self._repo.delete_watch(ticker)
+        self.forget_watch(ticker)
+        return deleted
+
+    def save_alert_states(self, states: Dict[str, Optional[AlertState]]):
+        self._repo.save_alert_states(states)
+        self.remember_alert_states(states)
+
+    def set_price(self, ticker: str, price: float, asof, currency: str = 'USD', exchange: str = 'Unknown',
+                  timezone: str = 'America/New_York', market_state: str | None = None, open_price: float | None = None,
+                  day_high: float | None = None, day_low: float | None = None):
+        self._repo.set_price(ticker, price, asof, currency, exchange, timezone, market_state, open_price, day_high, day_low)
+        self.remember_prices([PriceCache(ticker, price, asof, currency, exchange, timezone, market_state,
+                                         open_price, day_high, day_low)])
+
+    def set_prices(self, prices: List[PriceCache]):
+        self._repo.set_prices(prices)
+        self.remember_prices(prices)
+
+    # Updates of the snapshot alone, after a write made through another client
+    def remember_watch(self, watch: Watch):
+        with self._lock:
+            self._watches[watch.ticker] = watch
+
+    def forget_watch(self, ticker: str):
+        with self._lock:
+            self._watches.pop(ticker, None)
+
+    def remember_alert_states(self, states: Dict[str, Optional[AlertState]]):
+        with self._lock:
+            for ticker, state in states.items():
+                if ticker in self._watches:
+                    self._watches[ticker].last_alert = state
+
+    def remember_prices(self, prices: List[PriceCache]):
+        with self._lock:
+            for pc in prices:
+                self._prices[pc.ticker] = pc
+
+    # Invalidation
+    def start(self):
+        """Load the snapshot and follow changes from other replicas in a daemon thread"""
+        self.load()
+        self._thread = threading.Thread(target=self._follow, name="repo-snapshot", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _follow(self):
+        stream_failed = False
+        if not hasattr(self._repo, "watch_changes"):
+            # SqliteRepo: writes made through this process update the snapshot directly,
+            # only changes made by other processes wait for the next reload
+            logger.info(f"Storage has no change stream, reloading the snapshot every {self.poll_seconds}s")
+        while not self._stop.is_set():
+            if hasattr(self._repo, "watch_changes"):
+                try:
+                    changes = self._repo.watch_changes()
+                    # Changes made before the stream opened would be missed otherwise
+                    self.load()
+                    for kind, operation, model in changes:
+                        self._apply(kind, operation, model)
+                        if self._stop.is_set():
+                            return
+                except Exception as e:
+                    if not stream_failed:
+                        logger.warning(f"Change stream unavailable ({e}), reloading the snapshot every {self.poll_seconds}s")
+                    stream_failed = True
+            if self._stop.wait(self.poll_seconds):
+                return
+            try:
+                self.load()
+            except Exception as e:
+                logger.error(f"Snapshot reload failed: {e}")
+
+    def _apply(self, kind: str, operation: str, model):
+        self.changes += 1
+        if model is None:
+            if operation in ("delete", "drop", "invalidate"):
+                # Deletes don't say which ticker: reload
+                self.load()
+            return
+        with self._lock:
+            if kind == "watch":
+                self._watches[model.ticker] = model
+            else:
+                self._prices[model.ticker] = model
+
+
+class AsyncRepoSnapshot:
+    """
+    The async repo surface over a shared RepoSnapshot: reads of watches and
+    prices come from the snapshot's memory without awaiting anything, writes
+    are awaited on async_repo and then applied to the snapshot. Other
+    attributes pass through to async_repo.
+    """
+
+    def __init__(self, snapshot: RepoSnapshot, async_repo):
+        self.snapshot = snapshot
+        self._repo = async_repo
+
+    def __getattr__(self, name: str):
+        return getattr(self._repo, name)
+
+    # Reads
+    async def list_watches(self) -> List[Watch]:
+        return self.snapshot.list_watches()
+
+    async def get_watch(self, ticker: str) -> Optional[Watch]:
+        return self.snapshot.get_watch(ticker)
+
+    async def get_price(self, ticker: str) -> Optional[PriceCache]:
+        return self.snapshot.get_price(ticker)
+
+    async def get_prices(self, tickers: List[str]) -> Dict[str, PriceCache]:
+        return self.snapshot.get_prices(tickers)
+
+    async def list_prices(self) -> List[PriceCache]:
+        return self.snapshot.list_prices()
+
+    # Write-through
+    async def upsert_watch(self, watch: Watch) -> Watch:
+        stored = await self._repo.upsert_watch(watch)
+        self.snapshot.remember_watch(stored)
+        return stored
+
+    async def delete_watch(self, ticker: str) -> bool:
+        deleted = await self._repo.delete_watch(ticker)
+        self.snapshot.forget_watch(ticker)
+        return deleted
+
+    async def save_alert_states(self, states: Dict[str, Optional[AlertState]]):
+        await self._repo.save_alert_states(states)
+        self.snapshot.remember_alert_states(states)
+
+    async def set_price(self, ticker: str, price: float, asof, currency: str = 'USD', exchange: str = 'Unknown',
+                        timezone: str = 'America/New_York', market_state: str | None = None, open_price: float | None = None,
+                        day_high: float | None = None, day_low: float | None = None):
+        await self.set_prices([PriceCache(ticker, price, asof, currency, exchange, timezone, market_state,
+                                          open_price, day_high, day_low)])
+
+    async def set_prices(self, prices: List[PriceCache]):
+        await self._repo.set_prices(prices)
+        self.snapshot.remember_prices(prices)
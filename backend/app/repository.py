@@ -1,20 +1,159 @@
-from .models import Watch, PriceCache
-from typing import List, Optional
+from .models import Watch, PriceCache, AlertState
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from datetime import datetime, timezone
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne, ASCENDING
+from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
 
+# Price cache fields read back into PriceCache; leaves the symbol metadata out
+PRICE_PROJECTION = {"_id": 0, "ticker": 1, "price": 1, "asof": 1, "currency": 1, "exchange": 1, "timezone": 1,
+                    "market_state": 1, "open_price": 1, "day_high": 1, "day_low": 1}
+
+
+def alert_state_updates(states: Dict[str, Optional[AlertState]]) -> List[UpdateOne]:
+    """Bulk write operations setting (or, for None, unsetting) the last alert of each watch"""
+    ops = []
+    for ticker, state in states.items():
+        if state is None:
+            ops.append(UpdateOne({"ticker": ticker}, {"$unset": {"last_alert": ""}}))
+        else:
+            ops.append(UpdateOne({"ticker": ticker}, {"$set": {"last_alert": {
+                "level": state.level, "direction": state.direction, "alerted_at": state.alerted_at}}}))
+    return ops
+
+
+def price_upserts(prices: List[PriceCache]) -> List[UpdateOne]:
+    """Bulk write operations upserting the price cache documents of prices"""
+    return [
+        UpdateOne(
+            {"ticker": pc.ticker},
+            {"$set": {"price": pc.price, "asof": pc.asof, "currency": pc.currency, "exchange": pc.exchange, "timezone": pc.timezone, "market_state": pc.market_state, "open_price": pc.open_price, "day_high": pc.day_high, "day_low": pc.day_low}},
+            upsert=True
+        )
+        for pc in prices
+    ]
+
+
+def history_upserts(ticker: str, interval: str, records: List[dict]) -> List[UpdateOne]:
+    return [
+        UpdateOne(
+            {"ticker": ticker, "interval": interval, "date": r["date"]},
+            {"$set": {k: r[k] for k in ("open", "high", "low", "close", "volume")}},
+            upsert=True
+        )
+        for r in records
+    ]
+
+
+def quote_key(ticker: str, ts: datetime) -> Tuple[str, datetime]:
+    """(ticker, ts) as MongoDB stores it: naive UTC with millisecond precision"""
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ticker, ts.replace(microsecond=ts.microsecond // 1000 * 1000)
+
+
+def recorded_quotes_query(prices: List[PriceCache]) -> dict:
+    """Query for the stored quotes that may repeat one of prices"""
+    return {"ticker": {"$in": list({pc.ticker for pc in prices})}, "ts": {"$in": list({pc.asof for pc in prices})}}
+
+
+def new_quote_documents(prices: List[PriceCache], recorded: Iterable[dict], polled_at: Optional[datetime] = None) -> List[dict]:
+    """
+    Quote documents of the prices that change the stored series. ts is the
+    start of the bar, so a bar polled again while it forms repeats its
+    (ticker, ts): the new price is appended with a later polled_at and readers
+    keep the last one (see latest_quotes). Prices equal to the last recorded
+    one (oldest poll first in recorded) are skipped, and only the last price
+    of a (ticker, ts) in the batch is kept.
+    """
+    last_recorded = {quote_key(doc["ticker"], doc["ts"]): doc["price"] for doc in recorded}
+    batch = {quote_key(pc.ticker, pc.asof): pc for pc in prices}
+    polled_at = polled_at or datetime.now(timezone.utc)
+    return [{"ts": pc.asof, "ticker": pc.ticker, "price": pc.price, "polled_at": polled_at}
+            for key, pc in batch.items() if last_recorded.get(key) != pc.price]
+
+
+def latest_quotes(docs: Iterable[dict]) -> List[dict]:
+    """{ts, price} of quote documents sorted by ts then polled_at, keeping the last poll of each ts"""
+    latest: Dict[datetime, float] = {}
+    for doc in docs:
+        latest[doc["ts"]] = doc["price"]
+    return [{"ts": ts, "price": price} for ts, price in latest.items()]
+
+
+def quote_rollup_pipeline(interval: str, unit: str, bin_size: int, since: datetime, source: Optional[str],
+                          retention_seconds: Optional[int], into: str) -> List[dict]:
+    """
+    Aggregation recomputing the OHLC bars of interval starting at or after since,
+    from the raw quotes (source None) or from the bars of the finer source
+    interval, and merging them into the into collection.
+    """
+    start = {"$dateTrunc": {"date": "$ts" if source is None else "$start", "unit": unit, "binSize": bin_size}}
+    if source is None:
+        # The last poll of each (ticker, ts) is its price, see new_quote_documents
+        stages = [
+            {"$match": {"ts": {"$gte": since}}},
+            {"$sort": {"ticker": 1, "ts": 1, "polled_at": 1}},
+            {"$group": {"_id": {"ticker": "$ticker", "ts": "$ts"}, "price": {"$last": "$price"}}},
+            {"$project": {"_id": 0, "ticker": "$_id.ticker", "ts": "$_id.ts", "price": 1}},
+            {"$sort": {"ticker": 1, "ts": 1}},
+        ]
+        fields = {"open": {"$first": "$price"}, "high": {"$max": "$price"}, "low": {"$min": "$price"},
+                  "close": {"$last": "$price"}, "count": {"$sum": 1}}
+    else:
+        stages = [{"$match": {"interval": source, "start": {"$gte": since}}}, {"$sort": {"ticker": 1, "start": 1}}]
+        fields = {"open": {"$first": "$open"}, "high": {"$max": "$high"}, "low": {"$min": "$low"},
+                  "close": {"$last": "$close"}, "count": {"$sum": "$count"}}
+    project = {"_id": 0, "ticker": "$_id.ticker", "interval": {"$literal": interval}, "start": "$_id.start",
+               "open": 1, "high": 1, "low": 1, "close": 1, "count": 1}
+    if retention_seconds:
+        project["expires_at"] = {"$dateAdd": {"startDate": "$_id.start", "unit": "second", "amount": retention_seconds}}
+    return [
+        *stages,
+        {"$group": {"_id": {"ticker": "$ticker", "start": start}, **fields}},
+        {"$project": project},
+        {"$merge": {"into": into, "on": ["ticker", "interval", "start"],
+                    "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+
 
 class Repo:
-    def __init__(self, mongodb_url: str, mongodb_db_name: str = "stockswatcher"):
-        # MongoDB for watches and price cache
-        self.mongo_client = MongoClient(mongodb_url)
+    def __init__(self, mongodb_url: str, mongodb_db_name: str = "stockswatcher", quote_retention_seconds: int = 7 * 86400,
+                 **client_options):
+        # MongoDB for watches and price cache; client_options (maxPoolSize, ...) go to MongoClient
+        self.mongo_client = MongoClient(mongodb_url, **client_options)
         self.mongo_db = self.mongo_client[mongodb_db_name]
         self.watches_collection = self.mongo_db.watches
         self.prices_collection = self.mongo_db.prices
+        self.history_collection = self.mongo_db.history
+        self.history_coverage_collection = self.mongo_db.history_coverage
+        self.replicas_collection = self.mongo_db.watcher_replicas
+        self.leases_collection = self.mongo_db.watcher_leases
+        self.quotes_collection = self._quotes_collection(quote_retention_seconds)
+        self.quote_bars_collection = self.mongo_db.quote_bars
         # Create indexes
         self.watches_collection.create_index("ticker", unique=True)
         self.prices_collection.create_index("ticker", unique=True)
+        self.history_collection.create_index([("ticker", ASCENDING), ("interval", ASCENDING), ("date", ASCENDING)], unique=True)
+        self.history_coverage_collection.create_index([("ticker", ASCENDING), ("interval", ASCENDING)], unique=True)
+        # $merge of the rollups matches on these fields; expires_at is unset for bars kept forever
+        self.quote_bars_collection.create_index([("ticker", ASCENDING), ("interval", ASCENDING), ("start", ASCENDING)], unique=True)
+        self.quote_bars_collection.create_index("expires_at", expireAfterSeconds=0)
+
+
+    def _quotes_collection(self, retention_seconds: int):
+        """
+        Time-series collection of every polled quote, expiring after retention_seconds.
+        Needs MongoDB 5.0, like the $dateTrunc/$dateAdd rollups.
+        """
+        if "quotes" not in self.mongo_db.list_collection_names():
+            self.mongo_db.create_collection(
+                "quotes",
+                timeseries={"timeField": "ts", "metaField": "ticker", "granularity": "seconds"},
+                expireAfterSeconds=retention_seconds,
+            )
+        self.mongo_db.quotes.create_index([("ticker", ASCENDING), ("ts", ASCENDING)])
+        return self.mongo_db.quotes
 
 
     # Watch CRUD - MongoDB only
@@ -23,7 +162,6 @@ class Repo:
             "ticker": watch.ticker,
             "levels": watch.levels,
             "enabled": watch.enabled,
-            "last_alert_hash": watch.last_alert_hash,
             "updated_at": datetime.utcnow()
         }
         result = self.watches_collection.update_one(
@@ -36,6 +174,11 @@ class Repo:
         return self._mongo_to_watch(doc)
 
 
+    def get_watch(self, ticker: str) -> Optional[Watch]:
+        doc = self.watches_collection.find_one({"ticker": ticker})
+        return self._mongo_to_watch(doc) if doc else None
+
+
     def list_watches(self) -> List[Watch]:
         docs = self.watches_collection.find()
         return [self._mongo_to_watch(doc) for doc in docs]
@@ -47,36 +190,85 @@ class Repo:
         return result.deleted_count > 0
 
 
-    def update_last_alert(self, ticker: str, alert_hash: Optional[str]):
-        self.watches_collection.update_one(
-            {"ticker": ticker},
-            {"$set": {"last_alert_hash": alert_hash, "updated_at": datetime.now(timezone.utc)}}
-        )
+    def save_alert_states(self, states: Dict[str, Optional[AlertState]]):
+        """Write the last alert of many watches in one bulk write; None clears it"""
+        ops = alert_state_updates(states)
+        if ops:
+            self.watches_collection.bulk_write(ops, ordered=False)
 
-    def _mongo_to_watch(self, doc: dict) -> Watch:
+    @staticmethod
+    def _mongo_to_watch(doc: dict) -> Watch:
         """Convert MongoDB document to Watch model"""
         return Watch(
             ticker=doc.get("ticker"),
             levels=doc.get("levels", []),
             enabled=doc.get("enabled", True),
-            last_alert_hash=doc.get("last_alert_hash"),
+            last_alert=AlertState(**doc["last_alert"]) if doc.get("last_alert") else None,
             updated_at=doc.get("updated_at", datetime.now(timezone.utc))
         )
 
 
     # Price cache - MongoDB
-    def set_price(self, ticker: str, price: float, asof: datetime, currency: str = 'USD', exchange: str = 'Unknown', timezone: str = 'America/New_York', market_state: str | None = None, open_price: float | None = None):
+    def set_price(self, ticker: str, price: float, asof: datetime, currency: str = 'USD', exchange: str = 'Unknown', timezone: str = 'America/New_York', market_state: str | None = None, open_price: float | None = None, day_high: float | None = None, day_low: float | None = None):
         self.prices_collection.update_one(
             {"ticker": ticker},
-            {"$set": {"price": price, "asof": asof, "currency": currency, "exchange": exchange, "timezone": timezone, "market_state": market_state, "open_price": open_price}},
+            {"$set": {"price": price, "asof": asof, "currency": currency, "exchange": exchange, "timezone": timezone, "market_state": market_state, "open_price": open_price, "day_high": day_high, "day_low": day_low}},
             upsert=True
         )
 
 
+    def set_prices(self, prices: List[PriceCache]):
+        """Batch version of set_price: one unordered bulk write of upserts"""
+        ops = price_upserts(prices)
+        if ops:
+            self.prices_collection.bulk_write(ops, ordered=False)
+
+
     def get_price(self, ticker: str) -> Optional[PriceCache]:
-        doc = self.prices_collection.find_one({"ticker": ticker})
-        if not doc:
-            return None
+        doc = self.prices_collection.find_one({"ticker": ticker, "price": {"$ne": None}}, PRICE_PROJECTION)
+        return self._mongo_to_price(doc) if doc else None
+
+
+    def get_prices(self, tickers: List[str]) -> Dict[str, PriceCache]:
+        """Batch version of get_price: one $in query; tickers without a cached price are left out"""
+        if not tickers:
+            return {}
+        docs = self.prices_collection.find({"ticker": {"$in": list(tickers)}, "price": {"$ne": None}}, PRICE_PROJECTION)
+        return {doc["ticker"]: self._mongo_to_price(doc) for doc in docs}
+
+
+    def list_prices(self) -> List[PriceCache]:
+        """Every cached price; documents holding only symbol metadata are skipped"""
+        docs = self.prices_collection.find({"price": {"$ne": None}}, PRICE_PROJECTION)
+        return [self._mongo_to_price(doc) for doc in docs]
+
+
+    def watch_changes(self) -> Iterator[Tuple[str, str, object]]:
+        """
+        Follow changes to watches and prices with a MongoDB change stream.
+        Yields ("watch" | "price", operation type, Watch / PriceCache or None);
+        delete events carry no model, as the deleted document is gone.
+        Iterating blocks while waiting for changes; needs a replica set.
+        """
+        names = [self.watches_collection.name, self.prices_collection.name]
+        pipeline = [{"$match": {"ns.coll": {"$in": names}}}]
+        # Opened here rather than on the first next(), so callers can load a snapshot once it's running
+        stream = self.mongo_db.watch(pipeline, full_document="updateLookup")
+
+        def changes():
+            with stream:
+                for change in stream:
+                    doc = change.get("fullDocument")
+                    if change["ns"]["coll"] == self.watches_collection.name:
+                        yield "watch", change["operationType"], self._mongo_to_watch(doc) if doc else None
+                    else:
+                        yield "price", change["operationType"], self._mongo_to_price(doc) if doc and doc.get("price") is not None else None
+        return changes()
+
+
+    @staticmethod
+    def _mongo_to_price(doc: dict) -> PriceCache:
+        """Convert MongoDB document to PriceCache model"""
         return PriceCache(
             ticker=doc.get("ticker"),
             price=doc.get("price"),
@@ -85,5 +277,133 @@ class Repo:
             exchange=doc.get("exchange", "Unknown"),
             timezone=doc.get("timezone", "America/New_York"),
             market_state=doc.get("market_state"),
-            open_price=doc.get("open_price")
-        )
\ No newline at end of file
+            open_price=doc.get("open_price"),
+            day_high=doc.get("day_high"),
+            day_low=doc.get("day_low")
+        )
+
+
+    # Symbol metadata - stored alongside the price cache document
+    def set_metadata(self, ticker: str, meta: dict):
+        self.prices_collection.update_one(
+            {"ticker": ticker},
+            {"$set": {**meta, "metadata_updated_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+
+
+    def get_metadata(self, ticker: str) -> Optional[dict]:
+        return self.prices_collection.find_one(
+            {"ticker": ticker},
+            {"_id": 0, "currency": 1, "exchange": 1, "timezone": 1, "metadata_updated_at": 1}
+        )
+
+
+    # OHLCV history - MongoDB
+    def upsert_history(self, ticker: str, interval: str, records: List[dict]):
+        if not records:
+            return
+        self.history_collection.bulk_write(history_upserts(ticker, interval, records), ordered=False)
+
+
+    def get_history(self, ticker: str, interval: str, start: Optional[datetime] = None) -> List[dict]:
+        query = {"ticker": ticker, "interval": interval}
+        if start is not None:
+            query["date"] = {"$gte": start}
+        projection = {"_id": 0, "date": 1, "open": 1, "high": 1, "low": 1, "close": 1, "volume": 1}
+        return list(self.history_collection.find(query, projection).sort("date", ASCENDING))
+
+
+    def get_history_last_date(self, ticker: str, interval: str) -> Optional[datetime]:
+        doc = self.history_collection.find_one(
+            {"ticker": ticker, "interval": interval}, {"date": 1}, sort=[("date", -1)]
+        )
+        return doc["date"] if doc else None
+
+
+    def get_history_coverage(self, ticker: str, interval: str) -> Optional[dict]:
+        return self.history_coverage_collection.find_one(
+            {"ticker": ticker, "interval": interval},
+            {"_id": 0, "start": 1, "head_complete": 1, "refreshed_at": 1}
+        )
+
+
+    def set_history_coverage(self, ticker: str, interval: str, start: datetime, head_complete: bool, refreshed_at: datetime):
+        self.history_coverage_collection.update_one(
+            {"ticker": ticker, "interval": interval},
+            {"$set": {"start": start, "head_complete": head_complete, "refreshed_at": refreshed_at}},
+            upsert=True
+        )
+
+
+    # Intraday quote history - MongoDB time series and rollups
+    def append_quotes(self, prices: List[PriceCache]):
+        """Record the latest price of each (ticker, ts) of prices, skipping unchanged ones"""
+        if not prices:
+            return
+        # Time-series collections can't have unique indexes nor (before 7.0) update by ts: look the pairs up
+        # first and append the changed prices, see new_quote_documents
+        recorded = self.quotes_collection.find(recorded_quotes_query(prices), {"_id": 0, "ticker": 1, "ts": 1, "price": 1}
+                                               ).sort("polled_at", ASCENDING)
+        docs = new_quote_documents(prices, recorded)
+        if docs:
+            self.quotes_collection.insert_many(docs, ordered=False)
+
+
+    def get_quotes(self, ticker: str, start: datetime, end: datetime) -> List[dict]:
+        query = {"ticker": ticker, "ts": {"$gte": start, "$lt": end}}
+        cursor = self.quotes_collection.find(query, {"_id": 0, "ts": 1, "price": 1}).sort([("ts", ASCENDING), ("polled_at", ASCENDING)])
+        return latest_quotes(cursor)
+
+
+    def rollup_quotes(self, interval: str, unit: str, bin_size: int, since: datetime, source: Optional[str] = None,
+                     retention_seconds: Optional[int] = None):
+        """
+        Recompute the OHLC bars of interval starting at or after since, from the
+        raw quotes or from the bars of the finer source interval, and merge them
+        into quote_bars.
+        """
+        collection = self.quotes_collection if source is None else self.quote_bars_collection
+        collection.aggregate(quote_rollup_pipeline(interval, unit, bin_size, since, source, retention_seconds,
+                                                   self.quote_bars_collection.name))
+
+
+    def get_quote_bars(self, ticker: str, interval: str, start: datetime, end: datetime) -> List[dict]:
+        query = {"ticker": ticker, "interval": interval, "start": {"$gte": start, "$lt": end}}
+        projection = {"_id": 0, "start": 1, "open": 1, "high": 1, "low": 1, "close": 1, "count": 1}
+        return list(self.quote_bars_collection.find(query, projection).sort("start", ASCENDING))
+
+
+    # Watcher sharding - replica heartbeats and partition leases
+    def heartbeat_replica(self, replica_id: str, now: datetime):
+        self.replicas_collection.update_one({"_id": replica_id}, {"$set": {"heartbeat_at": now}}, upsert=True)
+
+
+    def list_live_replicas(self, since: datetime) -> List[str]:
+        return [doc["_id"] for doc in self.replicas_collection.find({"heartbeat_at": {"$gte": since}}, {"_id": 1})]
+
+
+    def remove_replica(self, replica_id: str):
+        self.replicas_collection.delete_one({"_id": replica_id})
+
+
+    def claim_lease(self, partition: int, owner: str, now: datetime, expires_at: datetime) -> bool:
+        """Take or renew a partition lease; fails while another owner's lease hasn't expired"""
+        try:
+            self.leases_collection.update_one(
+                {"_id": partition, "$or": [{"owner": owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": owner, "expires_at": expires_at}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            # The lease exists and is held by someone else: the upsert tried to insert a second document
+            return False
+
+
+    def release_lease(self, partition: int, owner: str):
+        self.leases_collection.delete_one({"_id": partition, "owner": owner})
+
+
+    def list_leases(self) -> List[dict]:
+        return list(self.leases_collection.find({}, {"owner": 1, "expires_at": 1}).sort("_id", ASCENDING))
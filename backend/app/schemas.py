@@ -9,12 +9,27 @@ class WatchCreate(BaseModel):
     enabled: bool = True
 
 
+class TickerValidationRequest(BaseModel):
+    tickers: List[str]
+
+
+class TickerValidationRead(BaseModel):
+    valid: List[str]
+    invalid: List[str]
+
+
+class AlertStateRead(BaseModel):
+    level: float
+    direction: str  # 'up' or 'down'
+    alerted_at: datetime
+
+
 class WatchRead(BaseModel):
     id: int
     ticker: str
     levels: List[float]
     enabled: bool
-    last_alert_hash: Optional[str]
+    last_alert: Optional[AlertStateRead]
 
 
 class StatusRead(BaseModel):
@@ -26,6 +41,7 @@ class StatusRead(BaseModel):
     near: bool
     open_price: Optional[float] = None
     price_change_pct: Optional[float] = None
+    stale: bool = False  # Cached price served while the provider is unavailable
 
 
 class InfoRead(BaseModel):
@@ -36,6 +52,25 @@ class InfoRead(BaseModel):
     markets: dict  # Per-exchange market status breakdown
 
 
+class TickOutcomeRead(BaseModel):
+    started_at: datetime
+    duration_seconds: float
+    done: int  # Tickers fetched and evaluated
+    failed: List[str]  # Tickers without a fresh price
+    deferred: List[str]  # Tickers carried over to the next tick by the deadline
+    skipped: int  # Watches outside market hours
+    coalesced: int  # Overlapping runs folded into this tick
+
+
+class ShardStatusRead(BaseModel):
+    enabled: bool
+    replica_id: Optional[str] = None
+    leader: bool = False  # Runs the once-per-cluster jobs
+    partitions: int = 0
+    owned_partitions: List[int] = []
+    live_replicas: List[str] = []
+
+
 class StockDetailsRead(BaseModel):
     ticker: str
     name: Optional[str]
@@ -87,6 +122,25 @@ class StockDetailsRead(BaseModel):
     recommendation_mean: Optional[float]
     recommendation_key: Optional[str]
     number_of_analyst_opinions: Optional[int]
+    
+    # Cache age of the two field groups
+    price_age_seconds: Optional[float] = None
+    fundamentals_age_seconds: Optional[float] = None
+
+
+class QuoteBarRead(BaseModel):
+    start: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+    count: int  # Quotes in the bar
+
+
+class QuoteHistoryRead(BaseModel):
+    ticker: str
+    resolution: str  # quote, 5m, 1h or 1d
+    bars: List[QuoteBarRead]
 
 
 class HistoricalPriceRead(BaseModel):
@@ -0,0 +1,92 @@
+import os
+import socket
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+from logging import getLogger
+logger = getLogger("watcher")
+
+
+def default_replica_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class ShardCoordinator:
+    """
+    Splits the watchlist between watcher replicas.
+
+    Tickers are hashed into a fixed number of partitions. Every heartbeat a
+    replica records itself as alive and works out its share from the sorted
+    list of live replicas (partition p belongs to replica p % n). It then
+    releases the partitions it no longer should own and takes or renews leases
+    on its own ones. A lease can only be taken once the previous owner released
+    it or let it expire, so a ticker is never polled by two replicas; when a
+    replica dies its partitions move to the others after lease_seconds.
+
+    Ownership is also checked against the local lease expiry: a replica that
+    can't reach Mongo stops polling when its leases run out.
+    """
+
+    def __init__(self, repo, replica_id: str, partitions: int = 64, lease_seconds: float = 30):
+        self.repo = repo
+        self.replica_id = replica_id
+        self.partitions = partitions
+        self.lease_seconds = lease_seconds
+        # partition -> lease expiry on the local monotonic clock
+        self._owned: Dict[int, float] = {}
+        self.replicas: List[str] = []
+
+    def partition_of(self, ticker: str) -> int:
+        # crc32 is stable across processes, unlike hash()
+        return zlib.crc32(ticker.encode()) % self.partitions
+
+    def owns(self, ticker: str) -> bool:
+        expires = self._owned.get(self.partition_of(ticker))
+        return expires is not None and expires > time.monotonic()
+
+    def is_leader(self) -> bool:
+        """The owner of partition 0 runs the once-per-cluster jobs"""
+        expires = self._owned.get(0)
+        return expires is not None and expires > time.monotonic()
+
+    def owned_partitions(self) -> List[int]:
+        now = time.monotonic()
+        return sorted(p for p, expires in self._owned.items() if expires > now)
+
+    def heartbeat(self):
+        """Register as alive, then rebalance and renew leases. Blocking, run it in a worker thread."""
+        started = time.monotonic()
+        now = datetime.now(timezone.utc)
+        self.repo.heartbeat_replica(self.replica_id, now)
+        replicas = set(self.repo.list_live_replicas(now - timedelta(seconds=self.lease_seconds)))
+        replicas.add(self.replica_id)
+        self.replicas = sorted(replicas)
+
+        index, count = self.replicas.index(self.replica_id), len(self.replicas)
+        assigned = {p for p in range(self.partitions) if p % count == index}
+
+        owned = dict(self._owned)
+        for p in set(owned) - assigned:
+            self.repo.release_lease(p, self.replica_id)
+            del owned[p]
+
+        expires_at = now + timedelta(seconds=self.lease_seconds)
+        for p in sorted(assigned):
+            if self.repo.claim_lease(p, self.replica_id, now, expires_at):
+                owned[p] = started + self.lease_seconds
+            else:
+                # Still held by a replica that left or hasn't released it yet
+                owned.pop(p, None)
+
+        if set(owned) != set(self._owned):
+            logger.info(f"Replica {self.replica_id}: {len(owned)}/{self.partitions} partitions, {count} live replicas")
+        self._owned = owned
+
+    def leave(self):
+        """Hand all partitions back immediately, e.g. on shutdown"""
+        for p in list(self._owned):
+            self.repo.release_lease(p, self.replica_id)
+        self._owned = {}
+        self.repo.remove_replica(self.replica_id)
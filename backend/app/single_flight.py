@@ -0,0 +1,140 @@
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, Hashable, List
+from logging import getLogger
+logger = getLogger("watcher")
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Exception | None = None
+
+    def wait(self) -> Any:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls: while a call for a key is in flight,
+    other callers with the same key wait for it and share its result or error
+    instead of starting their own.
+    """
+    
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        # Per method: calls made and calls served by another caller's in-flight fetch
+        self.calls: Counter = Counter()
+        self.coalesced: Counter = Counter()
+    
+    def do(self, key: tuple, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) unless a call with the same key is in flight; key[0] is the counter name"""
+        call, leader = self.claim(key)
+        if not leader:
+            return call.wait()
+        try:
+            call.result = fn(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+        finally:
+            self.release(key, call)
+        return call.wait()
+    
+    def stats(self) -> Dict[str, dict]:
+        """Per method: {'calls': n, 'coalesced': n}"""
+        with self._lock:
+            return {name: {'calls': self.calls[name], 'coalesced': self.coalesced[name]} for name in self.calls}
+    
+    def claim(self, key: tuple) -> tuple[_Call, bool]:
+        """Returns (call, leader): the leader runs the fetch and must release() it"""
+        with self._lock:
+            self.calls[key[0]] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced[key[0]] += 1
+                return call, False
+            call = _Call()
+            self._calls[key] = call
+            return call, True
+    
+    def release(self, key: tuple, call: _Call):
+        """Publish the leader's result to the waiters and forget the key"""
+        with self._lock:
+            self._calls.pop(key, None)
+        call.done.set()
+
+
+class SingleFlightProvider:
+    """
+    PriceProvider wrapper that coalesces concurrent identical provider calls.
+    get_last_many coalesces per ticker: tickers already being fetched by another
+    batch are awaited, only the remaining ones are requested.
+    """
+    
+    def __init__(self, provider):
+        self.provider = provider
+        self.flight = SingleFlight()
+    
+    def __getattr__(self, name: str):
+        # Non-fetching attributes (map, bars, metadata, to_records, ...) pass through
+        return getattr(self.provider, name)
+    
+    def validate_ticker(self, ticker: str) -> bool:
+        return self.flight.do(("validate_ticker", ticker), self.provider.validate_ticker, ticker)
+    
+    def validate_many(self, tickers: List[str]) -> Dict[str, bool]:
+        key = ("validate_many", tuple(sorted(set(tickers))))
+        return self.flight.do(key, self.provider.validate_many, tickers)
+    
+    def get_last(self, ticker: str) -> tuple:
+        results, errors = self.get_last_many([ticker])
+        if ticker not in results:
+            raise RuntimeError(errors.get(ticker, f"No data for {ticker}"))
+        return results[ticker]
+    
+    def get_last_many(self, tickers: List[str]) -> tuple[Dict[str, tuple], Dict[str, str]]:
+        leading: Dict[str, _Call] = {}
+        waiting: Dict[str, _Call] = {}
+        for ticker in dict.fromkeys(tickers):
+            call, leader = self.flight.claim(("get_last", ticker))
+            (leading if leader else waiting)[ticker] = call
+        
+        results: Dict[str, tuple] = {}
+        errors: Dict[str, str] = {}
+        if leading:
+            try:
+                fetched, failed = self.provider.get_last_many(list(leading))
+            except Exception as e:
+                fetched, failed = {}, {t: str(e) for t in leading}
+            for ticker, call in leading.items():
+                if ticker in fetched:
+                    call.result = fetched[ticker]
+                else:
+                    call.error = RuntimeError(failed.get(ticker, f"No data for {ticker}"))
+                self.flight.release(("get_last", ticker), call)
+        
+        for ticker, call in {**leading, **waiting}.items():
+            try:
+                results[ticker] = call.wait()
+            except Exception as e:
+                errors[ticker] = str(e)
+        return results, errors
+    
+    def get_stock_details(self, ticker: str) -> dict:
+        return self.flight.do(("get_stock_details", ticker), self.provider.get_stock_details, ticker)
+    
+    def get_stock_price_fields(self, ticker: str) -> dict:
+        return self.flight.do(("get_stock_price_fields", ticker), self.provider.get_stock_price_fields, ticker)
+    
+    def get_historical_range(self, ticker: str, interval: str = "1d", period=None, start=None, end=None):
+        return self.flight.do(("get_historical_range", ticker, interval, period, start, end),
+                              self.provider.get_historical_range, ticker, interval, period, start, end)
+    
+    def get_historical_prices(self, ticker: str, period: str = "1y", interval: str = "1d") -> list:
+        return self.flight.do(("get_historical_prices", ticker, period, interval),
+                              self.provider.get_historical_prices, ticker, period, interval)
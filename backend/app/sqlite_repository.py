@@ -0,0 +1,408 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from .models import Watch, PriceCache, AlertState
+
+# Seconds per $dateTrunc unit of the rollups
+UNIT_SECONDS = {"minute": 60, "hour": 3600, "day": 86400}
+
+EPOCH = datetime(1970, 1, 1)
+
+PRICE_COLUMNS = "ticker, price, asof, currency, exchange, timezone, market_state, open_price, day_high, day_low"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS watches (
+    ticker TEXT PRIMARY KEY,
+    levels TEXT NOT NULL,
+    enabled INTEGER NOT NULL,
+    last_alert TEXT,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS prices (
+    ticker TEXT PRIMARY KEY,
+    price REAL,
+    asof REAL,
+    currency TEXT,
+    exchange TEXT,
+    timezone TEXT,
+    market_state TEXT,
+    open_price REAL,
+    day_high REAL,
+    day_low REAL,
+    metadata_updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS history (
+    ticker TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    date REAL NOT NULL,
+    open REAL, high REAL, low REAL, close REAL, volume INTEGER,
+    PRIMARY KEY (ticker, interval, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS history_coverage (
+    ticker TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    start REAL,
+    head_complete INTEGER,
+    refreshed_at REAL,
+    PRIMARY KEY (ticker, interval)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS quotes (
+    ticker TEXT NOT NULL,
+    ts REAL NOT NULL,
+    price REAL
+);
+CREATE INDEX IF NOT EXISTS quotes_ticker_ts ON quotes (ticker, ts);
+CREATE INDEX IF NOT EXISTS quotes_ts ON quotes (ts);
+CREATE TABLE IF NOT EXISTS quote_bars (
+    ticker TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    start REAL NOT NULL,
+    open REAL, high REAL, low REAL, close REAL, count INTEGER,
+    expires_at REAL,
+    PRIMARY KEY (ticker, interval, start)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS quote_bars_interval_start ON quote_bars (interval, start);
+CREATE INDEX IF NOT EXISTS quote_bars_expires_at ON quote_bars (expires_at) WHERE expires_at IS NOT NULL;
+CREATE TABLE IF NOT EXISTS watcher_replicas (
+    replica_id TEXT PRIMARY KEY,
+    heartbeat_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS watcher_leases (
+    partition INTEGER PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+def _to_epoch(dt: Optional[datetime]) -> Optional[float]:
+    """UTC seconds; naive datetimes are UTC, as in MongoDB"""
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _from_epoch(seconds: Optional[float]) -> Optional[datetime]:
+    """Naive UTC datetime, like the ones pymongo returns"""
+    return None if seconds is None else EPOCH + timedelta(seconds=seconds)
+
+
+class SqliteRepo:
+    """
+    Embedded replacement for Repo with the same method surface, on a single
+    SQLite file in WAL mode: no mongod to run, and reads are local calls
+    instead of network round trips. Meant for single-node installs.
+
+    Every thread gets its own connection, so readers never wait on each
+    other or on the writer; writes take the database lock up front
+    (BEGIN IMMEDIATE) and batches are one executemany in one transaction.
+    Datetimes are stored as UTC epoch seconds and returned as naive UTC.
+    Quotes and rollup bars past their retention are deleted by rollup_quotes.
+    There are no change streams: a RepoSnapshot in front of it falls back to
+    periodic reloads.
+    """
+
+    def __init__(self, path: str = "stockswatcher.db", quote_retention_seconds: int = 7 * 86400,
+                 busy_timeout_seconds: float = 5.0):
+        self.path = path
+        self.quote_retention_seconds = quote_retention_seconds
+        self.busy_timeout_seconds = busy_timeout_seconds
+        self._local = threading.local()
+        conn = self._conn()
+        # Persistent in the file: readers keep going while a write is in progress
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; write transactions are opened explicitly by _write
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_seconds, isolation_level=None)
+            # Durable at checkpoints rather than on every commit, safe with WAL
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _write(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _query(self, sql: str, params=()) -> List[tuple]:
+        return self._conn().execute(sql, params).fetchall()
+
+
+    # Watch CRUD
+    def upsert_watch(self, watch: Watch) -> Watch:
+        with self._write() as conn:
+            conn.execute(
+                "INSERT INTO watches (ticker, levels, enabled, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (ticker) DO UPDATE SET levels = excluded.levels, enabled = excluded.enabled, updated_at = excluded.updated_at",
+                (watch.ticker, json.dumps(watch.levels), int(watch.enabled), _to_epoch(datetime.now(timezone.utc)))
+            )
+        return self.get_watch(watch.ticker)
+
+
+    def get_watch(self, ticker: str) -> Optional[Watch]:
+        rows = self._query("SELECT ticker, levels, enabled, last_alert, updated_at FROM watches WHERE ticker = ?", (ticker,))
+        return self._row_to_watch(rows[0]) if rows else None
+
+
+    def list_watches(self) -> List[Watch]:
+        return [self._row_to_watch(r) for r in self._query("SELECT ticker, levels, enabled, last_alert, updated_at FROM watches")]
+
+
+    def delete_watch(self, ticker: str) -> bool:
+        """Delete a watch by ticker. Returns True if deleted, False if not found."""
+        with self._write() as conn:
+            return conn.execute("DELETE FROM watches WHERE ticker = ?", (ticker,)).rowcount > 0
+
+
+    def save_alert_states(self, states: Dict[str, Optional[AlertState]]):
+        """Write the last alert of many watches in one transaction; None clears it"""
+        if not states:
+            return
+        rows = [
+            (None if s is None else json.dumps({"level": s.level, "direction": s.direction, "alerted_at": _to_epoch(s.alerted_at)}), t)
+            for t, s in states.items()
+        ]
+        with self._write() as conn:
+            conn.executemany("UPDATE watches SET last_alert = ? WHERE ticker = ?", rows)
+
+    @staticmethod
+    def _row_to_watch(row) -> Watch:
+        ticker, levels, enabled, last_alert, updated_at = row
+        alert = None
+        if last_alert:
+            state = json.loads(last_alert)
+            alert = AlertState(state["level"], state["direction"], _from_epoch(state["alerted_at"]))
+        return Watch(ticker=ticker, levels=json.loads(levels), enabled=bool(enabled), last_alert=alert,
+                     updated_at=_from_epoch(updated_at) or datetime.now(timezone.utc))
+
+
+    # Price cache
+    def set_price(self, ticker: str, price: float, asof: datetime, currency: str = 'USD', exchange: str = 'Unknown', timezone: str = 'America/New_York', market_state: str | None = None, open_price: float | None = None, day_high: float | None = None, day_low: float | None = None):
+        self.set_prices([PriceCache(ticker, price, asof, currency, exchange, timezone, market_state, open_price, day_high, day_low)])
+
+
+    def set_prices(self, prices: List[PriceCache]):
+        """Batch version of set_price: one transaction of upserts"""
+        if not prices:
+            return
+        rows = [(pc.ticker, pc.price, _to_epoch(pc.asof), pc.currency, pc.exchange, pc.timezone, pc.market_state,
+                 pc.open_price, pc.day_high, pc.day_low) for pc in prices]
+        with self._write() as conn:
+            conn.executemany(
+                f"INSERT INTO prices ({PRICE_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (ticker) DO UPDATE SET price = excluded.price, asof = excluded.asof, currency = excluded.currency, "
+                "exchange = excluded.exchange, timezone = excluded.timezone, market_state = excluded.market_state, "
+                "open_price = excluded.open_price, day_high = excluded.day_high, day_low = excluded.day_low",
+                rows
+            )
+
+
+    def get_price(self, ticker: str) -> Optional[PriceCache]:
+        rows = self._query(f"SELECT {PRICE_COLUMNS} FROM prices WHERE ticker = ? AND price IS NOT NULL", (ticker,))
+        return self._row_to_price(rows[0]) if rows else None
+
+
+    def get_prices(self, tickers: List[str]) -> Dict[str, PriceCache]:
+        """Batch version of get_price; tickers without a cached price are left out"""
+        prices: Dict[str, PriceCache] = {}
+        tickers = list(tickers)
+        # Stay under SQLite's bound parameter limit
+        for i in range(0, len(tickers), 500):
+            chunk = tickers[i:i + 500]
+            rows = self._query(f"SELECT {PRICE_COLUMNS} FROM prices WHERE price IS NOT NULL AND ticker IN "
+                               f"({', '.join('?' * len(chunk))})", chunk)
+            prices.update((r[0], self._row_to_price(r)) for r in rows)
+        return prices
+
+
+    def list_prices(self) -> List[PriceCache]:
+        """Every cached price; rows holding only symbol metadata are skipped"""
+        return [self._row_to_price(r) for r in self._query(f"SELECT {PRICE_COLUMNS} FROM prices WHERE price IS NOT NULL")]
+
+    @staticmethod
+    def _row_to_price(row) -> PriceCache:
+        ticker, price, asof, currency, exchange, timezone_name, market_state, open_price, day_high, day_low = row
+        return PriceCache(ticker, price, _from_epoch(asof), currency or "USD", exchange or "Unknown",
+                          timezone_name or "America/New_York", market_state, open_price, day_high, day_low)
+
+
+    # Symbol metadata - stored alongside the price cache row
+    def set_metadata(self, ticker: str, meta: dict):
+        with self._write() as conn:
+            conn.execute(
+                "INSERT INTO prices (ticker, currency, exchange, timezone, metadata_updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (ticker) DO UPDATE SET currency = excluded.currency, exchange = excluded.exchange, "
+                "timezone = excluded.timezone, metadata_updated_at = excluded.metadata_updated_at",
+                (ticker, meta.get("currency"), meta.get("exchange"), meta.get("timezone"), _to_epoch(datetime.now(timezone.utc)))
+            )
+
+
+    def get_metadata(self, ticker: str) -> Optional[dict]:
+        rows = self._query("SELECT currency, exchange, timezone, metadata_updated_at FROM prices WHERE ticker = ?", (ticker,))
+        if not rows:
+            return None
+        currency, exchange, timezone_name, updated_at = rows[0]
+        return {"currency": currency, "exchange": exchange, "timezone": timezone_name, "metadata_updated_at": _from_epoch(updated_at)}
+
+
+    # OHLCV history
+    def upsert_history(self, ticker: str, interval: str, records: List[dict]):
+        if not records:
+            return
+        rows = [(ticker, interval, _to_epoch(r["date"]), r["open"], r["high"], r["low"], r["close"], r["volume"]) for r in records]
+        with self._write() as conn:
+            conn.executemany(
+                "INSERT INTO history (ticker, interval, date, open, high, low, close, volume) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (ticker, interval, date) DO UPDATE SET open = excluded.open, high = excluded.high, "
+                "low = excluded.low, close = excluded.close, volume = excluded.volume",
+                rows
+            )
+
+
+    def get_history(self, ticker: str, interval: str, start: Optional[datetime] = None) -> List[dict]:
+        sql = "SELECT date, open, high, low, close, volume FROM history WHERE ticker = ? AND interval = ?"
+        params = [ticker, interval]
+        if start is not None:
+            sql += " AND date >= ?"
+            params.append(_to_epoch(start))
+        rows = self._query(sql + " ORDER BY date", params)
+        return [{"date": _from_epoch(d), "open": o, "high": h, "low": l, "close": c, "volume": v} for d, o, h, l, c, v in rows]
+
+
+    def get_history_last_date(self, ticker: str, interval: str) -> Optional[datetime]:
+        rows = self._query("SELECT MAX(date) FROM history WHERE ticker = ? AND interval = ?", (ticker, interval))
+        return _from_epoch(rows[0][0])
+
+
+    def get_history_coverage(self, ticker: str, interval: str) -> Optional[dict]:
+        rows = self._query("SELECT start, head_complete, refreshed_at FROM history_coverage WHERE ticker = ? AND interval = ?",
+                           (ticker, interval))
+        if not rows:
+            return None
+        start, head_complete, refreshed_at = rows[0]
+        return {"start": _from_epoch(start), "head_complete": bool(head_complete), "refreshed_at": _from_epoch(refreshed_at)}
+
+
+    def set_history_coverage(self, ticker: str, interval: str, start: datetime, head_complete: bool, refreshed_at: datetime):
+        with self._write() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO history_coverage (ticker, interval, start, head_complete, refreshed_at) VALUES (?, ?, ?, ?, ?)",
+                (ticker, interval, _to_epoch(start), int(head_complete), _to_epoch(refreshed_at))
+            )
+
+
+    # Intraday quote history and rollups
+    def append_quotes(self, prices: List[PriceCache]):
+        """Record the latest price of each (ticker, ts) of prices: a bar polled again replaces its price"""
+        if not prices:
+            return
+        rows = [(pc.ticker, _to_epoch(pc.asof), pc.price) for pc in prices]
+        with self._write() as conn:
+            conn.executemany("UPDATE quotes SET price = ? WHERE ticker = ? AND ts = ?", [(p, t, ts) for t, ts, p in rows])
+            conn.executemany("INSERT INTO quotes (ticker, ts, price) SELECT ?, ?, ? "
+                             "WHERE NOT EXISTS (SELECT 1 FROM quotes WHERE ticker = ? AND ts = ?)",
+                             [(t, ts, p, t, ts) for t, ts, p in rows])
+
+
+    def get_quotes(self, ticker: str, start: datetime, end: datetime) -> List[dict]:
+        rows = self._query("SELECT ts, price FROM quotes WHERE ticker = ? AND ts >= ? AND ts < ? ORDER BY ts",
+                           (ticker, _to_epoch(start), _to_epoch(end)))
+        return [{"ts": _from_epoch(ts), "price": price} for ts, price in rows]
+
+
+    def rollup_quotes(self, interval: str, unit: str, bin_size: int, since: datetime, source: Optional[str] = None,
+                     retention_seconds: Optional[int] = None):
+        """
+        Recompute the OHLC bars of interval starting at or after since, from the
+        raw quotes or from the bars of the finer source interval, and replace
+        them in quote_bars. Also deletes the quotes and bars past their retention.
+        """
+        width = UNIT_SECONDS[unit] * bin_size
+        if source is None:
+            rows = self._query("SELECT ticker, ts, price, price, price, price, 1 FROM quotes WHERE ts >= ? ORDER BY ticker, ts",
+                               (_to_epoch(since),))
+        else:
+            rows = self._query("SELECT ticker, start, open, high, low, close, count FROM quote_bars "
+                               "WHERE interval = ? AND start >= ? ORDER BY ticker, start", (source, _to_epoch(since)))
+        bars: Dict[tuple, list] = {}
+        for ticker, ts, o, h, l, c, n in rows:
+            start = ts - ts % width
+            bar = bars.get((ticker, start))
+            if bar is None:
+                bars[(ticker, start)] = [o, h, l, c, n]
+            else:
+                bar[1], bar[2], bar[3], bar[4] = max(bar[1], h), min(bar[2], l), c, bar[4] + n
+        now = time.time()
+        with self._write() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO quote_bars (ticker, interval, start, open, high, low, close, count, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(ticker, interval, start, *bar, start + retention_seconds if retention_seconds else None)
+                 for (ticker, start), bar in bars.items()]
+            )
+            if source is None:
+                conn.execute("DELETE FROM quotes WHERE ts < ?", (now - self.quote_retention_seconds,))
+            conn.execute("DELETE FROM quote_bars WHERE expires_at < ?", (now,))
+
+
+    def get_quote_bars(self, ticker: str, interval: str, start: datetime, end: datetime) -> List[dict]:
+        rows = self._query(
+            "SELECT start, open, high, low, close, count FROM quote_bars "
+            "WHERE ticker = ? AND interval = ? AND start >= ? AND start < ? ORDER BY start",
+            (ticker, interval, _to_epoch(start), _to_epoch(end))
+        )
+        return [{"start": _from_epoch(s), "open": o, "high": h, "low": l, "close": c, "count": n} for s, o, h, l, c, n in rows]
+
+
+    # Watcher sharding - replica heartbeats and partition leases
+    def heartbeat_replica(self, replica_id: str, now: datetime):
+        with self._write() as conn:
+            conn.execute("INSERT OR REPLACE INTO watcher_replicas (replica_id, heartbeat_at) VALUES (?, ?)",
+                         (replica_id, _to_epoch(now)))
+
+
+    def list_live_replicas(self, since: datetime) -> List[str]:
+        return [r[0] for r in self._query("SELECT replica_id FROM watcher_replicas WHERE heartbeat_at >= ?", (_to_epoch(since),))]
+
+
+    def remove_replica(self, replica_id: str):
+        with self._write() as conn:
+            conn.execute("DELETE FROM watcher_replicas WHERE replica_id = ?", (replica_id,))
+
+
+    def claim_lease(self, partition: int, owner: str, now: datetime, expires_at: datetime) -> bool:
+        """Take or renew a partition lease; fails while another owner's lease hasn't expired"""
+        with self._write() as conn:
+            cursor = conn.execute(
+                "INSERT INTO watcher_leases (partition, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (partition) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE watcher_leases.owner = excluded.owner OR watcher_leases.expires_at < ?",
+                (partition, owner, _to_epoch(expires_at), _to_epoch(now))
+            )
+            return cursor.rowcount > 0
+
+
+    def release_lease(self, partition: int, owner: str):
+        with self._write() as conn:
+            conn.execute("DELETE FROM watcher_leases WHERE partition = ? AND owner = ?", (partition, owner))
+
+
+    def list_leases(self) -> List[dict]:
+        return [{"_id": p, "owner": o, "expires_at": _from_epoch(e)}
+                for p, o, e in self._query("SELECT partition, owner, expires_at FROM watcher_leases ORDER BY partition")]
@@ -1,16 +1,29 @@
-from typing import Optional, Tuple
-from .models import PriceCache, Watch
+import asyncio
+import copy
+from itertools import chain
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from .models import PriceCache
 from .schemas import StatusRead
 from .config import settings
+from .metrics import TICK_PHASE
+from .level_index import level_index
 
 
 class StockService:
     """Service for stock-related business logic calculations"""
     
-    def __init__(self, repo, provider):
-        """Initialize with repository and data provider dependencies"""
+    def __init__(self, repo, provider, async_repo=None, validator=None):
+        """
+        Initialize with repository and data provider dependencies.
+        With an async_repo, get_prices_async awaits it instead of running the
+        blocking repo in worker threads. With a validator (TickerValidator),
+        every ticker that returns a price is recorded as valid.
+        """
         self.repo = repo
         self.provider = provider
+        self.async_repo = async_repo
+        self.validator = validator
     
     def get_price(self, ticker: str, force_update: bool = False) -> Optional[Tuple[PriceCache, bool]]:
         """
@@ -24,22 +37,140 @@ class StockService:
             Tuple of (PriceCache, was_fetched) where was_fetched indicates if new data was retrieved
         """
         was_fetched = False
+        pc = None if force_update else self.repo.get_price(ticker)
         
         # If force_update or no cached price, fetch from provider
-        if force_update or not self.repo.get_price(ticker):
+        if pc is None:
             try:
-                # Fetch new price
-                price, asof, currency, exchange, timezone_name, market_state, open_price = self.provider.get_last(ticker)
-                
-                # Update cache with open_price for daily % change calculation
-                self.repo.set_price(ticker, price, asof, currency, exchange, timezone_name, market_state, open_price)
+                # Fetch new price and update cache
+                pc = self._store_results({ticker: self.provider.get_last(ticker)})[ticker]
                 was_fetched = True
             except Exception as e:
                 raise Exception(f"Failed to fetch price for {ticker}: {e}")
         
-        pc = self.repo.get_price(ticker)
         return (pc, was_fetched)
     
+    def get_prices(self, tickers: List[str], force_update: bool = False) -> Tuple[Dict[str, Tuple[PriceCache, bool]], Dict[str, str]]:
+        """
+        Batch version of get_price.
+        Tickers that need a fresh quote are fetched with a single
+        provider.get_last_many call instead of one get_last per ticker.
+        
+        Args:
+            tickers: Stock ticker symbols
+            force_update: If True, always fetch fresh data from provider
+            
+        Returns:
+            Tuple of (prices, errors): prices maps ticker to (PriceCache, was_fetched),
+            errors maps ticker to the reason no price is available
+        """
+        cached, to_fetch = self._load_cached(tickers, force_update)
+        
+        results: Dict[str, tuple] = {}
+        errors: Dict[str, str] = {}
+        if to_fetch:
+            results, errors = self.provider.get_last_many(to_fetch)
+            cached.update(self._store_results(results))
+            cached.update(self._load_stale(errors))
+        
+        return self._merge(tickers, cached, results), errors
+    
+    async def get_prices_async(self, tickers: List[str], force_update: bool = False) -> Tuple[Dict[str, Tuple[PriceCache, bool]], Dict[str, str]]:
+        """
+        Non-blocking version of get_prices for the event loop.
+        Tickers are split into batches of PROVIDER_BATCH_SIZE and fetched concurrently
+        in worker threads, at most PROVIDER_MAX_CONCURRENCY batches at a time, so the
+        wall time is roughly that of the slowest batch. Mongo reads and writes are
+        awaited on the async repo, or run in worker threads without one.
+        """
+        cached, to_fetch = await self._load_cached_async(tickers, force_update)
+        
+        results: Dict[str, tuple] = {}
+        errors: Dict[str, str] = {}
+        if to_fetch:
+            semaphore = asyncio.Semaphore(max(1, settings.PROVIDER_MAX_CONCURRENCY))
+            
+            async def fetch(batch: List[str]):
+                async with semaphore:
+                    return await asyncio.to_thread(self.provider.get_last_many, batch)
+            
+            batch_size = max(1, settings.PROVIDER_BATCH_SIZE)
+            batches = [to_fetch[i:i + batch_size] for i in range(0, len(to_fetch), batch_size)]
+            with TICK_PHASE.time("fetch"):
+                for batch_results, batch_errors in await asyncio.gather(*(fetch(b) for b in batches)):
+                    results.update(batch_results)
+                    errors.update(batch_errors)
+            with TICK_PHASE.time("persist"):
+                cached.update(await self._store_results_async(results))
+                cached.update(await self._load_stale_async(errors))
+        
+        return self._merge(tickers, cached, results), errors
+    
+    def _load_cached(self, tickers: List[str], force_update: bool) -> Tuple[Dict[str, PriceCache], List[str]]:
+        """Split tickers into cached prices and tickers that must be fetched"""
+        if force_update:
+            return {}, list(tickers)
+        cached = self.repo.get_prices(tickers)
+        return cached, [ticker for ticker in tickers if ticker not in cached]
+    
+    async def _load_cached_async(self, tickers: List[str], force_update: bool) -> Tuple[Dict[str, PriceCache], List[str]]:
+        if self.async_repo is None:
+            return await asyncio.to_thread(self._load_cached, tickers, force_update)
+        if force_update:
+            return {}, list(tickers)
+        cached = await self.async_repo.get_prices(tickers)
+        return cached, [ticker for ticker in tickers if ticker not in cached]
+    
+    def _store_results(self, results: Dict[str, tuple]) -> Dict[str, PriceCache]:
+        """Persist provider results in the price cache and return them as PriceCache objects"""
+        stored = self._to_price_caches(results)
+        # One bulk write for the whole batch; every quote is also kept in the quote history
+        self.repo.set_prices(list(stored.values()))
+        self.repo.append_quotes(list(stored.values()))
+        return stored
+    
+    async def _store_results_async(self, results: Dict[str, tuple]) -> Dict[str, PriceCache]:
+        if self.async_repo is None:
+            return await asyncio.to_thread(self._store_results, results)
+        stored = self._to_price_caches(results)
+        await self.async_repo.set_prices(list(stored.values()))
+        await self.async_repo.append_quotes(list(stored.values()))
+        return stored
+    
+    def _to_price_caches(self, results: Dict[str, tuple]) -> Dict[str, PriceCache]:
+        stored: Dict[str, PriceCache] = {}
+        for ticker, (price, asof, currency, exchange, timezone_name, market_state, open_price) in results.items():
+            day_high, day_low = self.provider.get_day_range(ticker)
+            # Cache open_price too, for the daily % change calculation
+            stored[ticker] = PriceCache(ticker, price, asof, currency, exchange, timezone_name, market_state, open_price, day_high, day_low)
+            if self.validator:
+                # A symbol that just returned a price exists: spares a validation request
+                self.validator.mark_valid(ticker)
+        return stored
+    
+    def _load_stale(self, errors: Dict[str, str]) -> Dict[str, PriceCache]:
+        """Last cached prices for tickers the provider failed on, marked as stale"""
+        return self._mark_stale(self.repo.get_prices(list(errors)))
+    
+    async def _load_stale_async(self, errors: Dict[str, str]) -> Dict[str, PriceCache]:
+        if self.async_repo is None:
+            return await asyncio.to_thread(self._load_stale, errors)
+        return self._mark_stale(await self.async_repo.get_prices(list(errors)))
+    
+    @staticmethod
+    def _mark_stale(prices: Dict[str, PriceCache]) -> Dict[str, PriceCache]:
+        stale: Dict[str, PriceCache] = {}
+        for ticker, pc in prices.items():
+            # A copy: the repo snapshot keeps serving the original
+            pc = copy.copy(pc)
+            pc.stale = True
+            stale[ticker] = pc
+        return stale
+    
+    @staticmethod
+    def _merge(tickers: List[str], cached: Dict[str, PriceCache], results: Dict[str, tuple]) -> Dict[str, Tuple[PriceCache, bool]]:
+        return {ticker: (cached[ticker], ticker in results) for ticker in tickers if ticker in cached}
+    
     @staticmethod
     def calculate_price_change_pct(current_price: float, open_price: Optional[float]) -> Optional[float]:
         """Calculate percentage change between current price and market opening price"""
@@ -65,7 +196,54 @@ class StockService:
         """Find the nearest level to the current price"""
         if not levels:
             return None
-        return min(levels, key=lambda L: abs(price - L))
+        return level_index(levels).nearest(price)
+    
+    @staticmethod
+    def evaluate_statuses(entries: Sequence[Tuple[str, PriceCache, Sequence[float]]]) -> List[dict]:
+        """
+        Status dictionaries for many (ticker, price cache, levels) entries at once.
+        Levels of all watches are flattened into one array with per-watch offsets,
+        so distances, nearest levels, near flags and price changes are computed in
+        a few NumPy passes instead of a Python loop per ticker and level.
+        """
+        n = len(entries)
+        if not n:
+            return []
+        prices = np.array([pc.price for _, pc, _ in entries], float)
+        opens = np.array([pc.open_price if pc.open_price and pc.open_price > 0 else np.nan for _, pc, _ in entries], float)
+        counts = np.array([len(levels) for _, _, levels in entries], np.int64)
+        flat = np.fromiter(chain.from_iterable(levels for _, _, levels in entries), float, int(counts.sum()))
+
+        nearest = np.full(n, np.nan)
+        has_levels = counts > 0
+        if flat.size:
+            # reduceat needs non-empty segments: only watches with levels have one
+            offsets = (np.cumsum(counts) - counts)[has_levels]
+            diffs = np.abs(np.repeat(prices, counts) - flat)
+            best = np.minimum.reduceat(diffs, offsets)
+            # Among equally distant levels take the lower one
+            candidates = np.where(diffs == np.repeat(best, counts[has_levels]), flat, np.inf)
+            nearest[has_levels] = np.minimum.reduceat(candidates, offsets)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            distance = np.where(has_levels, np.abs(prices - nearest) / nearest, 0.0)
+            change = (prices - opens) / opens * 100
+        near = has_levels & (distance <= settings.NEAR_LEVEL_PCT)
+
+        statuses = []
+        for (ticker, pc, _), level, dist, is_near, pct in zip(entries, nearest.tolist(), distance.tolist(), near.tolist(), change.tolist()):
+            statuses.append({
+                "ticker": ticker,
+                "price": pc.price,
+                "currency": pc.currency,
+                "nearest_level": None if level != level else level,
+                "distance_pct": dist,
+                "near": is_near,
+                "open_price": pc.open_price,
+                "price_change_pct": None if pct != pct else pct,
+                "stale": pc.stale,
+            })
+        return statuses
     
     @staticmethod
     def create_status_read(
@@ -74,32 +252,7 @@ class StockService:
         levels: list[float]
     ) -> StatusRead:
         """Create a StatusRead object with all calculations"""
-        # Calculate price change from market open
-        price_change_pct = StockService.calculate_price_change_pct(
-            price_cache.price,
-            price_cache.open_price
-        )
-        
-        # Find nearest level and calculate distance
-        nearest_level = StockService.find_nearest_level(price_cache.price, levels)
-        
-        if nearest_level is not None:
-            distance_pct = StockService.calculate_distance_to_level(price_cache.price, nearest_level)
-            near = distance_pct <= settings.NEAR_LEVEL_PCT
-        else:
-            distance_pct = 0.0
-            near = False
-        
-        return StatusRead(
-            ticker=ticker,
-            price=price_cache.price,
-            currency=price_cache.currency,
-            nearest_level=nearest_level,
-            distance_pct=distance_pct,
-            near=near,
-            open_price=price_cache.open_price,
-            price_change_pct=price_change_pct
-        )
+        return StatusRead(**StockService.evaluate_statuses([(ticker, price_cache, levels)])[0])
     
     @staticmethod
     def create_status_dict(
@@ -107,30 +260,9 @@ class StockService:
         price: float,
         currency: str,
         open_price: Optional[float],
-        levels: list[float]
+        levels: list[float],
+        stale: bool = False
     ) -> dict:
         """Create a status dictionary for WebSocket broadcast"""
-        # Calculate price change from market open
-        price_change_pct = StockService.calculate_price_change_pct(price, open_price)
-        
-        # Find nearest level and calculate distance
-        nearest_level = StockService.find_nearest_level(price, levels)
-        
-        if nearest_level is not None:
-            distance_pct = StockService.calculate_distance_to_level(price, nearest_level)
-            near = distance_pct <= settings.NEAR_LEVEL_PCT
-        else:
-            distance_pct = 0.0
-            near = False
-        
-        return {
-            "ticker": ticker,
-            "price": price,
-            "currency": currency,
-            "nearest_level": nearest_level,
-            "distance_pct": distance_pct,
-            "near": near,
-            "open_price": open_price,
-            "price_change_pct": price_change_pct,
-        }
-
+        pc = PriceCache(ticker, price, None, currency, open_price=open_price, stale=stale)
+        return StockService.evaluate_statuses([(ticker, pc, levels)])[0]
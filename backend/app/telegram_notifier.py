@@ -1,9 +1,13 @@
 import hashlib
-from pydoc import text
-import token
 import requests
-from typing import Optional
+from requests.adapters import HTTPAdapter
+from typing import List, Optional
 from .config import settings
+from logging import getLogger
+logger = getLogger("watcher")
+
+# Telegram rejects longer messages
+MAX_MESSAGE_LENGTH = 4096
 
 
 class TelegramSettings:
@@ -12,11 +16,40 @@ class TelegramSettings:
         self.TELEGRAM_NOTIFICATION_ENABLED = enabled
 
 
+class TelegramError(RuntimeError):
+    """A sendMessage call that failed; retry_after is set when Telegram asks to slow down (HTTP 429)"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None, retryable: bool = True):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.retryable = retryable
+
+
+def digest(texts: List[str], max_length: int = MAX_MESSAGE_LENGTH) -> List[str]:
+    """Merge alert texts into as few messages as fit in max_length, keeping their order"""
+    messages, current = [], ""
+    for text in texts:
+        text = text[:max_length]
+        if current and len(current) + 2 + len(text) > max_length:
+            messages.append(current)
+            current = ""
+        current = f"{current}\n\n{text}" if current else text
+    if current:
+        messages.append(current)
+    return messages
+
+
 class Telegram:
-    def __init__(self, token: str, chat_id: str, settings_override: Optional[TelegramSettings] = None):
-        self.base = f"https://api.telegram.org/bot{token}"
+    def __init__(self, token: str, chat_id: str, settings_override: Optional[TelegramSettings] = None,
+                 api_url: Optional[str] = None, timeout: Optional[float] = None):
+        self.base = f"{(api_url or settings.TELEGRAM_API_URL).rstrip('/')}/bot{token}"
         self.chat_id = chat_id
-        
+        self.timeout = timeout or settings.TELEGRAM_TIMEOUT_SECONDS
+        # One pooled keep-alive connection instead of a new TLS handshake per message
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
         # Use override settings if provided, otherwise use global settings
         if settings_override is not None:
             self.enabled = bool(settings_override.TELEGRAM_NOTIFICATION_ENABLED)
@@ -26,15 +59,33 @@ class Telegram:
     def _hash(self, text: str) -> str:
         return hashlib.sha256(text.encode()).hexdigest()
 
+    def deliver(self, text: str):
+        """Send one message, raising TelegramError on failure. Blocking."""
+        try:
+            r = self.session.post(f"{self.base}/sendMessage", json={"chat_id": self.chat_id, "text": text, "parse_mode": "HTML"},
+                                  timeout=self.timeout)
+        except requests.RequestException as e:
+            raise TelegramError(f"Telegram unreachable: {e}")
+        if r.status_code == 429:
+            try:
+                retry_after = r.json().get("parameters", {}).get("retry_after")
+            except ValueError:
+                retry_after = None
+            raise TelegramError("Telegram rate limit reached", retry_after=retry_after)
+        if r.status_code >= 400:
+            # 4xx (bad token, chat or markup) won't succeed on retry; 5xx may
+            raise TelegramError(f"Telegram returned {r.status_code}: {r.text[:200]}", retryable=r.status_code >= 500)
+
     def send(self, text: str) -> str:
         if not self.enabled:
             return self._hash(text)
-        
+
         try:
-            url = f"{self.base}/sendMessage"
-            r = requests.post(url, json={"chat_id": self.chat_id, "text": text, "parse_mode": "HTML"})
-            r.raise_for_status()
-        except Exception as e:
-            print(f"Failed to send Telegram notification: {e}")
-        
-        return self._hash(text)
\ No newline at end of file
+            self.deliver(text)
+        except TelegramError as e:
+            logger.error(f"Failed to send Telegram notification: {e}")
+
+        return self._hash(text)
+
+    def close(self):
+        self.session.close()
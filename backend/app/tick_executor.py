@@ -0,0 +1,61 @@
+import time
+from collections import deque
+from typing import List
+from .models import TickOutcome
+from logging import getLogger
+logger = getLogger("watcher")
+
+
+class TickExecutor:
+    """
+    Runs watcher ticks without overlap.
+    A run triggered while a tick is in progress is coalesced: however many
+    arrive, one more tick starts right after the current one. Each tick gets a
+    deadline; tickers it couldn't reach are carried over and go first in the
+    next tick. The outcomes of the last history_size ticks are kept.
+    """
+    
+    def __init__(self, watcher, deadline_seconds: float | None = None, history_size: int = 100):
+        self.watcher = watcher
+        self.deadline_seconds = deadline_seconds
+        self.outcomes: deque = deque(maxlen=history_size)
+        self._running = False
+        self._pending = False
+        self._coalesced = 0
+        self._carry_over: List[str] = []
+    
+    @property
+    def running(self) -> bool:
+        return self._running
+    
+    async def run(self):
+        if self._running:
+            self._pending = True
+            self._coalesced += 1
+            logger.warning("Tick still running: overlapping run coalesced")
+            return
+        
+        self._running = True
+        try:
+            while True:
+                self._pending = False
+                deadline = time.monotonic() + self.deadline_seconds if self.deadline_seconds else None
+                try:
+                    outcome = await self.watcher.tick_async(deadline=deadline, priority=self._carry_over)
+                except Exception as e:
+                    logger.error(f"Tick failed: {e}")
+                    break
+                outcome.coalesced = self._coalesced
+                self._coalesced = 0
+                self._carry_over = outcome.deferred
+                self.outcomes.append(outcome)
+                logger.info(f"Tick done in {outcome.duration_seconds:.1f}s: {len(outcome.done)} done, "
+                            f"{len(outcome.failed)} failed, {len(outcome.deferred)} deferred")
+                if not self._pending:
+                    break
+        finally:
+            self._running = False
+    
+    def recent(self, limit: int = 20) -> List[TickOutcome]:
+        """Most recent outcomes first"""
+        return list(self.outcomes)[::-1][:limit]
@@ -0,0 +1,53 @@
+from typing import Dict, List
+from .cache import TTLCache
+from logging import getLogger
+logger = getLogger("watcher")
+
+
+class TickerValidator:
+    """
+    Caches ticker validation results: valid symbols are remembered for
+    valid_ttl_seconds, invalid ones for the shorter invalid_ttl_seconds so a
+    newly listed or mistyped-then-fixed symbol isn't rejected for long.
+    Cache misses are checked together in one provider.validate_many call.
+    """
+
+    def __init__(self, provider, valid_ttl_seconds: int = 604800, invalid_ttl_seconds: int = 600, max_size: int = 4096):
+        self.provider = provider
+        self.valid_ttl_seconds = valid_ttl_seconds
+        self.invalid_ttl_seconds = invalid_ttl_seconds
+        self._cache = TTLCache(max_size, valid_ttl_seconds)
+
+    def validate(self, ticker: str) -> bool:
+        return self.validate_many([ticker])[ticker]
+
+    def validate_many(self, tickers: List[str]) -> Dict[str, bool]:
+        """
+        Returns ticker -> exists on Yahoo Finance.
+        Provider errors are raised and never cached.
+        """
+        result: Dict[str, bool] = {}
+        missing = []
+        for ticker in dict.fromkeys(tickers):
+            cached = self._cache.get(ticker)
+            if cached is None:
+                missing.append(ticker)
+            else:
+                result[ticker] = cached
+
+        if missing:
+            for ticker, valid in self.provider.validate_many(missing).items():
+                self._set(ticker, valid)
+                result[ticker] = valid
+            logger.info(f"Validated {len(missing)} tickers, {len(result) - len(missing)} from cache")
+        return result
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+    def mark_valid(self, ticker: str):
+        """Record a ticker known to exist, e.g. one that just returned a price"""
+        self._set(ticker, True)
+
+    def _set(self, ticker: str, valid: bool):
+        self._cache.set(ticker, valid, self.valid_ttl_seconds if valid else self.invalid_ttl_seconds)
@@ -0,0 +1,261 @@
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List
+from logging import getLogger
+logger = getLogger("watcher")
+
+# Messages yfinance/Yahoo use when throttling
+_THROTTLE_PATTERN = re.compile(r"429|too many requests|rate ?limit", re.IGNORECASE)
+
+
+class UpstreamUnavailable(RuntimeError):
+    """Raised instead of calling the upstream while the circuit is open or the rate limit can't be met"""
+
+
+def is_throttle_error(message: str) -> bool:
+    return bool(_THROTTLE_PATTERN.search(message or ""))
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket with adaptive rate.
+    throttled() halves the rate and pauses all callers with exponential backoff;
+    succeeded() recovers the rate additively towards its configured value.
+    """
+    
+    def __init__(self, rate_per_second: float, burst: int, min_rate: float | None = None,
+                 backoff_seconds: float = 1.0, max_backoff_seconds: float = 60):
+        self.base_rate = rate_per_second
+        self.backoff_seconds = backoff_seconds
+        self.rate = rate_per_second
+        self.burst = burst
+        # Persistent throttling is the circuit breaker's job: don't slow down below a tenth of the rate
+        self.min_rate = rate_per_second / 10 if min_rate is None else min_rate
+        self.max_backoff_seconds = max_backoff_seconds
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._consecutive_throttles = 0
+        self._lock = threading.Lock()
+    
+    def acquire(self, timeout: float, tokens: int = 1, cancelled: Callable[[], bool] | None = None) -> bool:
+        """
+        Take tokens (at most burst), waiting at most timeout seconds.
+        Returns False if they can't be taken in time, or as soon as cancelled() is true while waiting.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now >= self._paused_until and self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = max(self._paused_until - now, (tokens - self._tokens) / self.rate)
+            if time.monotonic() + wait > deadline:
+                return False
+            if cancelled is None:
+                time.sleep(wait)
+                continue
+            time.sleep(min(wait, 0.1))
+            if cancelled():
+                return False
+    
+    def throttled(self):
+        with self._lock:
+            self._consecutive_throttles += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            backoff = min(self.max_backoff_seconds, self.backoff_seconds * 2 ** (self._consecutive_throttles - 1))
+            self._paused_until = time.monotonic() + backoff
+            self._tokens = 0
+        logger.warning(f"Upstream throttled: rate {self.rate:.2f}/s, backing off {backoff}s")
+    
+    def succeeded(self):
+        with self._lock:
+            self._consecutive_throttles = 0
+            self.rate = min(self.base_rate, self.rate + self.base_rate * 0.1)
+
+
+class CircuitBreaker:
+    """
+    closed: calls pass; after failure_threshold consecutive failures -> open.
+    open: calls are rejected until reset_seconds have passed -> half-open.
+    half-open: one probe call passes; success closes the circuit, failure re-opens it.
+    A batch of requests counts as one call, failed when at least failure_ratio of them failed.
+    """
+    
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 120, failure_ratio: float = 0.5):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failure_ratio = failure_ratio
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+    
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = "half-open"
+                self._probing = False
+            if self.state == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+    
+    def release(self):
+        """Give back a half-open probe slot that was admitted but never used"""
+        with self._lock:
+            self._probing = False
+    
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info("Upstream circuit closed")
+            self.state = "closed"
+            self._failures = 0
+            self._probing = False
+    
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == "half-open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning(f"Upstream circuit opened after {self._failures} failures")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self._probing = False
+    
+    def record_batch(self, failed: int, total: int):
+        if failed and failed >= self.failure_ratio * total:
+            self.record_failure()
+        else:
+            self.record_success()
+
+
+class GuardedProvider:
+    """
+    PriceProvider wrapper sharing one rate limiter and one circuit breaker across
+    all provider methods. Throttling (429) slows the limiter down; errors count as
+    failures; while the circuit is open calls fail fast with UpstreamUnavailable,
+    and callers fall back to cached data.
+
+    yf.download sends one request per symbol and reports failed symbols (429
+    included) as missing data instead of raising, so the batch methods take one
+    token per ticker, at most a burst at a time, and each chunk counts as one
+    breaker call that failed if enough of its tickers did.
+    """
+    
+    def __init__(self, provider, limiter: TokenBucket, breaker: CircuitBreaker, max_wait_seconds: float = 30):
+        self.provider = provider
+        self.limiter = limiter
+        self.breaker = breaker
+        self.max_wait_seconds = max_wait_seconds
+        self.rejected = 0
+    
+    def __getattr__(self, name: str):
+        # Non-fetching attributes (map, bars, metadata, to_records, ...) pass through
+        return getattr(self.provider, name)
+    
+    def _admit(self, method: str, tokens: int = 1, timeout: float | None = None):
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise UpstreamUnavailable(f"Upstream circuit open, {method} not attempted")
+        # Stop waiting for tokens once the circuit opens
+        circuit_opened = lambda: self.breaker.state == "open"
+        if not self.limiter.acquire(self.max_wait_seconds if timeout is None else timeout, tokens, circuit_opened):
+            self.breaker.release()
+            self.rejected += 1
+            if circuit_opened():
+                raise UpstreamUnavailable(f"Upstream circuit open, {method} not attempted")
+            raise UpstreamUnavailable(f"Upstream rate limit, {method} not attempted")
+        if circuit_opened():
+            # The circuit opened while this call was waiting for a token
+            self.rejected += 1
+            raise UpstreamUnavailable(f"Upstream circuit open, {method} not attempted")
+    
+    def _failed(self, message: str):
+        if is_throttle_error(message):
+            self.limiter.throttled()
+        self.breaker.record_failure()
+    
+    def _succeeded(self):
+        self.limiter.succeeded()
+        self.breaker.record_success()
+    
+    def _chunks(self, tickers: List[str]) -> Iterator[tuple[List[str], float]]:
+        """Unique tickers in chunks of at most a burst, each with the time left to wait for its tokens"""
+        tickers = list(dict.fromkeys(tickers))
+        deadline = time.monotonic() + self.max_wait_seconds
+        step = max(1, int(self.limiter.burst))
+        for i in range(0, len(tickers), step):
+            yield tickers[i:i + step], max(0.0, deadline - time.monotonic())
+    
+    def _call(self, method: str, fn: Callable, *args) -> Any:
+        self._admit(method)
+        try:
+            result = fn(*args)
+        except Exception as e:
+            self._failed(str(e))
+            raise
+        self._succeeded()
+        return result
+    
+    def validate_ticker(self, ticker: str) -> bool:
+        return self._call("validate_ticker", self.provider.validate_ticker, ticker)
+    
+    def validate_many(self, tickers: List[str]) -> Dict[str, bool]:
+        valid: Dict[str, bool] = {}
+        for chunk, timeout in self._chunks(tickers):
+            self._admit("validate_many", len(chunk), timeout)
+            try:
+                valid.update(self.provider.validate_many(chunk))
+            except Exception as e:
+                self._failed(str(e))
+                raise
+            self._succeeded()
+        return valid
+    
+    def get_last(self, ticker: str) -> tuple:
+        results, errors = self.get_last_many([ticker])
+        if ticker not in results:
+            raise RuntimeError(errors.get(ticker, f"No data for {ticker}"))
+        return results[ticker]
+    
+    def get_last_many(self, tickers: List[str]) -> tuple[Dict[str, tuple], Dict[str, str]]:
+        results: Dict[str, tuple] = {}
+        errors: Dict[str, str] = {}
+        for chunk, timeout in self._chunks(tickers):
+            try:
+                self._admit("get_last_many", len(chunk), timeout)
+            except UpstreamUnavailable as e:
+                errors.update({t: str(e) for t in chunk})
+                continue
+            chunk_results, chunk_errors = self.provider.get_last_many(chunk)
+            results.update(chunk_results)
+            errors.update(chunk_errors)
+            # Tickers without a quote failed, whether or not yfinance said why
+            failed = [t for t in chunk if t not in chunk_results]
+            if any(is_throttle_error(chunk_errors.get(t, "")) for t in failed):
+                self.limiter.throttled()
+            elif not failed:
+                self.limiter.succeeded()
+            self.breaker.record_batch(len(failed), len(chunk))
+        return results, errors
+    
+    def get_stock_details(self, ticker: str) -> dict:
+        return self._call("get_stock_details", self.provider.get_stock_details, ticker)
+    
+    def get_stock_price_fields(self, ticker: str) -> dict:
+        return self._call("get_stock_price_fields", self.provider.get_stock_price_fields, ticker)
+    
+    def get_historical_range(self, ticker: str, interval: str = "1d", period=None, start=None, end=None):
+        return self._call("get_historical_range", self.provider.get_historical_range, ticker, interval, period, start, end)
+    
+    def get_historical_prices(self, ticker: str, period: str = "1y", interval: str = "1d") -> list:
+        return self._call("get_historical_prices", self.provider.get_historical_prices, ticker, period, interval)
@@ -26,6 +26,19 @@ def normalize_market_state(yahoo_state: str | None) -> str:
         return 'unknown'
 
 
+def get_market_state(exchange: str, timezone_name: str, now: datetime | None = None) -> str:
+    """
+    Derive a Yahoo-style marketState (REGULAR, PRE, POST, CLOSED) from the
+    EXCHANGE_INFO calendar, so it doesn't have to be fetched from stock.info.
+    """
+    status, _ = get_market_status_for_timezone(timezone_name, exchange, now=now)
+    return {
+        'open': 'REGULAR',
+        'pre-market': 'PRE',
+        'after-hours': 'POST',
+    }.get(status, 'CLOSED')
+
+
 def pct_diff(a: float, b: float) -> float:
     return abs(a - b) / b if b != 0 else 0.0
 
@@ -38,6 +51,15 @@ def format_alert(ticker: str, price: float, level: float, distance_pct: float) -
     )
 
 
+def format_crossing(ticker: str, price: float, previous_price: float, levels: List[float]) -> str:
+    sign = "↑" if price >= previous_price else "↓"
+    crossed = ", ".join(f"{level:.2f}" for level in levels)
+    return (
+        f"<b>{ticker}</b> crossed level{'s' if len(levels) > 1 else ''} {crossed} {sign}"
+        f"Price: {price:.2f} | Previous: {previous_price:.2f}"
+    )
+
+
 # Exchange to timezone and trading hours mapping
 EXCHANGE_INFO = {
     # US Markets
@@ -166,7 +188,8 @@ def get_market_status_for_exchange(exchange: str) -> str:
     return 'closed'
 
 
-def get_market_status_for_timezone(timezone_name: str, exchange: str = 'Unknown', market_state: str | None = None) -> Tuple[str, str]:
+def get_market_status_for_timezone(timezone_name: str, exchange: str = 'Unknown', market_state: str | None = None,
+                                   now: datetime | None = None) -> Tuple[str, str]:
     """
     Determine market status using data from Yahoo Finance.
     Prioritizes marketState from Yahoo if available, falls back to timezone calculation.
@@ -175,6 +198,7 @@ def get_market_status_for_timezone(timezone_name: str, exchange: str = 'Unknown'
         timezone_name: Timezone from Yahoo (e.g., 'America/New_York')
         exchange: Exchange code (e.g., 'NMS', 'MIL')
         market_state: Yahoo's marketState if available (REGULAR, PRE, POST, CLOSED)
+        now: Point in time to evaluate (timezone-aware), defaults to the current time
     
     Returns: (status, exchange_name)
     """
@@ -189,7 +213,7 @@ def get_market_status_for_timezone(timezone_name: str, exchange: str = 'Unknown'
         # Fallback to US Eastern if timezone not recognized
         tz = ZoneInfo('America/New_York')
     
-    now_local = datetime.now(tz)
+    now_local = now.astimezone(tz) if now else datetime.now(tz)
     
     # Check if weekend
     if now_local.weekday() >= 5:  # Saturday=5, Sunday=6
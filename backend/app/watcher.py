@@ -1,73 +1,197 @@
+import asyncio
+import time
 from datetime import datetime, timezone
+from typing import Collection, Dict, List, Optional
 from .repository import Repo
+from .models import Watch, PriceCache, TickOutcome, AlertState
 from .data_provider import PriceProvider
-from .telegram_notifier import Telegram
+from .telegram_notifier import Telegram, digest
 from .config import settings
-from .utils import pct_diff, format_alert
+from .utils import format_alert, format_crossing
 from .stock_service import StockService
+from .market_schedule import MarketSchedule
+from .metrics import TICK_PHASE
+from .poll_scheduler import PollScheduler
+from .sharding import ShardCoordinator
+from .level_index import level_index
+from .alert_state import AlertStore
+from .notification_dispatcher import NotificationDispatcher
 from logging import getLogger
 logger = getLogger("watcher")
 
 class Watcher:
-    def __init__(self, repo: Repo, provider: PriceProvider, notifier: Telegram, ws_manager=None, stock_service=None):
+    def __init__(self, repo: Repo, provider: PriceProvider, notifier: Telegram, ws_manager=None, stock_service=None,
+                 schedule: MarketSchedule | None = None, poller: PollScheduler | None = None,
+                 shard: ShardCoordinator | None = None, alerts: AlertStore | None = None,
+                 dispatcher: NotificationDispatcher | None = None, async_repo=None):
         self.repo = repo
+        # With an async repo (AsyncRepo) the tick awaits MongoDB instead of using worker threads
+        self.async_repo = async_repo
         self.provider = provider
         self.notifier = notifier
         self.ws_manager = ws_manager
-        self.stock_service = stock_service or StockService(repo, provider)
+        self.stock_service = stock_service or StockService(repo, provider, async_repo)
+        self.schedule = schedule or MarketSchedule(settings.POLL_SESSIONS)
+        # Without a poller every in-session watch is polled on every tick
+        self.poller = poller
+        # With a shard coordinator only the watches in partitions leased by this replica are polled
+        self.shard = shard
+        self.alerts = alerts or AlertStore(repo, async_repo)
+        # Without a dispatcher the tick sends its alert digest itself
+        self.dispatcher = dispatcher
         self.last_update = None
+        # Last price evaluated per ticker, the start of the range checked for level crossings.
+        # Kept here rather than read from the price cache, which /status refreshes also overwrite
+        self._last_seen: Dict[str, PriceCache] = {}
 
 
-    async def tick_async(self):
+    async def tick_async(self, deadline: float | None = None, priority: Collection[str] = ()) -> TickOutcome:
+        """
+        Poll the due watches and evaluate them against their levels.
+        Watches are fetched and evaluated in chunks; once the time.monotonic()
+        deadline has passed, the remaining ones are reported as deferred.
+        Tickers in priority (e.g. deferred by the previous tick) go first.
+        """
         # versione async per poter fare broadcast WS
-        # if it's saturday or sunday, skip
-        
-        if datetime.now(timezone.utc).weekday() >= 5:
-            logger.info("Skipping tick on weekend")
-            return
+        started = time.monotonic()
+        outcome = TickOutcome(datetime.now(timezone.utc))
 
-        watches = [w for w in self.repo.list_watches() if w.enabled]
-        logger.info("Tick: %d watches", len(watches))
+        # Blocking I/O (yfinance, requests, pymongo without an async repo) runs in worker
+        # threads so the event loop keeps serving /ws and the REST endpoints during the tick
+        watches = [w for w in await self._list_watches() if w.enabled]
+        select_started = time.perf_counter()
+        if self.shard:
+            watches = [w for w in watches if self.shard.owns(w.ticker)]
+        watched = {w.ticker for w in watches}
+        self._last_seen = {t: pc for t, pc in self._last_seen.items() if t in watched}
+        # Intraday bars of tickers no longer watched here would otherwise stay in memory for good
+        self.provider.retain_bars(watched)
+        self.alerts.sync(watches)
 
-        status_push = []
-        for w in watches:
+        # Only poll watches whose market is in session (or has just closed)
+        now = datetime.now(timezone.utc)
+        cached = await self._cached_prices(watches)
+        in_session, closing, skipped = self.schedule.plan(watches, cached, now)
+        watches = in_session + closing
+        if self.poller:
+            # Closed markets start over with an immediate poll when they reopen
+            self.poller.forget([w.ticker for w in skipped])
+            selected = set(self.poller.select([w.ticker for w in watches], now, force={w.ticker for w in closing}))
+            watches = [w for w in watches if w.ticker in selected]
+        outcome.skipped = len(skipped)
+        logger.info("Tick: %d watches, %d skipped outside market hours", len(watches), len(skipped))
+
+        if priority:
+            first = set(priority)
+            watches = [w for w in watches if w.ticker in first] + [w for w in watches if w.ticker not in first]
+        TICK_PHASE.observe(time.perf_counter() - select_started, "select")
+
+        notifications: List[str] = []
+        # Chunks of as many tickers as one round of concurrent grouped requests
+        chunk_size = max(1, settings.PROVIDER_BATCH_SIZE) * max(1, settings.PROVIDER_MAX_CONCURRENCY)
+        for i in range(0, len(watches), chunk_size):
+            if deadline is not None and time.monotonic() >= deadline:
+                outcome.deferred = [w.ticker for w in watches[i:]]
+                logger.warning(f"Tick deadline reached: {len(outcome.deferred)} watches deferred to the next tick")
+                break
+            await self._process(watches[i:i + chunk_size], now, outcome, cached, notifications)
+        if self.poller and outcome.failed:
+            # Without a fresh quote, retry later rather than on every tick
+            self.poller.failed(outcome.failed, now)
+
+        if notifications:
+            with TICK_PHASE.time("notify"):
+                # All alerts of the tick go out as one digest
+                if self.dispatcher:
+                    self.dispatcher.submit(notifications)
+                else:
+                    for message in digest(notifications):
+                        await asyncio.to_thread(self.notifier.send, message)
+
+        try:
+            with TICK_PHASE.time("persist"):
+                # Alert state changes of the whole tick in one bulk write
+                await self.alerts.flush_async()
+        except Exception as e:
+            logger.error(f"Failed to save alert states, retrying next tick: {e}")
+
+        if outcome.done or outcome.failed:
+            self.last_update = datetime.utcnow()
+        outcome.duration_seconds = time.monotonic() - started
+        return outcome
+
+    async def _process(self, watches: List[Watch], now: datetime, outcome: TickOutcome,
+                       previous: Dict[str, Optional[PriceCache]], notifications: List[str]):
+        """
+        Fetch, evaluate and broadcast one chunk of watches; previous holds the prices
+        seen by the last tick. Alert texts are appended to notifications.
+        """
+        # Fetch all quotes in grouped, concurrent provider requests (force fresh data)
+        prices, errors = await self.stock_service.get_prices_async([w.ticker for w in watches], force_update=True)
+        for ticker, error in errors.items():
+            logger.error(f"Error fetching price for {ticker}: {error}")
+
+        evaluate_started = time.perf_counter()
+        outcome.failed.extend(w.ticker for w in watches if w.ticker not in prices)
+        watches = [w for w in watches if w.ticker in prices]
+        # One batch evaluation for the chunk, also broadcast as is
+        status_push = StockService.evaluate_statuses([(w.ticker, prices[w.ticker][0], w.levels) for w in watches])
+        for w, status_dict in zip(watches, status_push):
             try:
-                # Use stock_service to update price (force fresh data)
-                pc, _ = self.stock_service.get_price(w.ticker, force_update=True)
-                if not pc:
+                pc, _ = prices[w.ticker]
+                
+                # A cached price is not a new observation: leave the alert state alone
+                if pc.stale:
+                    outcome.failed.append(w.ticker)
                     continue
                 
-                # Use StockService to create status dictionary
-                status_dict = StockService.create_status_dict(
-                    ticker=w.ticker,
-                    price=pc.price,
-                    currency=pc.currency,
-                    open_price=pc.open_price,
-                    levels=w.levels
-                )
-                status_push.append(status_dict)
+                if self.poller:
+                    distance = status_dict["distance_pct"] if status_dict["nearest_level"] is not None else None
+                    self.poller.update(w.ticker, distance, self.provider.get_volatility(w.ticker), now)
                 
+                # Levels traded through since the last tick alert even if the price moved away again
+                prev = self._last_seen.get(w.ticker) or previous.get(w.ticker)
+                self._last_seen[w.ticker] = pc
+                crossed = level_index(w.levels).crossed(prev, pc)
+                last = self.alerts.get(w.ticker)
+                text = None
+                if crossed:
+                    # Remember the crossed level closest to where the price ended up
+                    level = min(crossed, key=lambda L: abs(pc.price - L))
+                    direction = "up" if pc.price >= prev.price else "down"
+                    if not (last and crossed == [last.level] and last.direction == direction):
+                        text = format_crossing(w.ticker, pc.price, prev.price, crossed)
                 # Check if near level for alerts
-                if status_dict["nearest_level"] is not None and status_dict["near"]:
-                    text = format_alert(
-                        w.ticker,
-                        pc.price,
-                        status_dict["nearest_level"],
-                        status_dict["distance_pct"]
-                    )
-                    current_hash = self.notifier._hash(text)
-                    if current_hash != w.last_alert_hash:
-                        self.notifier.send(text)
-                        self.repo.update_last_alert(w.ticker, current_hash)
+                elif status_dict["nearest_level"] is not None and status_dict["near"]:
+                    level = status_dict["nearest_level"]
+                    direction = "up" if pc.price >= level else "down"
+                    # Alert once per level and side until the price leaves the zone
+                    if not (last and last.level == level and last.direction == direction):
+                        text = format_alert(w.ticker, pc.price, level, status_dict["distance_pct"])
                 else:
-                    if w.last_alert_hash:
-                        self.repo.update_last_alert(w.ticker, None)
+                    self.alerts.clear(w.ticker)
+                if text:
+                    notifications.append(text)
+                    self.alerts.set(w.ticker, AlertState(level, direction, now))
+                outcome.done.append(w.ticker)
                         
             except Exception as e:
                 logger.error(f"Error processing ticker {w.ticker}: {e}")
-        
-        self.last_update = datetime.utcnow()
+                outcome.failed.append(w.ticker)
+        TICK_PHASE.observe(time.perf_counter() - evaluate_started, "evaluate")
                         
         if self.ws_manager and status_push:
-            await self.ws_manager.broadcast({"type": "status", "data": status_push})
-            logger.info("Broadcasted %d statuses via WS", len(status_push))
\ No newline at end of file
+            with TICK_PHASE.time("broadcast"):
+                await self.ws_manager.broadcast({"type": "status", "data": status_push})
+            logger.info("Broadcasted %d statuses via WS", len(status_push))
+
+    async def _list_watches(self) -> List[Watch]:
+        if self.async_repo is None:
+            return await asyncio.to_thread(self.repo.list_watches)
+        return await self.async_repo.list_watches()
+
+    async def _cached_prices(self, watches) -> dict:
+        tickers = [w.ticker for w in watches]
+        if self.async_repo is None:
+            return await asyncio.to_thread(self.repo.get_prices, tickers)
+        return await self.async_repo.get_prices(tickers)
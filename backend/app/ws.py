@@ -1,6 +1,7 @@
 from typing import Set
 from fastapi import WebSocket, WebSocketDisconnect
 import json
+from .metrics import WS_BROADCAST
 
 
 class WSManager:
@@ -17,10 +18,11 @@ class WSManager:
     async def broadcast(self, payload: dict):
         message = json.dumps(payload, default=str)
         stale = []
-        for ws in list(self.active):
-            try:
-                await ws.send_text(message)
-            except Exception:
-                stale.append(ws)
+        with WS_BROADCAST.time():
+            for ws in list(self.active):
+                try:
+                    await ws.send_text(message)
+                except Exception:
+                    stale.append(ws)
         for ws in stale:
             self.disconnect(ws)
\ No newline at end of file
@@ -0,0 +1,116 @@
+"""
+Time a burst of concurrent dashboard loads (list_watches + get_prices) on the
+event loop, with the blocking repo run in worker threads versus an async repo
+awaited on the loop.
+
+threads: ThreadedAsyncRepo over the blocking repo, as the routes and the
+         watcher did before; concurrency is capped by the default executor
+async:   an async repo; concurrency is capped by the connection pool
+
+Without --mongo-url both use the in-memory repo with a simulated round trip
+of --rtt milliseconds per call (time.sleep in threads, asyncio.sleep on the
+loop with at most --pool calls at once); with it, Repo against AsyncRepo with
+--pool connections each.
+
+Usage (from backend/):
+    python -m benchmarks.bench_async_repo [--requests 500] [--watches 50] [--rtt 5] [--mongo-url mongodb://localhost:27017]
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from app.async_repository import ThreadedAsyncRepo
+from app.models import PriceCache, Watch
+
+from .fake_upstream import InMemoryRepo
+
+
+class SlowRepo:
+    """Blocking repo proxy sleeping rtt seconds per call"""
+
+    def __init__(self, repo, rtt: float):
+        self.repo = repo
+        self.rtt = rtt
+
+    def __getattr__(self, name):
+        attr = getattr(self.repo, name)
+
+        def call(*args, **kwargs):
+            time.sleep(self.rtt)
+            return attr(*args, **kwargs)
+        return call
+
+
+class SlowAsyncRepo:
+    """Async repo proxy awaiting rtt seconds per call, at most pool calls at a time like a connection pool"""
+
+    def __init__(self, repo, rtt: float, pool: int):
+        self.repo = repo
+        self.rtt = rtt
+        self.pool = asyncio.Semaphore(pool)
+
+    def __getattr__(self, name):
+        attr = getattr(self.repo, name)
+
+        async def call(*args, **kwargs):
+            async with self.pool:
+                await asyncio.sleep(self.rtt)
+            return attr(*args, **kwargs)
+        return call
+
+
+async def burst(repo, requests: int) -> float:
+    async def dashboard():
+        watches = await repo.list_watches()
+        await repo.get_prices([w.ticker for w in watches])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(dashboard() for _ in range(requests)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="concurrent dashboard loads")
+    parser.add_argument("--watches", type=int, default=50)
+    parser.add_argument("--rtt", type=float, default=5, help="simulated round trip, milliseconds")
+    parser.add_argument("--pool", type=int, default=100, help="connection pool size")
+    parser.add_argument("--mongo-url", default=None)
+    args = parser.parse_args()
+
+    now = datetime.now(timezone.utc)
+    if args.mongo_url:
+        from app.async_repository import AsyncRepo
+        from app.repository import Repo
+        backend = Repo(args.mongo_url, "bench_async_repo", maxPoolSize=args.pool)
+        backend.watches_collection.delete_many({})
+        backend.prices_collection.delete_many({})
+        threaded = ThreadedAsyncRepo(backend)
+        make_async = lambda: AsyncRepo(args.mongo_url, "bench_async_repo", maxPoolSize=args.pool)
+    else:
+        backend = InMemoryRepo()
+        threaded = ThreadedAsyncRepo(SlowRepo(backend, args.rtt / 1000))
+        make_async = lambda: SlowAsyncRepo(backend, args.rtt / 1000, args.pool)
+    for i in range(args.watches):
+        backend.upsert_watch(Watch(f"T{i:04d}", [100.0]))
+    backend.set_prices([PriceCache(f"T{i:04d}", 100.0 + i, now) for i in range(args.watches)])
+
+    async def run_async() -> float:
+        # The async client binds to the running loop
+        repo = make_async()
+        try:
+            return await burst(repo, args.requests)
+        finally:
+            if args.mongo_url:
+                await repo.close()
+
+    print(f"{args.requests} concurrent dashboard loads, {args.watches} watches, "
+          f"{'MongoDB' if args.mongo_url else f'{args.rtt} ms simulated round trip'}")
+    print(f"{'':>8} {'s':>8} {'loads/s':>9}")
+    for name, seconds in (("threads", asyncio.run(burst(threaded, args.requests))), ("async", asyncio.run(run_async()))):
+        print(f"{name:>8} {seconds:>8.3f} {args.requests / seconds:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
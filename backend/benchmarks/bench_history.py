@@ -0,0 +1,65 @@
+"""
+Benchmark /stocks/{ticker}/history cold vs warm latency.
+
+Cold: the history store is empty and the period is downloaded from the
+(stubbed) provider. Warm: the same period is answered from the store.
+Also shows a 1y request followed by max, where only the missing head is
+downloaded.
+
+By default the store is InMemoryRepo; pass --mongo-url to use a real
+MongoDB (a throwaway database is created and dropped).
+
+Usage (from backend/):
+    python -m benchmarks.bench_history [--latency 0.2] [--mongo-url mongodb://localhost:27017]
+"""
+import argparse
+import time
+
+from app import data_provider
+from app.data_provider import PriceProvider
+from app.history_store import HistoryStore
+from benchmarks.fake_upstream import FakeYFinance, InMemoryRepo
+
+
+def timed(store: HistoryStore, fake: FakeYFinance, ticker: str, period: str) -> tuple[float, int, int]:
+    """Returns (seconds, points returned, bars downloaded)"""
+    rows_before = fake.rows
+    start = time.perf_counter()
+    points = store.get_history(ticker, period, "1d")
+    return time.perf_counter() - start, len(points), fake.rows - rows_before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per simulated HTTP request")
+    parser.add_argument("--mongo-url", default=None)
+    args = parser.parse_args()
+
+    fake = FakeYFinance(latency=args.latency)
+    data_provider.yf = fake
+    if args.mongo_url:
+        from app.repository import Repo
+        repo = Repo(args.mongo_url, "stockswatcher_bench")
+    else:
+        repo = InMemoryRepo()
+    store = HistoryStore(repo, PriceProvider({}))
+
+    print(f"{'case':<22} {'ms':>10} {'points':>8} {'downloaded':>11}")
+    for label, ticker, period in [
+        ("1y cold", "AAA", "1y"),
+        ("1y warm", "AAA", "1y"),
+        ("max cold", "BBB", "max"),
+        ("max warm", "BBB", "max"),
+        ("1y then max (head)", "AAA", "max"),
+        ("max warm", "AAA", "max"),
+        ("5y from max store", "BBB", "5y"),
+    ]:
+        seconds, points, downloaded = timed(store, fake, ticker, period)
+        print(f"{label:<22} {seconds * 1000:>10.1f} {points:>8} {downloaded:>11}")
+
+    if args.mongo_url:
+        repo.mongo_client.drop_database("stockswatcher_bench")
+
+
+if __name__ == "__main__":
+    main()
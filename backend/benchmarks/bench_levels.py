@@ -0,0 +1,101 @@
+"""
+Compare level evaluation with the linear scan and with LevelIndex, and count
+the level crossings the near-level check alone misses.
+
+Part 1 times the nearest-level lookup for watches with many levels.
+Part 2 simulates a session of 1-minute bars polled every --interval minutes
+and counts the levels traded through: how many the near check sees on a
+poll, and how many LevelIndex.crossed reports from the previous poll, the
+current price and the session high/low.
+
+Usage (from backend/):
+    python -m benchmarks.bench_levels [--levels 500] [--lookups 20000] [--watches 200] [--interval 5]
+"""
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.config import settings
+from app.level_index import LevelIndex
+from app.models import PriceCache
+
+SESSION_MINUTES = 390
+
+
+def bench_lookup(levels: int, lookups: int, seed: int):
+    rng = np.random.default_rng(seed)
+    level_list = list(rng.uniform(50, 150, levels))
+    prices = list(rng.uniform(40, 160, lookups))
+
+    start = time.perf_counter()
+    linear = [min(level_list, key=lambda L: abs(p - L)) for p in prices]
+    linear_seconds = time.perf_counter() - start
+
+    index = LevelIndex(level_list)
+    start = time.perf_counter()
+    indexed = [index.nearest(p) for p in prices]
+    indexed_seconds = time.perf_counter() - start
+
+    assert linear == indexed
+    print(f"nearest level, {levels} levels, {lookups} lookups")
+    print(f"  linear min():  {linear_seconds * 1e6 / lookups:8.2f} us/lookup")
+    print(f"  LevelIndex:    {indexed_seconds * 1e6 / lookups:8.2f} us/lookup ({linear_seconds / indexed_seconds:.0f}x)")
+
+
+def bench_crossings(watches: int, interval: int, seed: int):
+    rng = np.random.default_rng(seed)
+    start = datetime(2024, 1, 3, 14, 30, tzinfo=timezone.utc)
+    vol = rng.uniform(0.0005, 0.003, watches)
+    returns = rng.normal(0, 1, (SESSION_MINUTES, watches)) * vol
+    closes = 100 * np.exp(np.cumsum(returns, axis=0))
+    # Intrabar extremes a little beyond the closes
+    highs = np.maximum(closes, np.vstack([closes[:1], closes[:-1]])) * (1 + np.abs(rng.normal(0, 1, closes.shape)) * vol / 2)
+    lows = np.minimum(closes, np.vstack([closes[:1], closes[:-1]])) * (1 - np.abs(rng.normal(0, 1, closes.shape)) * vol / 2)
+    levels = 100 * (1 + rng.uniform(-0.05, 0.05, (watches, 5)))
+
+    crossed_total = seen_near = seen_index = 0
+    for w in range(watches):
+        index = LevelIndex(levels[w])
+        # Ground truth: levels inside the range of any bar
+        traded = {L for L in index.levels if lows[:, w].min() <= L <= highs[:, w].max()}
+        crossed_total += len(traded)
+        previous = None
+        near_levels, index_levels = set(), set()
+        for m in range(0, SESSION_MINUTES, interval):
+            pc = PriceCache(str(w), float(closes[m, w]), start + timedelta(minutes=m),
+                            day_high=float(highs[:m + 1, w].max()), day_low=float(lows[:m + 1, w].min()))
+            nearest = index.nearest(pc.price)
+            if abs(pc.price - nearest) / nearest <= settings.NEAR_LEVEL_PCT:
+                near_levels.add(nearest)
+            if previous is None:
+                # The first poll has nothing to compare with; count the levels of the opening range
+                index_levels.update(index.between(pc.day_low, pc.day_high))
+            else:
+                index_levels.update(index.crossed(previous, pc))
+            previous = pc
+        seen_near += len(near_levels & traded)
+        seen_index += len(index_levels & traded)
+
+    print(f"level crossings, {watches} watches x 5 levels, polled every {interval} min")
+    print(f"  levels traded through:         {crossed_total}")
+    print(f"  seen by the near check:        {seen_near}")
+    print(f"  seen by LevelIndex.crossed:    {seen_index}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", type=int, default=500)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--watches", type=int, default=200)
+    parser.add_argument("--interval", type=int, default=settings.CHECK_INTERVAL_MINUTES, help="poll interval, minutes")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    bench_lookup(args.levels, args.lookups, args.seed)
+    bench_crossings(args.watches, args.interval, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Measure how Telegram notifications weigh on watcher ticks, against a local
+Telegram stand-in with configurable latency and 429 replies.
+
+inline:     every alert is sent from the tick, one request each (the old path)
+dispatcher: the tick hands its alerts to NotificationDispatcher, which sends
+            them as digests in the background, rate limited and retried
+
+Reports the time the ticks spent on notifications, the messages and requests
+Telegram received, and how long until every alert was delivered.
+
+Usage (from backend/):
+    python -m benchmarks.bench_notify [--ticks 5] [--alerts 30] [--latency 0.2] [--throttle-rate 0.1]
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from app.notification_dispatcher import NotificationDispatcher
+from app.telegram_notifier import Telegram, TelegramSettings
+from app.utils import format_alert
+
+from .fake_telegram import FakeTelegram
+
+
+def alerts(tick: int, count: int) -> list[str]:
+    return [format_alert(f"T{tick:02d}{i:03d}", 100 + i * 0.01, 100.0, i * 0.0001) for i in range(count)]
+
+
+async def run_inline(server: FakeTelegram, ticks: int, count: int) -> float:
+    notifier = Telegram("token", "chat", TelegramSettings(enabled=True), api_url=server.url)
+    blocked = 0.0
+    for tick in range(ticks):
+        start = time.perf_counter()
+        for text in alerts(tick, count):
+            await asyncio.to_thread(notifier.send, text)
+        blocked += time.perf_counter() - start
+    notifier.close()
+    return blocked
+
+
+async def run_dispatcher(server: FakeTelegram, ticks: int, count: int, per_minute: float) -> tuple[float, float]:
+    notifier = Telegram("token", "chat", TelegramSettings(enabled=True), api_url=server.url)
+    dispatcher = NotificationDispatcher(notifier, messages_per_minute=per_minute, backoff_seconds=0.2)
+    dispatcher.start()
+    started = time.perf_counter()
+    blocked = 0.0
+    for tick in range(ticks):
+        start = time.perf_counter()
+        dispatcher.submit(alerts(tick, count))
+        blocked += time.perf_counter() - start
+    await dispatcher.stop(timeout=600)
+    return blocked, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ticks", type=int, default=5)
+    parser.add_argument("--alerts", type=int, default=30, help="alerts per tick")
+    parser.add_argument("--latency", type=float, default=0.2, help="Telegram response time, seconds")
+    parser.add_argument("--throttle-rate", type=float, default=0.1, help="share of requests answered with 429")
+    parser.add_argument("--per-minute", type=float, default=60, help="dispatcher messages per minute")
+    args = parser.parse_args()
+    # The inline path logs every throttled alert
+    logging.getLogger("watcher").setLevel(logging.CRITICAL)
+
+    print(f"{args.ticks} ticks x {args.alerts} alerts, Telegram latency {args.latency}s, {args.throttle_rate:.0%} throttled")
+    print(f"{'':>10} {'tick time s':>12} {'requests':>9} {'messages':>9} {'alerts lost':>12} {'delivered after s':>18}")
+
+    server = FakeTelegram(args.latency, args.throttle_rate, retry_after=1, seed=1).start()
+    blocked = asyncio.run(run_inline(server, args.ticks, args.alerts))
+    lost = args.ticks * args.alerts - len(server.messages)
+    print(f"{'inline':>10} {blocked:>12.2f} {server.requests:>9} {len(server.messages):>9} {lost:>12} {blocked:>18.2f}")
+    server.stop()
+
+    server = FakeTelegram(args.latency, args.throttle_rate, retry_after=1, seed=1).start()
+    blocked, delivered = asyncio.run(run_dispatcher(server, args.ticks, args.alerts, args.per_minute))
+    lost = args.ticks * args.alerts - sum(m.count("<b>") for m in server.messages)
+    print(f"{'dispatcher':>10} {blocked:>12.4f} {server.requests:>9} {len(server.messages):>9} {lost:>12} {delivered:>18.2f}")
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
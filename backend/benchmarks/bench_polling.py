@@ -0,0 +1,100 @@
+"""
+Simulate a trading session of random-walk prices and compare fixed-interval
+polling with PollScheduler.
+
+Each watch gets one level at a random distance (0.5% to 20%) and its own
+per-minute volatility. An alert event starts when the price enters the
+NEAR_LEVEL_PCT zone; the benchmark reports how many events each strategy
+observed, how long after the event started, and how many ticker quotes (one
+Yahoo request each) it needed. Fixed polling is shown at CHECK_INTERVAL_MINUTES
+and at a fast interval with an alert delay similar to the adaptive one.
+
+Usage (from backend/):
+    python -m benchmarks.bench_polling [--watches 200] [--interval 300] [--fast-interval 15] [--budget 120]
+"""
+import argparse
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.config import settings
+from app.poll_scheduler import PollScheduler
+
+STEP_SECONDS = 5
+SESSION_MINUTES = 390
+
+
+def simulate_prices(watches: int, seed: int):
+    """Returns (prices [steps, watches], levels [watches], per-minute volatility [watches])"""
+    rng = np.random.default_rng(seed)
+    steps = SESSION_MINUTES * 60 // STEP_SECONDS
+    vol = rng.uniform(0.0005, 0.003, watches)
+    returns = rng.normal(0, 1, (steps, watches)) * vol * np.sqrt(STEP_SECONDS / 60)
+    prices = 100 * np.exp(np.cumsum(returns, axis=0))
+    distance = np.exp(rng.uniform(np.log(0.005), np.log(0.2), watches))
+    levels = 100 * (1 + distance * rng.choice([-1, 1], watches))
+    return prices, levels, vol
+
+
+def near_events(near: np.ndarray) -> list[tuple[int, int, int]]:
+    """(watch, first step, last step) of each stretch spent in the near zone"""
+    events = []
+    for w in range(near.shape[1]):
+        col = np.concatenate([[False], near[:, w], [False]]).astype(np.int8)
+        starts = np.flatnonzero(np.diff(col) == 1)
+        ends = np.flatnonzero(np.diff(col) == -1)
+        events.extend((w, s, e - 1) for s, e in zip(starts, ends))
+    return events
+
+
+def score(polled: np.ndarray, near: np.ndarray, events) -> tuple[int, float]:
+    """(events seen by a poll while near, median seconds from event start to that poll)"""
+    delays = []
+    for w, start, end in events:
+        hits = np.flatnonzero(polled[start:end + 1, w])
+        if hits.size:
+            delays.append(hits[0] * STEP_SECONDS)
+    return len(delays), float(np.median(delays)) if delays else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--watches", type=int, default=200)
+    parser.add_argument("--interval", type=int, default=settings.CHECK_INTERVAL_MINUTES * 60, help="fixed polling interval, seconds")
+    parser.add_argument("--fast-interval", type=int, default=15, help="second fixed polling interval, seconds")
+    parser.add_argument("--budget", type=int, default=settings.POLL_REQUESTS_PER_MINUTE, help="adaptive requests per minute")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    prices, levels, vol = simulate_prices(args.watches, args.seed)
+    steps = prices.shape[0]
+    near = np.abs(prices - levels) / levels <= settings.NEAR_LEVEL_PCT
+    events = near_events(near)
+
+    fixed = np.zeros_like(near)
+    fixed[::args.interval // STEP_SECONDS] = True
+    fast = np.zeros_like(near)
+    fast[::args.fast_interval // STEP_SECONDS] = True
+
+    poller = PollScheduler(settings.POLL_MIN_SECONDS, settings.POLL_MAX_SECONDS, args.budget)
+    adaptive = np.zeros_like(near)
+    tickers = [str(w) for w in range(args.watches)]
+    start = datetime(2024, 1, 3, 14, 30, tzinfo=timezone.utc)
+    for step in range(steps):
+        now = start + timedelta(seconds=step * STEP_SECONDS)
+        for t in poller.select(tickers, now):
+            w = int(t)
+            adaptive[step, w] = True
+            distance = abs(prices[step, w] - levels[w]) / levels[w]
+            poller.update(t, distance, vol[w], now)
+
+    print(f"{args.watches} watches, {SESSION_MINUTES} min session, {len(events)} near-level events")
+    print(f"{'':>10} {'quotes':>8} {'events seen':>12} {'median delay s':>15}")
+    for name, polled in ((f"{args.interval}s", fixed), (f"{args.fast_interval}s", fast), ("adaptive", adaptive)):
+        seen, delay = score(polled, near, events)
+        print(f"{name:>10} {int(polled.sum()):>8} {seen:>12} {delay:>15.0f}")
+    print(f"adaptive deferred by budget: {poller.deferred}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Count and time the MongoDB round trips of a dashboard load and of the price
+writes of a tick: one get_price / set_price per ticker versus the bulk
+get_prices / set_prices, and of the same dashboard load served by the
+in-memory RepoSnapshot.
+
+Without --mongo-url or --sqlite the in-memory repo is used and every call
+pays a simulated network round trip of --rtt milliseconds. --sqlite measures
+the embedded SQLite backend in a temporary file.
+
+Usage (from backend/):
+    python -m benchmarks.bench_repo [--watches 500] [--rtt 0.5] [--mongo-url mongodb://localhost:27017 | --sqlite]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from app.models import PriceCache, Watch
+from app.repo_snapshot import RepoSnapshot
+
+from .fake_upstream import InMemoryRepo
+
+
+class RoundTrips:
+    """Repo proxy counting calls; each call sleeps rtt seconds like a network round trip"""
+
+    def __init__(self, repo, rtt: float):
+        self.repo = repo
+        self.rtt = rtt
+        self.calls = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self.repo, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            self.calls += 1
+            if self.rtt:
+                time.sleep(self.rtt)
+            return attr(*args, **kwargs)
+        return call
+
+
+def measure(repo: RoundTrips, fn) -> tuple[int, float]:
+    repo.calls = 0
+    start = time.perf_counter()
+    fn()
+    return repo.calls, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--watches", type=int, default=500)
+    parser.add_argument("--rtt", type=float, default=0.5, help="simulated round trip, milliseconds")
+    parser.add_argument("--mongo-url", default=None)
+    parser.add_argument("--sqlite", action="store_true", help="use the SQLite backend")
+    args = parser.parse_args()
+
+    if args.mongo_url:
+        from app.repository import Repo
+        backend = Repo(args.mongo_url, "bench_repo")
+        backend.watches_collection.delete_many({})
+        backend.prices_collection.delete_many({})
+        repo = RoundTrips(backend, 0)
+        label = "MongoDB"
+    elif args.sqlite:
+        from app.sqlite_repository import SqliteRepo
+        repo = RoundTrips(SqliteRepo(os.path.join(tempfile.mkdtemp(), "bench_repo.db")), 0)
+        label = "SQLite"
+    else:
+        repo = RoundTrips(InMemoryRepo(), args.rtt / 1000)
+        label = f"{args.rtt} ms simulated round trip"
+
+    now = datetime.now(timezone.utc)
+    prices = [PriceCache(f"T{i:04d}", 100.0 + i, now, open_price=100.0) for i in range(args.watches)]
+    for pc in prices:
+        repo.upsert_watch(Watch(pc.ticker, [100.0]))
+
+    def write_each():
+        for pc in prices:
+            repo.set_price(pc.ticker, pc.price, pc.asof, pc.currency, pc.exchange, pc.timezone, pc.market_state,
+                           pc.open_price, pc.day_high, pc.day_low)
+
+    def read_each():
+        for w in repo.list_watches():
+            repo.get_price(w.ticker)
+
+    def read_bulk(source=repo):
+        watches = source.list_watches()
+        source.get_prices([w.ticker for w in watches])
+
+    repo.set_prices(prices)
+    snapshot = RepoSnapshot(repo)
+    snapshot.load()
+
+    print(f"{args.watches} watches, {label}")
+    print(f"{'':>26} {'round trips':>12} {'ms':>9}")
+    for name, fn in (("tick writes, per ticker", write_each), ("tick writes, bulk", lambda: repo.set_prices(prices)),
+                     ("dashboard, per ticker", read_each), ("dashboard, bulk", read_bulk),
+                     ("dashboard, snapshot", lambda: read_bulk(snapshot))):
+        calls, seconds = measure(repo, fn)
+        print(f"{name:>26} {calls:>12} {seconds * 1000:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Count the upstream polls of a week of watcher ticks on a mixed US/EU watchlist.
+
+Compares the old behaviour (poll everything on every UTC weekday tick) with
+MarketSchedule, which only polls an exchange while it is in one of the
+configured sessions plus one closing snapshot.
+
+Usage (from backend/):
+    python -m benchmarks.bench_schedule [--watches 100] [--sessions regular] [--interval 5]
+"""
+import argparse
+from datetime import datetime, timedelta, timezone
+
+from app.config import settings
+from app.market_schedule import MarketSchedule
+from app.models import PriceCache, Watch
+
+EXCHANGES = [("NMS", "America/New_York"), ("MIL", "Europe/Rome")]
+
+
+def build(watches: int):
+    out, prices = [], {}
+    for i in range(watches):
+        ticker = f"T{i:04d}"
+        exchange, timezone_name = EXCHANGES[i % len(EXCHANGES)]
+        out.append(Watch(ticker=ticker, levels=[100.0]))
+        prices[ticker] = PriceCache(ticker, 100.0, datetime.now(timezone.utc), exchange=exchange, timezone=timezone_name)
+    return out, prices
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--watches", type=int, default=100)
+    parser.add_argument("--sessions", default=",".join(settings.POLL_SESSIONS), help="comma separated: pre,regular,post")
+    parser.add_argument("--interval", type=int, default=settings.CHECK_INTERVAL_MINUTES, help="tick interval, minutes")
+    args = parser.parse_args()
+
+    watches, prices = build(args.watches)
+    schedule = MarketSchedule(args.sessions.split(","))
+    # Monday 00:00 UTC through Sunday
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    ticks = 7 * 24 * 60 // args.interval
+
+    # Every ticker poll is one Yahoo request
+    old_polls = new_polls = 0
+    for i in range(ticks):
+        now = start + timedelta(minutes=i * args.interval)
+        if now.weekday() < 5:
+            old_polls += len(watches)
+        in_session, closing, _ = schedule.plan(watches, prices, now)
+        new_polls += len(in_session) + len(closing)
+
+    print(f"{ticks} ticks, {args.watches} watches on {', '.join(e for e, _ in EXCHANGES)}, sessions: {args.sessions}")
+    print(f"{'':>16} {'ticker polls':>13}")
+    print(f"{'weekday only':>16} {old_polls:>13}")
+    print(f"{'market hours':>16} {new_polls:>13}")
+    print(f"saved: {1 - new_polls / old_polls:.0%} of ticker polls and upstream requests")
+
+
+if __name__ == "__main__":
+    main()
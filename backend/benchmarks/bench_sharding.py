@@ -0,0 +1,157 @@
+"""
+Run several ShardCoordinator replicas against one lease store and check how
+the watchlist is split between them.
+
+Reports, for each phase, whether every partition is owned by exactly one
+replica and how many tickers each replica polls; then stops one replica
+without releasing its leases (a crash) and another one gracefully, and
+measures how long until every partition is owned again.
+
+Finally --contenders threads race through claim_lease for the same
+partitions at once: free ones, ones with an expired lease and ones still
+held. Each partition must end up with exactly one winner, the current
+holder for the held ones.
+
+Uses the in-memory repo by default; pass --mongo-url to use MongoDB leases
+(the upsert that fails with DuplicateKeyError) or --sqlite for the SQLite
+backend's conditional upsert.
+
+Usage (from backend/):
+    python -m benchmarks.bench_sharding [--replicas 3] [--watches 1000] [--lease 2] [--contenders 8] [--mongo-url mongodb://localhost:27017 | --sqlite]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from app.sharding import ShardCoordinator
+
+from .fake_upstream import InMemoryRepo
+
+
+def heartbeat_all(replicas):
+    for r in replicas:
+        r.heartbeat()
+
+
+def coverage(replicas, partitions: int) -> tuple[int, int]:
+    """(partitions with no owner, partitions with more than one owner)"""
+    owners = Counter(p for r in replicas for p in r.owned_partitions())
+    return partitions - len(owners), sum(1 for n in owners.values() if n > 1)
+
+
+def report(name: str, replicas, tickers, partitions: int):
+    missing, doubled = coverage(replicas, partitions)
+    split = [sum(1 for t in tickers if r.owns(t)) for r in replicas]
+    print(f"{name:<22} replicas={len(replicas)} unowned={missing} doubled={doubled} tickers per replica={split}")
+
+
+def recover(replicas, partitions: int, heartbeat: float) -> float:
+    """Heartbeat until every partition is owned again; returns the seconds it took"""
+    started = time.monotonic()
+    while True:
+        heartbeat_all(replicas)
+        missing, _ = coverage(replicas, partitions)
+        if not missing:
+            return time.monotonic() - started
+        time.sleep(heartbeat)
+
+
+def contend(repo, partitions: int, contenders: int, now: datetime) -> list[list[str]]:
+    """Every contender claims every partition at the same moment; returns the winners per partition"""
+    start = threading.Barrier(contenders)
+    winners = [[] for _ in range(partitions)]
+    lock = threading.Lock()
+
+    def claim(owner: str):
+        start.wait()
+        for p in range(partitions):
+            if repo.claim_lease(p, owner, now, now + timedelta(seconds=30)):
+                with lock:
+                    winners[p].append(owner)
+
+    threads = [threading.Thread(target=claim, args=(f"contender-{i}",)) for i in range(contenders)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return winners
+
+
+def check_contention(repo, partitions: int, contenders: int) -> bool:
+    """Race for free, expired and held leases; returns True if every partition had exactly one owner"""
+    for lease in repo.list_leases():
+        repo.release_lease(lease["_id"], lease["owner"])
+    now = datetime.now(timezone.utc)
+    ok = True
+    # Leases last 30s: at +60s the first ones have expired, at +61s the second ones are still held
+    for name, at in (("free", now), ("expired", now + timedelta(seconds=60)), ("held", now + timedelta(seconds=61))):
+        winners = contend(repo, partitions, contenders, at)
+        owners = {lease["_id"]: lease["owner"] for lease in repo.list_leases()}
+        # Held leases may only be renewed by their holder
+        good = all(len(w) == 1 and owners.get(p) == w[0] for p, w in enumerate(winners))
+        ok = ok and good
+        print(f"  {name:<8} leases: {sum(len(w) for w in winners)} claims won for {partitions} partitions, "
+              f"{'one owner each' if good else 'CONFLICT'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replicas", type=int, default=3)
+    parser.add_argument("--watches", type=int, default=1000)
+    parser.add_argument("--partitions", type=int, default=64)
+    parser.add_argument("--lease", type=float, default=2.0, help="lease seconds")
+    parser.add_argument("--heartbeat", type=float, default=0.2, help="heartbeat interval, seconds")
+    parser.add_argument("--contenders", type=int, default=8, help="threads racing for the same leases")
+    parser.add_argument("--mongo-url", default=None)
+    parser.add_argument("--sqlite", action="store_true", help="use the SQLite backend")
+    args = parser.parse_args()
+
+    if args.mongo_url:
+        from app.repository import Repo
+        repo = Repo(args.mongo_url, "bench_sharding")
+        repo.leases_collection.delete_many({})
+        repo.replicas_collection.delete_many({})
+    elif args.sqlite:
+        from app.sqlite_repository import SqliteRepo
+        repo = SqliteRepo(os.path.join(tempfile.mkdtemp(), "bench_sharding.db"))
+    else:
+        repo = InMemoryRepo()
+
+    tickers = [f"T{i:05d}" for i in range(args.watches)]
+    replicas = [ShardCoordinator(repo, f"replica-{i}", args.partitions, args.lease) for i in range(args.replicas)]
+
+    # Replicas start one after the other, like a rolling deployment
+    for i in range(len(replicas)):
+        heartbeat_all(replicas[:i + 1])
+    elapsed = recover(replicas, args.partitions, args.heartbeat)
+    heartbeat_all(replicas)
+    report("started", replicas, tickers, args.partitions)
+    print(f"  full coverage after {elapsed:.2f}s")
+
+    crashed, replicas = replicas[0], replicas[1:]
+    elapsed = recover(replicas, args.partitions, args.heartbeat)
+    report("after crash", replicas, tickers, args.partitions)
+    print(f"  {crashed.replica_id} stopped without releasing: partitions moved after {elapsed:.2f}s (lease {args.lease}s)")
+
+    if len(replicas) > 1:
+        leaving, replicas = replicas[0], replicas[1:]
+        leaving.leave()
+        elapsed = recover(replicas, args.partitions, args.heartbeat)
+        report("after graceful leave", replicas, tickers, args.partitions)
+        print(f"  {leaving.replica_id} released its leases: partitions moved after {elapsed:.2f}s")
+
+    for r in replicas:
+        r.leave()
+
+    print(f"{args.contenders} contenders claiming {args.partitions} partitions at once")
+    if not check_contention(repo, args.partitions, args.contenders):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
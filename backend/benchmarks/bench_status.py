@@ -0,0 +1,82 @@
+"""
+Time the status evaluation of a large watchlist: one Python pass per ticker
+(linear nearest-level scan, as before StockService.evaluate_statuses) versus
+the batch NumPy evaluation.
+
+Usage (from backend/):
+    python -m benchmarks.bench_status [--watches 10000] [--levels 20] [--repeat 5]
+"""
+import argparse
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.config import settings
+from app.models import PriceCache
+from app.stock_service import StockService
+
+
+def per_ticker(entries) -> list:
+    """The per-ticker evaluation the batch evaluator replaced"""
+    out = []
+    for ticker, pc, levels in entries:
+        change = (pc.price - pc.open_price) / pc.open_price * 100 if pc.open_price and pc.open_price > 0 else None
+        nearest = min(levels, key=lambda L: abs(pc.price - L)) if levels else None
+        if nearest is not None:
+            distance = abs(pc.price - nearest) / nearest
+            near = distance <= settings.NEAR_LEVEL_PCT
+        else:
+            distance, near = 0.0, False
+        out.append({
+            "ticker": ticker, "price": pc.price, "currency": pc.currency, "nearest_level": nearest,
+            "distance_pct": distance, "near": near, "open_price": pc.open_price,
+            "price_change_pct": change, "stale": pc.stale,
+        })
+    return out
+
+
+def build(watches: int, levels: int, seed: int):
+    rng = np.random.default_rng(seed)
+    now = datetime.now(timezone.utc)
+    entries = []
+    for i in range(watches):
+        price = float(rng.uniform(10, 500))
+        pc = PriceCache(f"T{i:05d}", price, now, open_price=price * float(rng.uniform(0.97, 1.03)))
+        # Some watches have no levels
+        n = 0 if i % 10 == 0 else levels
+        entries.append((pc.ticker, pc, list(price * rng.uniform(0.8, 1.2, n))))
+    return entries
+
+
+def best_of(fn, entries, repeat: int) -> tuple[float, list]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(entries)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--watches", type=int, default=10000)
+    parser.add_argument("--levels", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    entries = build(args.watches, args.levels, args.seed)
+    loop_seconds, expected = best_of(per_ticker, entries, args.repeat)
+    batch_seconds, statuses = best_of(StockService.evaluate_statuses, entries, args.repeat)
+
+    mismatches = sum(1 for a, b in zip(expected, statuses)
+                     if a["nearest_level"] != b["nearest_level"] or a["near"] != b["near"])
+    print(f"{args.watches} watches x {args.levels} levels (best of {args.repeat})")
+    print(f"  per ticker: {loop_seconds * 1000:8.1f} ms")
+    print(f"  batch:      {batch_seconds * 1000:8.1f} ms ({loop_seconds / batch_seconds:.1f}x)")
+    print(f"  mismatched statuses: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
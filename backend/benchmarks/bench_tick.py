@@ -0,0 +1,110 @@
+"""
+Benchmark Watcher.tick_async against a stubbed yfinance layer.
+
+Compares the per-ticker fetch path (one get_last per watch) with the
+batched get_last_many path used by the watcher, for growing watchlists.
+During the warm tick a heartbeat coroutine records the longest event
+loop stall, i.e. how long /ws and the REST endpoints would be blocked.
+
+Usage (from backend/):
+    python -m benchmarks.bench_tick [--sizes 10,50,100,300] [--latency 0.02] [--batch-size 100]
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+from app import data_provider, watcher as watcher_module
+from app.config import settings
+from app.data_provider import PriceProvider
+from app.models import Watch
+from app.stock_service import StockService
+from app.telegram_notifier import Telegram, TelegramSettings
+from app.watcher import Watcher
+from benchmarks.fake_upstream import FakeYFinance, InMemoryRepo
+
+
+class _Weekday(datetime):
+    """Pin the watcher clock to a weekday so the weekend guard never skips the tick"""
+
+    @classmethod
+    def now(cls, tz=None):
+        return datetime(2024, 1, 3, 15, 0, tzinfo=tz)
+
+
+def build(size: int, fake: FakeYFinance):
+    repo = InMemoryRepo()
+    for i in range(size):
+        repo.upsert_watch(Watch(ticker=f"T{i:04d}", levels=[95.0, 100.0, 105.0]))
+    provider = PriceProvider({})
+    notifier = Telegram("", "", settings_override=TelegramSettings(enabled=False))
+    return repo, provider, Watcher(repo, provider, notifier, stock_service=StockService(repo, provider))
+
+
+def run_serial(size: int, fake: FakeYFinance) -> float:
+    repo, provider, _ = build(size, fake)
+    service = StockService(repo, provider)
+    start = time.perf_counter()
+    for w in repo.list_watches():
+        service.get_price(w.ticker, force_update=True)
+    return time.perf_counter() - start
+
+
+async def timed_tick(watcher: Watcher) -> tuple[float, float]:
+    """Run one tick; returns (duration, longest event loop stall) in seconds"""
+    max_lag = 0.0
+    done = asyncio.Event()
+
+    async def heartbeat():
+        nonlocal max_lag
+        interval = 0.005
+        while not done.is_set():
+            before = time.perf_counter()
+            await asyncio.sleep(interval)
+            max_lag = max(max_lag, time.perf_counter() - before - interval)
+
+    beat = asyncio.create_task(heartbeat())
+    start = time.perf_counter()
+    await watcher.tick_async()
+    duration = time.perf_counter() - start
+    done.set()
+    await beat
+    return duration, max_lag
+
+
+def run_tick(size: int, fake: FakeYFinance) -> tuple[float, float, int, int, float]:
+    """Returns (cold tick s, warm tick s, warm tick requests, warm tick bars downloaded, warm tick max loop lag)"""
+    _, _, watcher = build(size, fake)
+    cold, _ = asyncio.run(timed_tick(watcher))
+
+    # Second tick: symbol metadata is cached and only new bars are downloaded
+    requests_before, rows_before = fake.requests, fake.rows
+    warm, lag = asyncio.run(timed_tick(watcher))
+    return cold, warm, fake.requests - requests_before, fake.rows - rows_before, lag
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,50,100,300")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per simulated HTTP request")
+    parser.add_argument("--batch-size", type=int, default=settings.PROVIDER_BATCH_SIZE)
+    args = parser.parse_args()
+    settings.PROVIDER_BATCH_SIZE = args.batch_size
+
+    watcher_module.datetime = _Weekday
+    print(f"{'watches':>8} {'serial s':>10} {'serial req':>11} {'cold tick s':>12} {'warm tick s':>12} {'warm req':>9} {'warm bars':>10} {'loop lag ms':>12}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        fake = FakeYFinance(latency=args.latency)
+        data_provider.yf = fake
+        serial = run_serial(size, fake)
+        serial_requests = fake.requests
+
+        fake = FakeYFinance(latency=args.latency)
+        data_provider.yf = fake
+        cold, warm, warm_requests, warm_rows, lag = run_tick(size, fake)
+        print(f"{size:>8} {serial:>10.3f} {serial_requests:>11} {cold:>12.3f} {warm:>12.3f} {warm_requests:>9}"
+              f" {warm_rows:>10} {lag * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark the watcher against a degraded upstream, with and without GuardedProvider.
+
+Every watch starts with a cached price. The stubbed yfinance then throttles
+(HTTP 429) a share of the requests for a number of ticks and recovers.
+Without the guard every tick keeps hammering Yahoo; with it the limiter
+backs off, the circuit opens and ticks fail fast on cached (stale) prices
+until a half-open probe succeeds.
+
+Usage (from backend/):
+    python -m benchmarks.bench_upstream [--watches 300] [--throttle-rate 0.9] [--degraded-ticks 5]
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from app import data_provider, watcher as watcher_module
+from app.config import settings
+from app.data_provider import PriceProvider
+from app.models import Watch
+from app.stock_service import StockService
+from app.telegram_notifier import Telegram, TelegramSettings
+from app.upstream_guard import GuardedProvider, TokenBucket, CircuitBreaker
+from app.watcher import Watcher
+from benchmarks.bench_tick import _Weekday
+from benchmarks.fake_upstream import FakeYFinance, InMemoryRepo
+
+
+def build(watches: int, guarded: bool, args):
+    repo = InMemoryRepo()
+    for i in range(watches):
+        ticker = f"T{i:04d}"
+        repo.upsert_watch(Watch(ticker=ticker, levels=[95.0, 100.0, 105.0]))
+        repo.set_price(ticker, 100.0, datetime.now(timezone.utc), open_price=100.0)
+    provider = PriceProvider({})
+    if guarded:
+        provider = GuardedProvider(
+            provider,
+            TokenBucket(args.rate, args.burst, backoff_seconds=args.backoff),
+            CircuitBreaker(settings.CIRCUIT_FAILURE_THRESHOLD, args.reset),
+            settings.PROVIDER_RATE_MAX_WAIT_SECONDS,
+        )
+    notifier = Telegram("", "", settings_override=TelegramSettings(enabled=False))
+    return Watcher(repo, provider, notifier, stock_service=StockService(repo, provider))
+
+
+async def run(watcher: Watcher, fake: FakeYFinance, args) -> list[tuple]:
+    """Returns per tick (phase, duration s, upstream requests, stale watches)"""
+    stale_counts = []
+
+    class CountingWS:
+        """Counts stale statuses in what the watcher broadcasts"""
+
+        async def broadcast(self, message: dict):
+            stale_counts.append(sum(1 for r in message["data"] if r["stale"]))
+
+    watcher.ws_manager = CountingWS()
+    # Healthy first tick so symbol metadata is cached, as in a running service
+    await watcher.tick_async()
+    rows = []
+    for tick in range(args.degraded_ticks + args.recovered_ticks):
+        degraded = tick < args.degraded_ticks
+        fake.throttle_rate = args.throttle_rate if degraded else 0.0
+        if tick == args.degraded_ticks:
+            # Let the breaker reach half-open before the first recovered tick
+            await asyncio.sleep(args.reset)
+        requests_before = fake.requests
+        start = time.perf_counter()
+        await watcher.tick_async()
+        duration = time.perf_counter() - start
+        stale = stale_counts[-1] if stale_counts else 0
+        rows.append(("degraded" if degraded else "recovered", duration, fake.requests - requests_before, stale))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--watches", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per simulated HTTP request")
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--throttle-rate", type=float, default=0.9, help="share of requests answered with 429")
+    parser.add_argument("--degraded-ticks", type=int, default=5)
+    parser.add_argument("--recovered-ticks", type=int, default=2)
+    parser.add_argument("--rate", type=float, default=20.0, help="limiter requests per second")
+    parser.add_argument("--burst", type=int, default=10)
+    parser.add_argument("--backoff", type=float, default=0.1, help="first limiter backoff on a 429, seconds")
+    parser.add_argument("--reset", type=float, default=1.0, help="circuit reset, seconds")
+    args = parser.parse_args()
+    settings.PROVIDER_BATCH_SIZE = args.batch_size
+    watcher_module.datetime = _Weekday
+
+    print(f"{'provider':>9} {'tick':>5} {'phase':>10} {'tick s':>8} {'requests':>9} {'stale':>6}")
+    for guarded in (False, True):
+        fake = FakeYFinance(latency=args.latency)
+        data_provider.yf = fake
+        watcher = build(args.watches, guarded, args)
+        rows = asyncio.run(run(watcher, fake, args))
+        name = "guarded" if guarded else "plain"
+        for tick, (phase, duration, requests, stale) in enumerate(rows):
+            print(f"{name:>9} {tick:>5} {phase:>10} {duration:>8.3f} {requests:>9} {stale:>6}")
+        print(f"{name:>9} total upstream requests: {fake.requests}, failed: {fake.failures}")
+
+
+if __name__ == "__main__":
+    main()
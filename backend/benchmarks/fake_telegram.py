@@ -0,0 +1,74 @@
+"""
+Local stand-in for the Telegram Bot API sendMessage endpoint.
+
+Point Telegram at it with api_url=server.url (or TELEGRAM_API_URL) to test
+notifications without a bot: it answers after a configurable latency,
+replies 429 with retry_after to a share of requests, and records the
+messages it accepted.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+
+class FakeTelegram:
+    def __init__(self, latency: float = 0.2, throttle_rate: float = 0.0, retry_after: int = 1, seed: Optional[int] = None):
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.messages: List[str] = []
+        self.requests = 0
+        self.throttled = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeTelegram":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                time.sleep(fake.latency)
+                with fake._lock:
+                    fake.requests += 1
+                    throttle = fake._random.random() < fake.throttle_rate
+                    if throttle:
+                        fake.throttled += 1
+                    else:
+                        fake.messages.append(body.get("text", ""))
+                if throttle:
+                    self._reply(429, {"ok": False, "error_code": 429, "description": "Too Many Requests",
+                                      "parameters": {"retry_after": fake.retry_after}})
+                else:
+                    self._reply(200, {"ok": True, "result": {"message_id": fake.requests}})
+
+            def _reply(self, status: int, payload: dict):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,323 @@
+"""
+Stand-ins for the external services used by the backend, for benchmarks.
+
+FakeYFinance mimics the parts of the yfinance module used by PriceProvider
+and sleeps for a configurable latency on every simulated HTTP round trip.
+InMemoryRepo mimics Repo without a MongoDB server.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.models import Watch, PriceCache, AlertState
+from app.quote_history import bucket_start
+from app.repository import new_quote_documents, quote_key
+
+_UNIT_SECONDS = {"minute": 60, "hour": 3600, "day": 86400}
+_EMPTY = object()  # injected fault: the request succeeds without any bars
+_NO_BARS = pd.DataFrame(columns=["Open", "High", "Low", "Close", "Volume"], dtype=float)
+_yf_logger = logging.getLogger("yfinance")
+
+
+class YFRateLimitError(Exception):
+    """Same name and message as yfinance's HTTP 429 error"""
+
+
+def make_bars(symbol: str, start: datetime, periods: int, freq: str = "1min") -> pd.DataFrame:
+    """Deterministic random-walk OHLCV bars for a symbol"""
+    rng = np.random.default_rng(abs(hash(symbol)) % (2 ** 32))
+    index = pd.date_range(start=start, periods=periods, freq=freq, tz="UTC")
+    close = 100 + np.cumsum(rng.normal(0, 0.1, periods))
+    return pd.DataFrame({
+        "Open": close + rng.normal(0, 0.05, periods),
+        "High": close + 0.1,
+        "Low": close - 0.1,
+        "Close": close,
+        "Volume": rng.integers(100, 10_000, periods),
+    }, index=index)
+
+
+class FakeFastInfo(dict):
+    def __init__(self, upstream: "FakeYFinance", symbol: str):
+        super().__init__(currency="USD", exchange="NMS", timezone="America/New_York",
+                         open=100.0, last_price=100.0)
+        self.upstream = upstream
+
+    def get(self, key, default=None):
+        self.upstream._round_trip()
+        return super().get(key, default)
+
+    def __getattr__(self, key):
+        self.upstream._round_trip()
+        return super().get(key)
+
+
+class FakeTicker:
+    def __init__(self, upstream: "FakeYFinance", symbol: str):
+        self.upstream = upstream
+        self.symbol = symbol
+        self.fast_info = FakeFastInfo(upstream, symbol)
+
+    @property
+    def info(self) -> dict:
+        self.upstream._round_trip(self.upstream.info_latency)
+        return {"marketState": "REGULAR", "exchange": "NMS", "longName": self.symbol}
+
+    def history(self, period: str = "1y", interval: str = "1d", start=None, end=None) -> pd.DataFrame:
+        """Daily bars over the last 30 years, sliced by period or start/end"""
+        if not self.upstream._round_trip():
+            return pd.DataFrame()
+        bars = self.upstream._daily(self.symbol)
+        end = _utc(end) if end is not None else bars.index[-1] + pd.Timedelta(days=1)
+        if start is None:
+            days = {"1mo": 31, "1y": 365, "5y": 5 * 365}.get(period)
+            start = end - pd.Timedelta(days=days) if days else bars.index[0]
+        bars = bars[(bars.index >= _utc(start)) & (bars.index < end)]
+        self.upstream.rows += len(bars)
+        return bars
+
+
+def _utc(ts) -> pd.Timestamp:
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+
+class FakeYFinance:
+    """
+    Drop-in replacement for the yfinance module.
+    Every simulated HTTP request sleeps for `latency` seconds;
+    `info` requests sleep for `info_latency` seconds. Like yfinance,
+    download() makes one request per symbol, `threads` at a time.
+    """
+
+    def __init__(self, latency: float = 0.02, info_latency: Optional[float] = None, bars_per_day: int = 390,
+                 threads: Optional[int] = None, failure_rate: float = 0.0, throttle_rate: float = 0.0,
+                 empty_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        # Fault injection, per request: connection errors, HTTP 429 and empty payloads
+        self.failure_rate = failure_rate
+        self.throttle_rate = throttle_rate
+        self.empty_rate = empty_rate
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.info_latency = latency * 5 if info_latency is None else info_latency
+        # yfinance's default pool for download(threads=True)
+        self.threads = threads or (os.cpu_count() or 1) * 2
+        self.bars_per_day = bars_per_day
+        self.requests = 0
+        self.rows = 0  # bars returned by download(), i.e. the transferred payload
+        self._sessions: Dict[str, pd.DataFrame] = {}
+
+    def _round_trip(self, latency: Optional[float] = None) -> bool:
+        """Simulate one HTTP request; raises injected errors, returns False for an empty payload"""
+        time.sleep(self.latency if latency is None else latency)
+        fault = self._fault()
+        if fault is _EMPTY:
+            return False
+        if fault is not None:
+            raise fault
+        return True
+
+    def _fault(self) -> Optional[Exception]:
+        """Count one request and roll its injected fault: None, an exception or _EMPTY"""
+        with self._lock:
+            self.requests += 1
+            roll = self._rng.random()
+            if roll < self.throttle_rate + self.failure_rate + self.empty_rate:
+                self.failures += 1
+        if roll < self.throttle_rate:
+            return YFRateLimitError("Too Many Requests. Rate limited. Try after a while.")
+        if roll < self.throttle_rate + self.failure_rate:
+            return ConnectionError("Connection reset by peer")
+        if roll < self.throttle_rate + self.failure_rate + self.empty_rate:
+            return _EMPTY
+        return None
+
+    def _daily(self, symbol: str) -> pd.DataFrame:
+        """30 years of daily bars for a symbol, generated once"""
+        key = f"{symbol}:1d"
+        if key not in self._sessions:
+            today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+            self._sessions[key] = make_bars(symbol, today - timedelta(days=30 * 365), 30 * 365 + 1, freq="1D")
+        return self._sessions[key]
+
+    def _session(self, symbol: str) -> pd.DataFrame:
+        """Today's 1m bars for a symbol, generated once"""
+        if symbol not in self._sessions:
+            session_start = datetime.now(timezone.utc).replace(hour=13, minute=30, second=0, microsecond=0)
+            self._sessions[symbol] = make_bars(symbol, session_start, self.bars_per_day)
+        return self._sessions[symbol]
+
+    def Ticker(self, symbol: str) -> FakeTicker:
+        return FakeTicker(self, symbol)
+
+    def download(self, tickers, period: str = "1d", interval: str = "1m", group_by: str = "column",
+                 start=None, **kwargs) -> pd.DataFrame:
+        """
+        Like yf.download: failed symbols don't raise, they get all-NaN columns
+        and one "['SYM', ...]: <error>" line per error on the yfinance logger.
+        """
+        symbols: List[str] = [tickers] if isinstance(tickers, str) else list(tickers)
+        # One chart request per symbol, in rounds of `threads` concurrent requests
+        time.sleep(self.latency * math.ceil(len(symbols) / self.threads))
+        failed: Dict[str, List[str]] = {}
+        frames = {}
+        for s in symbols:
+            fault = self._fault()
+            if fault is None:
+                frames[s] = self._session(s)
+                if start is not None:
+                    frames[s] = frames[s][frames[s].index >= pd.Timestamp(start)]
+                self.rows += len(frames[s])
+            else:
+                message = "possibly delisted; no price data found" if fault is _EMPTY else repr(fault)
+                failed.setdefault(message, []).append(s)
+                frames[s] = _NO_BARS
+        for message, syms in failed.items():
+            _yf_logger.error(f"{syms}: {message}")
+        data = pd.concat(frames, axis=1) if frames else pd.DataFrame()
+        if group_by == "ticker" or data.empty:
+            return data
+        # Default yfinance layout: (Price, Ticker) columns
+        return data.swaplevel(0, 1, axis=1)
+
+
+class InMemoryRepo:
+    """Dict-backed replacement for Repo with the same method surface"""
+
+    def __init__(self):
+        self.watches: Dict[str, Watch] = {}
+        self.prices: Dict[str, PriceCache] = {}
+        self.metadata: Dict[str, dict] = {}
+        self.replicas: Dict[str, datetime] = {}
+        self.leases: Dict[int, dict] = {}
+        self._lease_lock = threading.Lock()
+        self.history: Dict[tuple, Dict[datetime, dict]] = {}
+        self.coverage: Dict[tuple, dict] = {}
+        self.quotes: Dict[tuple, dict] = {}
+        self.quote_bars: Dict[tuple, dict] = {}
+
+    def upsert_watch(self, watch: Watch) -> Watch:
+        self.watches[watch.ticker] = watch
+        return watch
+
+    def get_watch(self, ticker: str) -> Optional[Watch]:
+        return self.watches.get(ticker)
+
+    def list_watches(self) -> List[Watch]:
+        return list(self.watches.values())
+
+    def delete_watch(self, ticker: str) -> bool:
+        return self.watches.pop(ticker, None) is not None
+
+    def save_alert_states(self, states: Dict[str, Optional[AlertState]]):
+        for ticker, state in states.items():
+            if ticker in self.watches:
+                self.watches[ticker].last_alert = state
+
+    def set_price(self, ticker: str, price: float, asof: datetime, currency: str = 'USD', exchange: str = 'Unknown',
+                  timezone: str = 'America/New_York', market_state: str | None = None, open_price: float | None = None,
+                  day_high: float | None = None, day_low: float | None = None):
+        self.prices[ticker] = PriceCache(ticker, price, asof, currency, exchange, timezone, market_state, open_price,
+                                         day_high, day_low)
+
+    def set_prices(self, prices: List[PriceCache]):
+        for pc in prices:
+            self.set_price(pc.ticker, pc.price, pc.asof, pc.currency, pc.exchange, pc.timezone, pc.market_state,
+                           pc.open_price, pc.day_high, pc.day_low)
+
+    def get_price(self, ticker: str) -> Optional[PriceCache]:
+        return self.prices.get(ticker)
+
+    def list_prices(self) -> List[PriceCache]:
+        return list(self.prices.values())
+
+    def get_prices(self, tickers: List[str]) -> Dict[str, PriceCache]:
+        return {t: self.prices[t] for t in tickers if t in self.prices}
+
+    def set_metadata(self, ticker: str, meta: dict):
+        self.metadata[ticker] = {**meta, "metadata_updated_at": datetime.now(timezone.utc)}
+
+    def get_metadata(self, ticker: str) -> Optional[dict]:
+        return self.metadata.get(ticker)
+
+    def upsert_history(self, ticker: str, interval: str, records: List[dict]):
+        series = self.history.setdefault((ticker, interval), {})
+        for r in records:
+            series[_utc(r["date"]).tz_localize(None).to_pydatetime()] = r
+
+    def get_history(self, ticker: str, interval: str, start: Optional[datetime] = None) -> List[dict]:
+        series = self.history.get((ticker, interval), {})
+        return [{**series[d], "date": d} for d in sorted(series) if start is None or d >= start]
+
+    def get_history_last_date(self, ticker: str, interval: str) -> Optional[datetime]:
+        series = self.history.get((ticker, interval))
+        return max(series) if series else None
+
+    def get_history_coverage(self, ticker: str, interval: str) -> Optional[dict]:
+        return self.coverage.get((ticker, interval))
+
+    def set_history_coverage(self, ticker: str, interval: str, start: datetime, head_complete: bool, refreshed_at: datetime):
+        self.coverage[(ticker, interval)] = {"start": start, "head_complete": head_complete, "refreshed_at": refreshed_at}
+
+    def append_quotes(self, prices: List[PriceCache]):
+        for doc in new_quote_documents(prices, self.quotes.values()):
+            self.quotes[quote_key(doc["ticker"], doc["ts"])] = doc
+
+    def get_quotes(self, ticker: str, start: datetime, end: datetime) -> List[dict]:
+        return sorted(({"ts": t["ts"], "price": t["price"]} for t in self.quotes.values()
+                       if t["ticker"] == ticker and start <= t["ts"] < end), key=lambda t: t["ts"])
+
+    def rollup_quotes(self, interval: str, unit: str, bin_size: int, since: datetime, source: Optional[str] = None,
+                     retention_seconds: Optional[int] = None):
+        if source is None:
+            rows = [(t["ticker"], t["ts"], t["price"], t["price"], t["price"], t["price"], 1) for t in self.quotes.values() if t["ts"] >= since]
+        else:
+            rows = [(b["ticker"], b["start"], b["open"], b["high"], b["low"], b["close"], b["count"])
+                    for (_, i, _), b in self.quote_bars.items() if i == source and b["start"] >= since]
+        bars: Dict[tuple, dict] = {}
+        for ticker, ts, o, h, l, c, n in sorted(rows, key=lambda r: (r[0], r[1])):
+            key = (ticker, interval, bucket_start(ts, _UNIT_SECONDS[unit] * bin_size))
+            bar = bars.get(key)
+            if bar is None:
+                bars[key] = {"ticker": ticker, "start": key[2], "open": o, "high": h, "low": l, "close": c, "count": n}
+            else:
+                bar.update(high=max(bar["high"], h), low=min(bar["low"], l), close=c, count=bar["count"] + n)
+        self.quote_bars.update(bars)
+
+    def get_quote_bars(self, ticker: str, interval: str, start: datetime, end: datetime) -> List[dict]:
+        return sorted(({k: v for k, v in b.items() if k != "ticker"} for (t, i, s), b in self.quote_bars.items()
+                       if t == ticker and i == interval and start <= s < end), key=lambda b: b["start"])
+
+    def heartbeat_replica(self, replica_id: str, now: datetime):
+        self.replicas[replica_id] = now
+
+    def list_live_replicas(self, since: datetime) -> List[str]:
+        return [r for r, at in self.replicas.items() if at >= since]
+
+    def remove_replica(self, replica_id: str):
+        self.replicas.pop(replica_id, None)
+
+    def claim_lease(self, partition: int, owner: str, now: datetime, expires_at: datetime) -> bool:
+        with self._lease_lock:
+            lease = self.leases.get(partition)
+            if lease and lease["owner"] != owner and lease["expires_at"] >= now:
+                return False
+            self.leases[partition] = {"_id": partition, "owner": owner, "expires_at": expires_at}
+            return True
+
+    def release_lease(self, partition: int, owner: str):
+        with self._lease_lock:
+            if self.leases.get(partition, {}).get("owner") == owner:
+                del self.leases[partition]
+
+    def list_leases(self) -> List[dict]:
+        return [self.leases[p] for p in sorted(self.leases)]
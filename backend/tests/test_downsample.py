@@ -0,0 +1,70 @@
+"""LTTB and OHLC reduction of history series"""
+import math
+
+import numpy as np
+import pytest
+
+from app.downsample import downsample, lttb_indices
+
+
+def series(n: int) -> dict:
+    close = [100 + 10 * math.sin(i / 7) + (i % 5) for i in range(n)]
+    return {
+        "date": list(range(n)),
+        "open": [c - 0.5 for c in close],
+        "high": [c + 1 for c in close],
+        "low": [c - 1 for c in close],
+        "close": close,
+        "volume": [1000 + i for i in range(n)],
+    }
+
+
+@pytest.mark.parametrize("n, n_out", [(1000, 100), (101, 3), (10, 9)])
+def test_lttb_keeps_the_endpoints_and_the_requested_length(n, n_out):
+    y = np.array(series(n)["close"])
+    keep = lttb_indices(y, n_out)
+    assert len(keep) == n_out
+    assert keep[0] == 0 and keep[-1] == n - 1
+    assert (np.diff(keep) > 0).all()
+
+
+def test_lttb_keeps_a_spike():
+    y = np.zeros(500)
+    y[250] = 100.0
+    assert 250 in lttb_indices(y, 20)
+
+
+@pytest.mark.parametrize("reducer", ["lttb", "ohlc"])
+@pytest.mark.parametrize("max_points", [50, 51, 0])
+def test_short_series_are_returned_as_is(reducer, max_points):
+    columns = series(50)
+    assert downsample(columns, max_points, reducer) is columns
+
+
+def test_lttb_rows_are_kept_as_they_are():
+    columns = series(300)
+    reduced = downsample(columns, 30, "lttb")
+    assert len(reduced["date"]) == 30
+    for i, date in enumerate(reduced["date"]):
+        assert all(reduced[col][i] == columns[col][date] for col in columns)
+
+
+def test_ohlc_merges_each_bucket_into_one_bar():
+    columns = series(10)
+    columns["high"][1] = 500.0
+    columns["low"][2] = 1.0
+    columns["high"][4] = float("nan")
+    reduced = downsample(columns, 5, "ohlc")
+    assert reduced["date"] == [0, 2, 4, 6, 8]
+    assert reduced["open"] == [columns["open"][i] for i in (0, 2, 4, 6, 8)]
+    assert reduced["close"] == [columns["close"][i] for i in (1, 3, 5, 7, 9)]
+    assert reduced["high"][0] == 500.0
+    assert reduced["low"][1] == 1.0
+    # NaN highs are ignored, not propagated
+    assert reduced["high"][2] == columns["high"][5]
+    assert reduced["volume"] == [columns["volume"][i] + columns["volume"][i + 1] for i in (0, 2, 4, 6, 8)]
+
+
+def test_unknown_reducer():
+    with pytest.raises(ValueError):
+        downsample(series(10), 5, "median")
@@ -0,0 +1,80 @@
+"""
+Partition lease contract shared by the storage backends, as used by
+ShardCoordinator. SQLite runs on a temporary file; the MongoDB case runs
+against a real server and is skipped unless MONGODB_TEST_URL is set.
+"""
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from benchmarks.fake_upstream import InMemoryRepo
+
+LEASE = timedelta(seconds=30)
+
+
+@pytest.fixture(params=["memory", "sqlite", "mongo"])
+def repo(request, tmp_path):
+    if request.param == "memory":
+        yield InMemoryRepo()
+        return
+    if request.param == "sqlite":
+        from app.sqlite_repository import SqliteRepo
+        yield SqliteRepo(str(tmp_path / "leases.db"))
+        return
+    url = os.environ.get("MONGODB_TEST_URL")
+    if not url:
+        pytest.skip("MONGODB_TEST_URL not set")
+    from app.repository import Repo
+    repo = Repo(url, "test_leases")
+    repo.leases_collection.delete_many({})
+    yield repo
+    repo.leases_collection.delete_many({})
+    repo.mongo_client.close()
+
+
+def test_claim_renew_and_release(repo):
+    now = datetime.now(timezone.utc)
+    assert repo.claim_lease(0, "a", now, now + LEASE)
+    assert repo.claim_lease(0, "a", now, now + LEASE)
+    assert not repo.claim_lease(0, "b", now, now + LEASE)
+    repo.release_lease(0, "b")
+    assert [lease["owner"] for lease in repo.list_leases()] == ["a"]
+    repo.release_lease(0, "a")
+    assert repo.claim_lease(0, "b", now, now + LEASE)
+
+
+def test_expired_lease_moves_to_another_owner(repo):
+    now = datetime.now(timezone.utc)
+    assert repo.claim_lease(0, "a", now, now + LEASE)
+    assert not repo.claim_lease(0, "b", now + LEASE - timedelta(seconds=1), now + 2 * LEASE)
+    later = now + LEASE + timedelta(seconds=1)
+    assert repo.claim_lease(0, "b", later, later + LEASE)
+    assert not repo.claim_lease(0, "a", later, later + LEASE)
+
+
+@pytest.mark.parametrize("expired", [False, True])
+def test_concurrent_claims_have_one_winner(repo, expired):
+    now = datetime.now(timezone.utc)
+    if expired:
+        for p in range(16):
+            repo.claim_lease(p, "old", now - 2 * LEASE, now - LEASE)
+    start = threading.Barrier(8)
+    winners = {p: [] for p in range(16)}
+    lock = threading.Lock()
+
+    def claim(owner):
+        start.wait()
+        for p in winners:
+            if repo.claim_lease(p, owner, now, now + LEASE):
+                with lock:
+                    winners[p].append(owner)
+
+    threads = [threading.Thread(target=claim, args=(f"r{i}",)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    owners = {lease["_id"]: lease["owner"] for lease in repo.list_leases()}
+    assert all(len(w) == 1 and owners[p] == w[0] for p, w in winners.items())
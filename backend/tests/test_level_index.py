@@ -0,0 +1,43 @@
+"""LevelIndex lookups and the traded range used for level crossings"""
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+from app.level_index import LevelIndex, traded_range
+from app.models import PriceCache
+
+NEW_YORK = ZoneInfo("America/New_York")
+
+
+def quote(price: float, asof: datetime, day_high: float, day_low: float) -> PriceCache:
+    return PriceCache("AAPL", price, asof, timezone="America/New_York", day_high=day_high, day_low=day_low)
+
+
+def test_nearest_and_between():
+    index = LevelIndex([110.0, 90.0, 100.0, 100.0])
+    assert index.levels == [90.0, 100.0, 110.0]
+    assert index.nearest(95.0) == 90.0  # ties go to the lower level
+    assert index.nearest(96.0) == 100.0
+    assert index.nearest(200.0) == 110.0
+    assert index.between(90.0, 100.0) == [90.0, 100.0]
+    assert LevelIndex([]).nearest(1.0) is None
+
+
+def test_crossed_includes_a_new_session_high():
+    previous = quote(100.0, datetime(2024, 1, 3, 15, 0, tzinfo=timezone.utc), 101.0, 99.0)
+    current = quote(100.5, datetime(2024, 1, 3, 15, 5, tzinfo=timezone.utc), 106.0, 99.0)
+    assert LevelIndex([95.0, 100.0, 105.0]).crossed(previous, current) == [105.0]
+
+
+def test_same_session_across_utc_midnight_with_naive_previous():
+    # 19:30 New York on Jan 3 is 00:30 UTC on Jan 4: MongoDB gives back naive UTC
+    previous = quote(100.0, datetime(2024, 1, 4, 0, 30), 101.0, 99.0)
+    current = quote(100.2, datetime(2024, 1, 3, 19, 45, tzinfo=NEW_YORK), 101.0, 95.0)
+    # Same session and the day high didn't move: the earlier high doesn't count again
+    assert traded_range(previous, current) == (95.0, 100.2)
+
+
+def test_new_session_counts_the_whole_range_with_naive_previous():
+    # 03:00 UTC on Jan 4 is still Jan 3 in New York: the next morning is a new session
+    previous = quote(100.0, datetime(2024, 1, 4, 3, 0), 101.0, 99.0)
+    current = quote(100.2, datetime(2024, 1, 4, 10, 0, tzinfo=NEW_YORK), 100.5, 98.0)
+    assert traded_range(previous, current) == (98.0, 100.5)
@@ -0,0 +1,39 @@
+"""MarketSchedule session grouping and the weekday fallback for unknown calendars"""
+from datetime import datetime, timezone
+
+from app.market_schedule import MarketSchedule
+from app.models import PriceCache, Watch
+
+# Wednesday 2024-01-03 and the following Saturday, UTC
+WEDNESDAY_OPEN = datetime(2024, 1, 3, 15, 0, tzinfo=timezone.utc)
+WEDNESDAY_NIGHT = datetime(2024, 1, 3, 23, 0, tzinfo=timezone.utc)
+SATURDAY = datetime(2024, 1, 6, 15, 0, tzinfo=timezone.utc)
+WATCHES = [Watch("AAPL", [150.0]), Watch("ODD", [1.0]), Watch("NEW", [10.0])]
+PRICES = {
+    "AAPL": PriceCache("AAPL", 150.0, WEDNESDAY_OPEN, exchange="NMS", timezone="America/New_York"),
+    "ODD": PriceCache("ODD", 1.0, WEDNESDAY_OPEN, exchange="XYZ", timezone="Pacific/Fiji"),
+}
+
+
+def tickers(watches):
+    return [w.ticker for w in watches]
+
+
+def test_known_exchange_polls_in_session_then_one_closing_snapshot():
+    schedule = MarketSchedule(["regular"])
+    in_session, closing, skipped = schedule.plan(WATCHES[:1], PRICES, WEDNESDAY_OPEN)
+    assert (tickers(in_session), closing, skipped) == (["AAPL"], [], [])
+    in_session, closing, skipped = schedule.plan(WATCHES[:1], PRICES, WEDNESDAY_NIGHT)
+    assert (in_session, tickers(closing), skipped) == ([], ["AAPL"], [])
+    in_session, closing, skipped = schedule.plan(WATCHES[:1], PRICES, SATURDAY)
+    assert (in_session, closing, tickers(skipped)) == ([], [], ["AAPL"])
+
+
+def test_unknown_calendars_are_polled_on_weekdays_only():
+    schedule = MarketSchedule(["regular"])
+    in_session, closing, skipped = schedule.plan(WATCHES[1:], PRICES, WEDNESDAY_NIGHT)
+    assert (tickers(in_session), closing, skipped) == (["ODD", "NEW"], [], [])
+    in_session, closing, skipped = schedule.plan(WATCHES[1:], PRICES, SATURDAY)
+    assert (in_session, tickers(closing), skipped) == ([], ["ODD", "NEW"], [])
+    in_session, closing, skipped = schedule.plan(WATCHES[1:], PRICES, SATURDAY)
+    assert (in_session, closing, tickers(skipped)) == ([], [], ["ODD", "NEW"])
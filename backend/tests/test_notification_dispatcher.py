@@ -0,0 +1,71 @@
+"""NotificationDispatcher against the local Telegram stand-in"""
+import asyncio
+
+import pytest
+
+from app.notification_dispatcher import NotificationDispatcher
+from app.telegram_notifier import Telegram, TelegramSettings
+
+from benchmarks.fake_telegram import FakeTelegram
+
+
+@pytest.fixture
+def telegram():
+    servers = []
+
+    def start(**options) -> FakeTelegram:
+        server = FakeTelegram(latency=0, **options).start()
+        servers.append(server)
+        return server
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def dispatch(server: FakeTelegram, batches, **options) -> NotificationDispatcher:
+    """Submit each batch of alerts as one tick and wait for the queue to drain"""
+    notifier = Telegram("token", "chat", TelegramSettings(enabled=True), api_url=server.url, timeout=5)
+    dispatcher = NotificationDispatcher(notifier, messages_per_minute=6000, backoff_seconds=0.01, **options)
+
+    async def run():
+        dispatcher.start()
+        for texts in batches:
+            dispatcher.submit(texts)
+        await dispatcher.stop(timeout=10)
+    asyncio.run(run())
+    return dispatcher
+
+
+def test_alerts_of_a_tick_are_sent_as_one_digest(telegram):
+    server = telegram()
+    dispatcher = dispatch(server, [["AAPL crossed 150", "MSFT crossed 300", "NVDA crossed 900"], ["TSLA crossed 200"]])
+
+    assert server.messages == ["AAPL crossed 150\n\nMSFT crossed 300\n\nNVDA crossed 900", "TSLA crossed 200"]
+    assert dispatcher.stats() == {"sent": 2, "retried": 0, "failed": 0, "dropped": 0, "pending": 0}
+
+
+def test_long_ticks_are_split_into_several_messages(telegram):
+    server = telegram()
+    texts = [f"T{i:03d} " + "x" * 1000 for i in range(10)]
+    dispatch(server, [texts])
+
+    assert len(server.messages) > 1
+    assert "\n\n".join(server.messages) == "\n\n".join(texts)
+
+
+def test_throttled_send_is_retried(telegram):
+    # With this seed the first request is answered 429 and the second accepted
+    server = telegram(throttle_rate=0.5, retry_after=1, seed=1)
+    dispatcher = dispatch(server, [["AAPL crossed 150"]])
+
+    assert server.requests == 2 and server.throttled == 1
+    assert server.messages == ["AAPL crossed 150"]
+    assert (dispatcher.sent, dispatcher.retried, dispatcher.failed) == (1, 1, 0)
+
+
+def test_gives_up_after_max_retries(telegram):
+    server = telegram(throttle_rate=1.0, retry_after=0)
+    dispatcher = dispatch(server, [["AAPL crossed 150"]], max_retries=2)
+
+    assert server.requests == 3 and server.messages == []
+    assert (dispatcher.sent, dispatcher.retried, dispatcher.failed) == (0, 2, 1)
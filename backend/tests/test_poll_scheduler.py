@@ -0,0 +1,52 @@
+"""PollScheduler scheduling, budget and failure backoff"""
+from datetime import datetime, timedelta, timezone
+
+from app.poll_scheduler import PollScheduler
+
+NOW = datetime(2024, 1, 3, 15, 0, tzinfo=timezone.utc)
+
+
+def at(seconds: float) -> datetime:
+    return NOW + timedelta(seconds=seconds)
+
+
+def test_next_poll_follows_the_interval():
+    poller = PollScheduler(min_seconds=10, max_seconds=1800)
+    assert poller.select(["AAPL", "MSFT"], NOW) == ["AAPL", "MSFT"]
+    poller.update("AAPL", 0.001, 0.001, NOW)
+    poller.update("MSFT", None, None, NOW)
+    assert poller.select(["AAPL", "MSFT"], at(5)) == []
+    assert poller.select(["AAPL", "MSFT"], at(10)) == ["AAPL"]
+    assert poller.select(["AAPL", "MSFT"], at(1800)) == ["AAPL", "MSFT"]
+
+
+def test_budget_defers_the_least_urgent():
+    poller = PollScheduler(min_seconds=10, max_seconds=1800, requests_per_minute=2)
+    for ticker, distance in (("FAR", None), ("NEAR", 0.001), ("MID", 0.01)):
+        poller.update(ticker, distance, 0.001, NOW)
+    assert poller.select(["FAR", "NEAR", "MID"], at(3600)) == ["NEAR", "MID"]
+    assert poller.deferred == 1
+    assert poller.select(["FAR"], at(3601)) == []
+    assert poller.select(["FAR"], at(3660)) == ["FAR"]
+
+
+def test_failed_tickers_back_off_until_a_fresh_quote():
+    poller = PollScheduler(min_seconds=10, max_seconds=60)
+    poller.update("AAPL", 0.001, 0.001, NOW)
+    poller.update("BAD", 0.001, 0.001, NOW)
+    assert poller.select(["AAPL", "BAD"], at(10)) == ["AAPL", "BAD"]
+    poller.update("AAPL", 0.001, 0.001, at(10))
+    poller.failed(["BAD"], at(10))
+
+    # 10s, 20s, 40s then capped at max_seconds
+    t = 10
+    for backoff in (10, 20, 40, 60, 60):
+        assert poller.select(["BAD"], at(t + backoff - 1)) == []
+        assert poller.select(["BAD"], at(t + backoff)) == ["BAD"]
+        t += backoff
+        poller.failed(["BAD"], at(t))
+
+    # A fresh quote resets the backoff
+    poller.update("BAD", 0.001, 0.001, at(t))
+    poller.failed(["BAD"], at(t + 10))
+    assert poller.select(["BAD"], at(t + 20)) == ["BAD"]
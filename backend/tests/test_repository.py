@@ -0,0 +1,91 @@
+"""
+Helpers shared by the MongoDB repositories, and Repo itself against a real
+server; the Repo tests are skipped unless MONGODB_TEST_URL is set.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models import PriceCache
+from app.repository import latest_quotes, new_quote_documents
+
+from benchmarks.fake_upstream import InMemoryRepo
+
+
+@pytest.fixture
+def mongo_repo():
+    url = os.environ.get("MONGODB_TEST_URL")
+    if not url:
+        pytest.skip("MONGODB_TEST_URL not set")
+    from pymongo import MongoClient
+    from app.repository import Repo
+    with MongoClient(url) as client:
+        client.drop_database("test_repository")
+    repo = Repo(url, "test_repository")
+    yield repo
+    repo.mongo_client.drop_database("test_repository")
+    repo.mongo_client.close()
+
+
+def test_new_quote_documents_skips_unchanged_and_repeated_quotes():
+    asof = datetime(2024, 1, 3, 15, 0, 0, 123456, tzinfo=timezone.utc)
+    later = datetime(2024, 1, 3, 15, 1, tzinfo=timezone.utc)
+    # MongoDB returns naive UTC datetimes truncated to milliseconds
+    recorded = [{"ticker": "AAPL", "ts": datetime(2024, 1, 3, 15, 0, 0, 123000), "price": 100.0}]
+    prices = [PriceCache("AAPL", 100.0, asof), PriceCache("MSFT", 300.0, asof),
+              PriceCache("MSFT", 300.0, asof), PriceCache("AAPL", 101.0, later)]
+    docs = new_quote_documents(prices, recorded)
+    assert [(d["ticker"], d["ts"]) for d in docs] == [("MSFT", asof), ("AAPL", later)]
+
+
+def test_new_quote_documents_appends_a_changed_price_of_the_same_bar():
+    bar = datetime(2024, 1, 3, 15, 0)
+    recorded = [{"ticker": "AAPL", "ts": bar, "price": 100.0}, {"ticker": "AAPL", "ts": bar, "price": 100.5}]
+    polled_at = datetime(2024, 1, 3, 15, 0, 40, tzinfo=timezone.utc)
+    # Only the last price of the batch counts, compared with the last poll recorded
+    docs = new_quote_documents([PriceCache("AAPL", 100.0, bar), PriceCache("AAPL", 101.0, bar)], recorded, polled_at)
+    assert docs == [{"ts": bar, "ticker": "AAPL", "price": 101.0, "polled_at": polled_at}]
+    assert new_quote_documents([PriceCache("AAPL", 100.5, bar)], recorded) == []
+
+
+def test_latest_quotes_keeps_the_last_poll_of_each_bar():
+    bar = datetime(2024, 1, 3, 15, 0)
+    docs = [{"ts": bar, "price": 100.0}, {"ts": bar, "price": 101.0}, {"ts": bar + timedelta(minutes=1), "price": 102.0}]
+    assert latest_quotes(docs) == [{"ts": bar, "price": 101.0}, {"ts": bar + timedelta(minutes=1), "price": 102.0}]
+
+
+def test_in_memory_repo_updates_the_close_of_a_polled_bar():
+    repo = InMemoryRepo()
+    bar = datetime(2024, 1, 3, 15, 0, tzinfo=timezone.utc)
+    for price in (100.0, 102.0, 101.0):
+        repo.append_quotes([PriceCache("AAPL", price, bar)])
+    assert repo.get_quotes("AAPL", bar, bar + timedelta(hours=1)) == [{"ts": bar, "price": 101.0}]
+
+    repo.rollup_quotes("5m", "minute", 5, bar)
+    [rolled] = repo.get_quote_bars("AAPL", "5m", bar, bar + timedelta(hours=1))
+    assert (rolled["close"], rolled["count"]) == (101.0, 1)
+
+
+def test_mongo_repo_keeps_the_last_poll_of_a_bar(mongo_repo):
+    bar = datetime(2024, 1, 3, 15, 0, tzinfo=timezone.utc)
+    for price in (100.0, 102.0, 101.0):
+        mongo_repo.append_quotes([PriceCache("AAPL", price, bar)])
+    assert [q["price"] for q in mongo_repo.get_quotes("AAPL", bar, bar + timedelta(hours=1))] == [101.0]
+
+    mongo_repo.rollup_quotes("5m", "minute", 5, bar)
+    [rolled] = mongo_repo.get_quote_bars("AAPL", "5m", bar, bar + timedelta(hours=1))
+    assert (rolled["close"], rolled["count"]) == (101.0, 1)
+
+
+def test_mongo_repo_skips_metadata_only_documents(mongo_repo):
+    asof = datetime(2024, 1, 3, 15, 0, tzinfo=timezone.utc)
+    mongo_repo.set_metadata("AAPL", {"currency": "USD", "exchange": "NMS", "timezone": "America/New_York"})
+    mongo_repo.set_prices([PriceCache("MSFT", 300.0, asof)])
+    assert mongo_repo.get_metadata("AAPL")["exchange"] == "NMS"
+    assert mongo_repo.get_price("AAPL") is None
+    assert list(mongo_repo.get_prices(["AAPL", "MSFT"])) == ["MSFT"]
+    assert [pc.ticker for pc in mongo_repo.list_prices()] == ["MSFT"]
+
+    mongo_repo.set_price("AAPL", 150.0, asof)
+    assert mongo_repo.get_price("AAPL").price == 150.0
@@ -0,0 +1,97 @@
+"""SingleFlight coalescing of concurrent identical provider calls"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.single_flight import SingleFlight, SingleFlightProvider
+
+
+class BlockingProvider:
+    """Provider whose calls block until released; records the tickers of every upstream call"""
+
+    def __init__(self, error: str | None = None):
+        self.error = error
+        self.calls = []
+        self.gate = threading.Event()
+
+    def _fetch(self, tickers):
+        self.calls.append(list(tickers))
+        self.gate.wait(5)
+        if self.error:
+            raise RuntimeError(self.error)
+
+    def get_stock_details(self, ticker):
+        self._fetch([ticker])
+        return {"ticker": ticker}
+
+    def get_last_many(self, tickers):
+        self._fetch(tickers)
+        return {t: (100.0, None) for t in tickers if t != "BAD"}, {"BAD": "No data for BAD"} if "BAD" in tickers else {}
+
+
+def wait_for(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    provider = BlockingProvider()
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(flight.do, ("details", "AAPL"), provider.get_stock_details, "AAPL") for _ in range(4)]
+        wait_for(lambda: flight.coalesced["details"] == 3)
+        provider.gate.set()
+        assert [f.result() for f in futures] == [{"ticker": "AAPL"}] * 4
+    assert provider.calls == [["AAPL"]]
+    assert flight.stats() == {"details": {"calls": 4, "coalesced": 3}}
+
+    # Once the call is done the key is free again
+    flight.do(("details", "AAPL"), provider.get_stock_details, "AAPL")
+    assert len(provider.calls) == 2
+
+
+def test_error_reaches_every_waiter():
+    flight = SingleFlight()
+    provider = BlockingProvider(error="upstream down")
+    with ThreadPoolExecutor(3) as pool:
+        futures = [pool.submit(flight.do, ("details", "AAPL"), provider.get_stock_details, "AAPL") for _ in range(3)]
+        wait_for(lambda: flight.coalesced["details"] == 2)
+        provider.gate.set()
+        for f in futures:
+            with pytest.raises(RuntimeError, match="upstream down"):
+                f.result()
+    assert len(provider.calls) == 1
+
+
+def test_batches_coalesce_per_ticker():
+    provider = BlockingProvider()
+    single = SingleFlightProvider(provider)
+    with ThreadPoolExecutor(2) as pool:
+        first = pool.submit(single.get_last_many, ["AAPL", "MSFT"])
+        wait_for(lambda: len(provider.calls) == 1)
+        second = pool.submit(single.get_last_many, ["MSFT", "NVDA", "BAD"])
+        wait_for(lambda: len(provider.calls) == 2)
+        provider.gate.set()
+        assert set(first.result()[0]) == {"AAPL", "MSFT"}
+        results, errors = second.result()
+    # MSFT was awaited from the first batch, only the others were requested again
+    assert provider.calls == [["AAPL", "MSFT"], ["NVDA", "BAD"]]
+    assert set(results) == {"MSFT", "NVDA"} and errors == {"BAD": "No data for BAD"}
+
+
+def test_batch_failure_reaches_the_waiting_batches():
+    provider = BlockingProvider(error="upstream down")
+    single = SingleFlightProvider(provider)
+    with ThreadPoolExecutor(2) as pool:
+        first = pool.submit(single.get_last_many, ["AAPL"])
+        wait_for(lambda: len(provider.calls) == 1)
+        second = pool.submit(single.get_last_many, ["AAPL"])
+        wait_for(lambda: single.flight.coalesced["get_last"] == 1)
+        provider.gate.set()
+        assert first.result() == ({}, {"AAPL": "upstream down"})
+        assert second.result() == ({}, {"AAPL": "upstream down"})
+    assert len(provider.calls) == 1
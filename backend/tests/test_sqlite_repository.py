@@ -0,0 +1,83 @@
+"""SqliteRepo on a temporary database file"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models import AlertState, PriceCache, Watch
+from app.sqlite_repository import SqliteRepo
+
+
+@pytest.fixture
+def repo(tmp_path):
+    return SqliteRepo(str(tmp_path / "test.db"))
+
+
+def test_watch_crud(repo):
+    repo.upsert_watch(Watch("AAPL", [150.0, 200.0]))
+    repo.upsert_watch(Watch("MSFT", [300.0], enabled=False))
+    assert repo.get_watch("AAPL").levels == [150.0, 200.0]
+    assert repo.get_watch("MSFT").enabled is False
+    assert repo.get_watch("NOPE") is None
+
+    repo.upsert_watch(Watch("AAPL", [175.0]))
+    assert repo.get_watch("AAPL").levels == [175.0]
+    assert sorted(w.ticker for w in repo.list_watches()) == ["AAPL", "MSFT"]
+
+    assert repo.delete_watch("MSFT")
+    assert not repo.delete_watch("MSFT")
+    assert [w.ticker for w in repo.list_watches()] == ["AAPL"]
+
+
+def test_alert_states_are_saved_and_cleared(repo):
+    repo.upsert_watch(Watch("AAPL", [150.0]))
+    at = datetime(2024, 1, 3, 15, 0, tzinfo=timezone.utc)
+    repo.save_alert_states({"AAPL": AlertState(150.0, "up", at)})
+    state = repo.get_watch("AAPL").last_alert
+    assert (state.level, state.direction) == (150.0, "up")
+    assert state.alerted_at.replace(tzinfo=timezone.utc) == at
+
+    repo.save_alert_states({"AAPL": None})
+    assert repo.get_watch("AAPL").last_alert is None
+
+
+def test_prices_bulk_write_and_read(repo):
+    asof = datetime(2024, 1, 3, 15, 0, tzinfo=timezone.utc)
+    repo.set_prices([PriceCache(f"T{i}", 100.0 + i, asof, exchange="NMS", open_price=99.0) for i in range(50)])
+    prices = repo.get_prices([f"T{i}" for i in range(0, 60, 5)])
+    assert set(prices) == {f"T{i}" for i in range(0, 50, 5)}
+    assert prices["T10"].price == 110.0
+    assert prices["T10"].exchange == "NMS"
+    assert prices["T10"].open_price == 99.0
+    assert repo.get_prices([]) == {}
+
+    # A second batch overwrites in place
+    repo.set_prices([PriceCache("T1", 1.0, asof + timedelta(minutes=1))])
+    assert repo.get_price("T1").price == 1.0
+    assert len(repo.list_prices()) == 50
+
+
+def test_metadata_only_rows_are_not_prices(repo):
+    repo.set_metadata("AAPL", {"currency": "USD", "exchange": "NMS", "timezone": "America/New_York"})
+    assert repo.get_metadata("AAPL")["exchange"] == "NMS"
+    assert repo.get_price("AAPL") is None
+    assert repo.list_prices() == []
+
+
+def test_quotes_are_recorded_once_per_timestamp(repo):
+    asof = datetime(2024, 1, 3, 15, 0, tzinfo=timezone.utc)
+    repo.append_quotes([PriceCache("AAPL", 100.0, asof), PriceCache("AAPL", 100.0, asof)])
+    repo.append_quotes([PriceCache("AAPL", 100.0, asof), PriceCache("AAPL", 101.0, asof + timedelta(minutes=1))])
+    quotes = repo.get_quotes("AAPL", asof, asof + timedelta(hours=1))
+    assert [q["price"] for q in quotes] == [100.0, 101.0]
+
+
+def test_later_poll_of_a_bar_updates_its_price(repo):
+    bar = datetime(2024, 1, 3, 15, 0, tzinfo=timezone.utc)
+    repo.append_quotes([PriceCache("AAPL", 100.0, bar)])
+    repo.append_quotes([PriceCache("AAPL", 100.5, bar)])
+    repo.append_quotes([PriceCache("AAPL", 101.0, bar)])
+    assert [q["price"] for q in repo.get_quotes("AAPL", bar, bar + timedelta(hours=1))] == [101.0]
+
+    repo.rollup_quotes("5m", "minute", 5, bar)
+    [rolled] = repo.get_quote_bars("AAPL", "5m", bar, bar + timedelta(hours=1))
+    assert (rolled["close"], rolled["count"]) == (101.0, 1)
@@ -0,0 +1,74 @@
+"""StockService.evaluate_statuses against the scalar per-watch computation it replaced"""
+import random
+from datetime import datetime, timezone
+
+import pytest
+
+from app.config import settings
+from app.models import PriceCache
+from app.stock_service import StockService
+
+ASOF = datetime(2024, 1, 3, 15, 0, tzinfo=timezone.utc)
+
+
+def scalar_status(ticker: str, pc: PriceCache, levels: list) -> dict:
+    """One watch at a time, as create_status_dict computed it before the batch version"""
+    nearest = min(sorted(levels), key=lambda L: abs(pc.price - L)) if levels else None
+    if nearest is not None:
+        distance = StockService.calculate_distance_to_level(pc.price, nearest)
+        near = distance <= settings.NEAR_LEVEL_PCT
+    else:
+        distance, near = 0.0, False
+    return {
+        "ticker": ticker,
+        "price": pc.price,
+        "currency": pc.currency,
+        "nearest_level": nearest,
+        "distance_pct": distance,
+        "near": near,
+        "open_price": pc.open_price,
+        "price_change_pct": StockService.calculate_price_change_pct(pc.price, pc.open_price),
+        "stale": pc.stale,
+    }
+
+
+def entry(ticker: str, price: float, levels: list, open_price=None, stale=False):
+    return ticker, PriceCache(ticker, price, ASOF, open_price=open_price, stale=stale), levels
+
+
+EDGE_CASES = [
+    entry("TIE", 100.0, [110.0, 90.0]),  # equally distant: the lower level
+    entry("NONE", 100.0, []),
+    entry("AT", 100.0, [100.0, 150.0]),
+    entry("NEAR", 100.5, [100.0]),  # exactly NEAR_LEVEL_PCT away
+    entry("FAR", 100.6, [100.0]),
+    entry("OPEN", 101.0, [50.0], open_price=100.0),
+    entry("ZERO_OPEN", 101.0, [50.0], open_price=0.0),
+    entry("STALE", 99.0, [100.0, 100.0], stale=True),
+]
+
+
+def test_edge_cases_match_the_scalar_version():
+    assert StockService.evaluate_statuses(EDGE_CASES) == [scalar_status(*e) for e in EDGE_CASES]
+    statuses = {s["ticker"]: s for s in StockService.evaluate_statuses(EDGE_CASES)}
+    assert statuses["TIE"]["nearest_level"] == 90.0
+    assert statuses["NONE"]["nearest_level"] is None and statuses["NONE"]["near"] is False
+    assert statuses["NEAR"]["near"] and not statuses["FAR"]["near"]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_watchlists_match_the_scalar_version(seed):
+    rng = random.Random(seed)
+    entries = []
+    for i in range(200):
+        price = round(rng.uniform(1, 500), 2)
+        levels = [round(price * rng.uniform(0.9, 1.1), rng.choice([0, 2])) for _ in range(rng.randint(0, 6))]
+        open_price = rng.choice([None, 0.0, round(price * rng.uniform(0.95, 1.05), 2)])
+        entries.append(entry(f"T{i:03d}", price, levels, open_price))
+    assert StockService.evaluate_statuses(entries) == [scalar_status(*e) for e in entries]
+
+
+def test_single_status_helpers_use_the_batch():
+    ticker, pc, levels = EDGE_CASES[0]
+    assert StockService.create_status_read(ticker, pc, levels).nearest_level == 90.0
+    assert StockService.create_status_dict(ticker, pc.price, pc.currency, None, levels) == scalar_status(ticker, pc, levels)
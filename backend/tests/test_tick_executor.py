@@ -0,0 +1,86 @@
+"""TickExecutor coalescing and deadline carry-over, and the watcher side of priority"""
+import asyncio
+import time
+from datetime import datetime
+
+from app import data_provider, watcher as watcher_module
+from app.data_provider import PriceProvider
+from app.models import TickOutcome, Watch
+from app.stock_service import StockService
+from app.telegram_notifier import Telegram, TelegramSettings
+from app.tick_executor import TickExecutor
+from app.watcher import Watcher
+
+from benchmarks.fake_upstream import FakeYFinance, InMemoryRepo
+
+
+class ScriptedWatcher:
+    """tick_async stand-in: each tick waits for its release and defers the tickers scripted for it"""
+
+    def __init__(self, deferred=()):
+        self.deferred = list(deferred)
+        self.priorities = []
+        self.release = asyncio.Event()
+
+    async def tick_async(self, deadline=None, priority=()):
+        self.priorities.append(list(priority))
+        await self.release.wait()
+        deferred = self.deferred.pop(0) if self.deferred else []
+        return TickOutcome(datetime(2024, 1, 3, 15, 0), deferred=deferred)
+
+
+def test_overlapping_runs_coalesce_into_one_more_tick():
+    async def scenario():
+        watcher = ScriptedWatcher()
+        executor = TickExecutor(watcher)
+        first = asyncio.create_task(executor.run())
+        await asyncio.sleep(0)
+        assert executor.running
+        for _ in range(3):
+            await executor.run()
+        watcher.release.set()
+        await first
+        return executor, watcher
+
+    executor, watcher = asyncio.run(scenario())
+    assert len(watcher.priorities) == 2
+    assert [o.coalesced for o in executor.recent()] == [0, 3]
+    assert not executor.running
+
+
+def test_deferred_tickers_go_first_on_the_next_tick():
+    async def scenario():
+        watcher = ScriptedWatcher(deferred=[["C", "D"], []])
+        watcher.release.set()
+        executor = TickExecutor(watcher, deadline_seconds=10)
+        await executor.run()
+        await executor.run()
+        await executor.run()
+        return watcher
+
+    assert asyncio.run(scenario()).priorities == [[], ["C", "D"], []]
+
+
+class _Weekday(datetime):
+    """Pin the watcher clock to a weekday so the market schedule polls every watch"""
+
+    @classmethod
+    def now(cls, tz=None):
+        return datetime(2024, 1, 3, 15, 0, tzinfo=tz)
+
+
+def test_watcher_puts_priority_tickers_first(monkeypatch):
+    monkeypatch.setattr(data_provider, "yf", FakeYFinance(latency=0))
+    monkeypatch.setattr(watcher_module, "datetime", _Weekday)
+    repo = InMemoryRepo()
+    for ticker in ("A", "B", "C", "D"):
+        repo.upsert_watch(Watch(ticker, [100.0]))
+    provider = PriceProvider({})
+    notifier = Telegram("", "", settings_override=TelegramSettings(enabled=False))
+    watcher = Watcher(repo, provider, notifier, stock_service=StockService(repo, provider))
+
+    # A deadline already passed defers every watch, in the order they would have been polled
+    outcome = asyncio.run(watcher.tick_async(deadline=time.monotonic(), priority=["C", "D"]))
+    assert outcome.deferred == ["C", "D", "A", "B"]
+    outcome = asyncio.run(watcher.tick_async(deadline=None, priority=outcome.deferred))
+    assert sorted(outcome.done) == ["A", "B", "C", "D"] and outcome.deferred == []
@@ -0,0 +1,39 @@
+"""TickerValidator caching, and symbols confirmed by a price fetch"""
+from app import data_provider
+from app.data_provider import PriceProvider
+from app.stock_service import StockService
+from app.ticker_validator import TickerValidator
+
+from benchmarks.fake_upstream import FakeYFinance, InMemoryRepo
+
+
+class CountingProvider:
+    def __init__(self, valid):
+        self.valid = set(valid)
+        self.calls = []
+
+    def validate_many(self, tickers):
+        self.calls.append(list(tickers))
+        return {t: t in self.valid for t in tickers}
+
+
+def test_results_are_cached_and_misses_checked_together():
+    provider = CountingProvider({"AAPL"})
+    validator = TickerValidator(provider)
+    assert validator.validate_many(["AAPL", "NOPE"]) == {"AAPL": True, "NOPE": False}
+    assert validator.validate_many(["AAPL", "NOPE", "MSFT"]) == {"AAPL": True, "NOPE": False, "MSFT": False}
+    assert provider.calls == [["AAPL", "NOPE"], ["MSFT"]]
+
+
+def test_fetched_prices_mark_tickers_valid(monkeypatch):
+    fake = FakeYFinance(latency=0)
+    monkeypatch.setattr(data_provider, "yf", fake)
+    provider = PriceProvider({})
+    validator = TickerValidator(provider)
+    service = StockService(InMemoryRepo(), provider, validator=validator)
+
+    prices, errors = service.get_prices(["AAPL", "MSFT"], force_update=True)
+    assert set(prices) == {"AAPL", "MSFT"} and not errors
+    requests = fake.requests
+    assert validator.validate_many(["AAPL", "MSFT"]) == {"AAPL": True, "MSFT": True}
+    assert fake.requests == requests
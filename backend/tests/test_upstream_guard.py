@@ -0,0 +1,150 @@
+"""TokenBucket, CircuitBreaker and GuardedProvider state machines"""
+import time
+
+import pytest
+
+from app.upstream_guard import CircuitBreaker, GuardedProvider, TokenBucket, UpstreamUnavailable, is_throttle_error
+
+
+class StubProvider:
+    """get_last_many answering from a dict of ticker -> price or error message; records the chunks asked for"""
+
+    def __init__(self, answers: dict):
+        self.answers = answers
+        self.calls = []
+
+    def get_last_many(self, tickers):
+        self.calls.append(list(tickers))
+        results = {t: (a, None) for t, a in self.answers.items() if t in tickers and not isinstance(a, str)}
+        errors = {t: a for t, a in self.answers.items() if t in tickers and isinstance(a, str)}
+        return results, errors
+
+    def get_stock_details(self, ticker):
+        answer = self.answers[ticker]
+        if isinstance(answer, str):
+            raise RuntimeError(answer)
+        return {"ticker": ticker}
+
+
+def guarded(answers: dict, burst: int = 2, failure_threshold: int = 2) -> GuardedProvider:
+    return GuardedProvider(StubProvider(answers), TokenBucket(1000, burst), CircuitBreaker(failure_threshold, 0.05),
+                           max_wait_seconds=1)
+
+
+def test_is_throttle_error():
+    assert is_throttle_error("HTTP Error 429: Too Many Requests")
+    assert is_throttle_error("Rate limited. Try after a while.")
+    assert not is_throttle_error("No data found, symbol may be delisted")
+    assert not is_throttle_error(None)
+
+
+def test_bucket_spends_the_burst_then_refills():
+    bucket = TokenBucket(100, burst=3)
+    assert bucket.acquire(0, tokens=3)
+    assert not bucket.acquire(0)
+    assert bucket.acquire(0.5)
+
+
+def test_bucket_throttling_halves_the_rate_and_pauses():
+    bucket = TokenBucket(100, burst=1, backoff_seconds=0.05)
+    bucket.throttled()
+    assert bucket.rate == 50
+    assert not bucket.acquire(0.01)
+    assert bucket.acquire(0.5)
+    for _ in range(10):
+        bucket.throttled()
+    assert bucket.rate == bucket.min_rate == 10
+    bucket.succeeded()
+    assert bucket.rate == 20
+
+
+def test_bucket_wait_stops_when_cancelled():
+    bucket = TokenBucket(0.01, burst=1)
+    assert bucket.acquire(0)
+    started = time.monotonic()
+    assert not bucket.acquire(60, cancelled=lambda: True)
+    assert time.monotonic() - started < 1
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+
+def test_breaker_half_open_admits_one_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == "half-open"
+    assert not breaker.allow()
+    # A probe slot given back unused can be taken again
+    breaker.release()
+    assert breaker.allow()
+
+    # A failed probe re-opens the circuit, a successful one closes it
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow() and breaker.allow()
+
+
+@pytest.mark.parametrize("failed, total, opens", [(0, 10, False), (4, 10, False), (5, 10, True), (10, 10, True), (1, 1, True)])
+def test_breaker_counts_a_batch_as_failed_by_ratio(failed, total, opens):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60, failure_ratio=0.5)
+    breaker.record_batch(failed, total)
+    assert (breaker.state == "open") == opens
+
+
+def test_guarded_batches_are_chunked_by_burst():
+    provider = guarded({"A": 1.0, "B": 2.0, "C": 3.0, "D": "No data found, symbol may be delisted"}, burst=2)
+    results, errors = provider.get_last_many(["A", "B", "C", "D", "A"])
+    assert provider.provider.calls == [["A", "B"], ["C", "D"]]
+    assert set(results) == {"A", "B", "C"} and set(errors) == {"D"}
+    # Half of the second chunk failed: one breaker failure, below the threshold
+    assert provider.breaker.state == "closed"
+
+
+def test_guarded_fails_fast_while_the_circuit_is_open():
+    provider = guarded({"A": "boom", "B": "boom"}, burst=2, failure_threshold=2)
+    for _ in range(2):
+        provider.get_last_many(["A", "B"])
+    assert provider.breaker.state == "open"
+
+    calls = len(provider.provider.calls)
+    results, errors = provider.get_last_many(["A", "B"])
+    assert results == {} and all("circuit open" in e for e in errors.values())
+    with pytest.raises(UpstreamUnavailable):
+        provider.get_stock_details("A")
+    assert len(provider.provider.calls) == calls
+    assert provider.rejected == 2
+
+    # After reset_seconds one probe goes through and closes the circuit
+    time.sleep(0.06)
+    provider.provider.answers = {"A": 1.0, "B": 2.0}
+    results, _ = provider.get_last_many(["A", "B"])
+    assert set(results) == {"A", "B"} and provider.breaker.state == "closed"
+
+
+def test_guarded_throttled_batch_slows_the_limiter():
+    provider = guarded({"A": 1.0, "B": "HTTP Error 429: Too Many Requests"}, burst=2)
+    provider.limiter.backoff_seconds = 0.01
+    provider.get_last_many(["A", "B"])
+    assert provider.limiter.rate == 500
+
+
+def test_guarded_call_records_errors():
+    provider = guarded({"A": "boom"}, failure_threshold=1)
+    with pytest.raises(RuntimeError, match="boom"):
+        provider.get_stock_details("A")
+    assert provider.breaker.state == "open"
@@ -1,5 +1,5 @@
 import axios from 'axios'
-import type { Watch, WatchCreate, StatusRead, InfoRead, StockDetails, HistoricalPrice } from './types'
+import type { Watch, WatchCreate, StatusRead, InfoRead, StockDetails, HistoricalPrice, HistoricalPriceColumns } from './types'
 
 const api = axios.create({ baseURL: import.meta.env.VITE_API_BASE || 'http://localhost:8000' })
 
@@ -22,4 +22,7 @@ export const getStockDetails = (ticker: string): Promise<StockDetails> =>
   api.get<StockDetails>(`/stocks/${ticker}/details`).then(r => r.data)
 
 export const getStockHistory = (ticker: string, period: string = '1y', interval: string = '1d'): Promise<HistoricalPrice[]> => 
-  api.get<HistoricalPrice[]>(`/stocks/${ticker}/history`, { params: { period, interval } }).then(r => r.data)
\ No newline at end of file
+  api.get<HistoricalPrice[]>(`/stocks/${ticker}/history`, { params: { period, interval } }).then(r => r.data)
+
+export const getStockHistoryColumns = (ticker: string, period: string = '1y', interval: string = '1d', maxPoints?: number): Promise<HistoricalPriceColumns> => 
+  api.get<HistoricalPriceColumns>(`/stocks/${ticker}/history`, { params: { period, interval, format: 'columns', max_points: maxPoints } }).then(r => r.data)
\ No newline at end of file
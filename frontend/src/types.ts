@@ -1,10 +1,16 @@
 // API Types matching backend schemas
 
+export interface AlertState {
+  level: number
+  direction: 'up' | 'down'
+  alerted_at: string
+}
+
 export interface Watch {
   ticker: string
   levels: number[]
   enabled: boolean
-  last_alert_hash: string | null
+  last_alert: AlertState | null
   updated_at: string
 }
 
@@ -23,6 +29,7 @@ export interface StatusRead {
   near: boolean
   open_price: number | null
   price_change_pct: number | null
+  stale: boolean
 }
 
 export interface InfoRead {
@@ -84,6 +91,10 @@ export interface StockDetails {
   recommendation_mean: number | null
   recommendation_key: string | null
   number_of_analyst_opinions: number | null
+  
+  // Cache age (seconds) of price-derived fields and fundamentals
+  price_age_seconds: number | null
+  fundamentals_age_seconds: number | null
 }
 
 export interface HistoricalPrice {
@@ -95,6 +106,16 @@ export interface HistoricalPrice {
   volume: number
 }
 
+// Columnar history response (format=columns): one array per field
+export interface HistoricalPriceColumns {
+  date: string[]
+  open: number[]
+  high: number[]
+  low: number[]
+  close: number[]
+  volume: number[]
+}
+
 export interface WebSocketMessage {
   type: 'status'
   data: StatusRead[]